@@ -0,0 +1,209 @@
+"""
+Lazy, config-hashed cache of materialized agents.
+
+Agent definitions are registered cheaply (a name and its configuration) and the
+corresponding Agent objects are only built the first time someone talks to them.
+Built agents are keyed by a hash of their configuration, kept in LRU order and
+evicted when the cache is full or when they have been idle for longer than the TTL.
+An agent is built outside the cache lock, under a lock of its own, so building one
+agent never holds up lookups of the others.
+"""
+
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel
+from agents import Agent
+
+class AgentConfig(BaseModel):
+    """Everything needed to build an agent"""
+    name: str
+    role: str
+    personality: str
+    tools: List[str] = []
+    model: str = "gpt-4o"
+    # Response cache mode (None, "exact" or "semantic"); not part of the hash since
+    # it does not change what the agent answers
+    response_cache: Optional[str] = None
+
+    def config_hash(self) -> str:
+        """Stable hash of the configuration, used as the cache key"""
+        payload = json.dumps(
+            {
+                "name": self.name,
+                "role": self.role,
+                "personality": self.personality,
+                "tools": sorted(self.tools),
+                "model": self.model
+            },
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class AgentCache:
+    """
+    Registry of agent configurations with an LRU/TTL cache of built agents.
+
+    Args:
+        builder: Callable that builds an Agent from an AgentConfig
+        max_size: Maximum number of built agents kept in memory
+        ttl_seconds: Idle time after which a built agent is evicted (0 disables the TTL)
+    """
+
+    def __init__(self, builder: Callable[[AgentConfig], Agent], max_size: int = 256, ttl_seconds: float = 3600.0):
+        self.builder = builder
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._configs: Dict[str, AgentConfig] = {}
+        self._agents: "OrderedDict[str, Tuple[Agent, float]]" = OrderedDict()
+        self._lock = threading.RLock()
+        # Config hash -> lock held while that agent is built
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def register(self, config: AgentConfig):
+        """Register (or replace) the configuration for an agent name without building it"""
+        with self._lock:
+            previous = self._configs.get(config.name)
+            if previous is not None and previous.config_hash() != config.config_hash():
+                # The old build can never be requested again
+                self._agents.pop(previous.config_hash(), None)
+            self._configs[config.name] = config
+
+    def unregister(self, name: str) -> bool:
+        """Forget an agent name and drop its built agent"""
+        with self._lock:
+            config = self._configs.pop(name, None)
+            if config is None:
+                return False
+            self._agents.pop(config.config_hash(), None)
+            return True
+
+    def get_config(self, name: str) -> Optional[AgentConfig]:
+        """Get the registered configuration for an agent name"""
+        return self._configs.get(name)
+
+    def names(self) -> List[str]:
+        """Get all registered agent names"""
+        return list(self._configs)
+
+    def get_agent(self, name: str) -> Optional[Agent]:
+        """Get the built agent for a name, building it on first use"""
+        with self._lock:
+            config = self._configs.get(name)
+            if config is None:
+                return None
+            key = config.config_hash()
+            agent = self._lookup(key)
+            if agent is not None:
+                self.hits += 1
+                return agent
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        # Concurrent requests for the same agent wait for one build; others aren't blocked
+        with build_lock:
+            with self._lock:
+                agent = self._lookup(key)
+                if agent is not None:
+                    self.hits += 1
+                    return agent
+                self.misses += 1
+            try:
+                agent = self.builder(config)
+                with self._lock:
+                    # Don't cache a build whose configuration was replaced or unregistered meanwhile
+                    current = self._configs.get(name)
+                    if current is not None and current.config_hash() == key:
+                        self._agents[key] = (agent, time.monotonic())
+                        while len(self._agents) > self.max_size:
+                            self._agents.popitem(last=False)
+                            self.evictions += 1
+            finally:
+                with self._lock:
+                    self._build_locks.pop(key, None)
+            return agent
+
+    def _lookup(self, key: str) -> Optional[Agent]:
+        # Called with the cache lock held; refreshes the entry's LRU position
+        now = time.monotonic()
+        self._evict_expired(now)
+        entry = self._agents.get(key)
+        if entry is None:
+            return None
+        self._agents[key] = (entry[0], now)
+        self._agents.move_to_end(key)
+        return entry[0]
+
+    def _evict_expired(self, now: float):
+        # Entries are kept in last-used order, so expired ones are at the front
+        if not self.ttl_seconds:
+            return
+        while self._agents:
+            key, (_, last_used) = next(iter(self._agents.items()))
+            if now - last_used < self.ttl_seconds:
+                break
+            self._agents.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Drop all built agents, keeping the registered configurations"""
+        with self._lock:
+            self._agents.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache size and hit rate statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "registered_agents": len(self._configs),
+            "materialized_agents": len(self._agents),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+class AgentStoreView:
+    """
+    Dict-like view of agent name to Agent backed by an AgentCache.
+
+    Membership checks and iteration only look at registered configurations;
+    indexing (or ``get``) materializes the requested agent. There is deliberately
+    no ``items()`` or ``values()``, which would build every registered agent.
+    """
+
+    def __init__(self, cache: AgentCache):
+        self._cache = cache
+
+    def __getitem__(self, name: str) -> Agent:
+        agent = self._cache.get_agent(name)
+        if agent is None:
+            raise KeyError(name)
+        return agent
+
+    def get(self, name: str, default: Optional[Agent] = None) -> Optional[Agent]:
+        agent = self._cache.get_agent(name)
+        return default if agent is None else agent
+
+    def keys(self) -> List[str]:
+        return self._cache.names()
+
+    def __delitem__(self, name: str):
+        if not self._cache.unregister(name):
+            raise KeyError(name)
+
+    def __contains__(self, name: object) -> bool:
+        return self._cache.get_config(name) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._cache.names())
+
+    def __len__(self) -> int:
+        return len(self._cache.names())
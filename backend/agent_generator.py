@@ -178,6 +178,7 @@ Please generate a specialized agent for this project with:
             existing_agent.tools = tools
             await db_session.commit()
             await db_session.refresh(existing_agent)
+            agent_utils.invalidate_agent_list()
             return existing_agent
         
         # Create new agent model if it doesn't exist
@@ -191,6 +192,7 @@ Please generate a specialized agent for this project with:
         db_session.add(new_agent)
         await db_session.commit()
         await db_session.refresh(new_agent)
+        agent_utils.invalidate_agent_list()
         
         return new_agent
     
@@ -0,0 +1,176 @@
+"""
+Embedding router for multi-agent triage.
+
+Each member agent is described by its name and role; the description is embedded
+once (keyed by its text, so editing an agent's role re-embeds it) and incoming
+messages are routed to the agent whose description is most similar. When the best
+match is weak or not clearly ahead of the runner-up, the router declines and the
+caller falls back to asking the triage agent (see
+multi_agent_service.interact_with_multi_agent_system).
+
+    ROUTER_ENABLED     - set to true to route by similarity; off by default, so
+                         every system keeps asking its triage agent until enabled
+    ROUTER_MIN_SCORE   - minimum cosine similarity of the best match
+    ROUTER_MIN_MARGIN  - minimum lead of the best match over the runner-up
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from response_cache import normalize_message
+
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "false").lower() == "true"
+ROUTER_EMBEDDING_MODEL = os.getenv("ROUTER_EMBEDDING_MODEL", os.getenv("RESPONSE_CACHE_EMBEDDING_MODEL", "text-embedding-3-small"))
+ROUTER_MIN_SCORE = float(os.getenv("ROUTER_MIN_SCORE", "0.3"))
+ROUTER_MIN_MARGIN = float(os.getenv("ROUTER_MIN_MARGIN", "0.05"))
+
+def describe_agent(name: str, role: str) -> str:
+    """Text embedded for an agent; the personality only affects tone, so it is left out"""
+    return f"{name}: {role}".strip()
+
+def _unit(embedding: List[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class AgentRouter:
+    """
+    Routes messages to agents by similarity between message and role description embeddings.
+
+    Args:
+        model: Embedding model
+        min_score: Minimum cosine similarity of the best match
+        min_margin: Minimum lead of the best match over the runner-up
+        max_descriptions: Maximum number of description embeddings kept in memory
+    """
+
+    def __init__(self, model: str, min_score: float = 0.3, min_margin: float = 0.05, max_descriptions: int = 1000):
+        self.model = model
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.max_descriptions = max_descriptions
+        # sha256 of a description -> normalized embedding
+        self._descriptions: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.routed = 0
+        self.fallbacks = 0
+        self.errors = 0
+        self.description_embeddings = 0
+
+    @staticmethod
+    def _key(description: str) -> str:
+        return hashlib.sha256(description.encode("utf-8")).hexdigest()
+
+    def _cached(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._descriptions.get(key)
+            if vector is not None:
+                self._descriptions.move_to_end(key)
+            return vector
+
+    def _store(self, key: str, vector: np.ndarray):
+        with self._lock:
+            self._descriptions[key] = vector
+            self._descriptions.move_to_end(key)
+            while len(self._descriptions) > self.max_descriptions:
+                self._descriptions.popitem(last=False)
+
+    async def _description_vectors(self, client, descriptions: Dict[str, str]) -> Dict[str, np.ndarray]:
+        """Embeddings of agent descriptions; missing ones are embedded in one batched call"""
+        vectors = {}
+        missing = {}
+        for name, description in descriptions.items():
+            key = self._key(description)
+            vector = self._cached(key)
+            if vector is not None:
+                vectors[name] = vector
+            else:
+                missing[name] = (key, description)
+
+        if missing:
+            names = list(missing)
+            response = await client.embeddings.create(model=self.model, input=[missing[name][1] for name in names])
+            for item in response.data:
+                name = names[item.index]
+                vector = _unit(item.embedding)
+                self._store(missing[name][0], vector)
+                vectors[name] = vector
+            self.description_embeddings += len(names)
+        return vectors
+
+    async def route(self, client, message: str, descriptions: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Pick the agent whose description is closest to the message.
+
+        Args:
+            client: OpenAI client used for embeddings
+            message: The user message
+            descriptions: Agent name -> description (see describe_agent)
+
+        Returns:
+            Dict with the selected `agent` (None when the router is not confident and
+            the triage agent should decide), the best `score`, the `margin` over the
+            runner-up and the time taken in `duration_ms`
+        """
+        started = time.perf_counter()
+        decision = {"agent": None, "score": None, "margin": None, "duration_ms": 0.0}
+        if client is None or not descriptions:
+            self.fallbacks += 1
+            return decision
+
+        try:
+            vectors = await self._description_vectors(client, descriptions)
+            response = await client.embeddings.create(model=self.model, input=normalize_message(message))
+            query = _unit(response.data[0].embedding)
+        except Exception as e:
+            print(f"Error embedding for agent routing: {str(e)}")
+            self.errors += 1
+            self.fallbacks += 1
+            decision["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            return decision
+
+        names = list(vectors)
+        scores = np.stack([vectors[name] for name in names]) @ query
+        order = np.argsort(scores)[::-1]
+        best = float(scores[order[0]])
+        # With a single candidate there is nothing to be confused with
+        margin = best - float(scores[order[1]]) if len(names) > 1 else 1.0
+
+        decision["score"] = round(best, 4)
+        decision["margin"] = round(margin, 4)
+        if best >= self.min_score and margin >= self.min_margin:
+            decision["agent"] = names[order[0]]
+            self.routed += 1
+        else:
+            self.fallbacks += 1
+        decision["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return decision
+
+    def stats(self) -> Dict[str, Any]:
+        decisions = self.routed + self.fallbacks
+        return {
+            "enabled": ROUTER_ENABLED,
+            "model": self.model,
+            "min_score": self.min_score,
+            "min_margin": self.min_margin,
+            "cached_descriptions": len(self._descriptions),
+            "description_embeddings": self.description_embeddings,
+            "routed": self.routed,
+            "fallbacks": self.fallbacks,
+            "errors": self.errors,
+            "routed_rate": self.routed / decisions if decisions else 0.0
+        }
+
+# Shared router
+agent_router = AgentRouter(
+    model=ROUTER_EMBEDDING_MODEL,
+    min_score=ROUTER_MIN_SCORE,
+    min_margin=ROUTER_MIN_MARGIN,
+    max_descriptions=int(os.getenv("ROUTER_CACHE_SIZE", "1000"))
+)
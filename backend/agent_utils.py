@@ -1,18 +1,31 @@
-from agents import Agent, InputGuardrail, GuardrailFunctionOutput, Runner, ModelSettings, OpenAIChatCompletionsModel
+from agents import Agent, InputGuardrail, GuardrailFunctionOutput, Runner, ModelSettings, OpenAIChatCompletionsModel, FunctionTool
 from pydantic import BaseModel
 import os
 import sys
 from openai import AsyncOpenAI
-from typing import Dict, List, Optional, Any, Callable
+from typing import Dict, List, Optional, Any, Callable, AsyncIterator
+from openai.types.responses import ResponseTextDeltaEvent
 import agent_tools
+import llm_clients
+import llm_scheduler
+from tool_executor import tool_executor
+import message_store
+import pagination
+import message_archive
+import conversation_memory
+from response_cache import lookup_response, store_response
+from read_model_cache import read_models, AGENT_LIST
+from agent_cache import AgentCache, AgentConfig, AgentStoreView
 import json
 import inspect
 import database as db
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 import asyncio
+import time
+from collections import OrderedDict
 
-# Initialize the OpenAI client with LiteLLM configuration
+# Get the shared OpenAI client for the LiteLLM gateway
 def get_openai_client():
     # Check if API key is set
     api_key = os.getenv("LITELLM_API_KEY") or os.getenv("OPENAI_API_KEY")
@@ -23,14 +36,11 @@ def get_openai_client():
         print("  export OPENAI_API_KEY=your-openai-api-key-here")
         return None
     
-    # Initialize the OpenAI client with LiteLLM configuration
-    return AsyncOpenAI(
-        api_key=api_key,
-        base_url="https://litellm.deriv.ai/v1",
-    )
+    # All callers share one client and connection pool per gateway
+    return llm_clients.get_llm_client(api_key)
 
 # Create an agent with the given parameters
-def create_agent(name: str, role: str, personality: str, tools: List[str], openai_client: AsyncOpenAI) -> Agent:
+def create_agent(name: str, role: str, personality: str, tools: List[str], openai_client: AsyncOpenAI, model_name: str = "gpt-4o") -> Agent:
     # Generate enhanced instructions with safety guardrails
     instructions = generate_enhanced_prompt(name, role, personality, tools)
     
@@ -66,7 +76,7 @@ def create_agent(name: str, role: str, personality: str, tools: List[str], opena
     
     # Create and return the agent
     model = OpenAIChatCompletionsModel(
-        model="gpt-4o",
+        model=model_name,
         openai_client=openai_client,
     )
     
@@ -76,11 +86,18 @@ def create_agent(name: str, role: str, personality: str, tools: List[str], opena
         "function_call": "auto" if functions else None
     }
     
-    # Create a handler for function calls
-    def function_handler(function_name, function_args):
+    # Create a handler for function calls; tools run on the tool executor, off the event loop
+    async def function_handler(function_name, function_args):
         if function_name in function_map:
             try:
-                return function_map[function_name](**function_args)
+                return await tool_executor.run(
+                    function_name,
+                    function_map[function_name],
+                    function_args,
+                    source_file=custom_tool_manager.get_custom_tool_file(function_name)
+                )
+            except asyncio.TimeoutError:
+                return f"Error executing function {function_name}: timed out after {tool_executor.timeout_for(function_name):g} seconds"
             except Exception as e:
                 return f"Error executing function {function_name}: {str(e)}"
         else:
@@ -94,7 +111,28 @@ def create_agent(name: str, role: str, personality: str, tools: List[str], opena
         handoff_description=f"{role} agent",
         instructions=instructions,
         model=model,
-        model_settings=ModelSettings(temperature=0.7)
+        model_settings=ModelSettings(temperature=0.7),
+        tools=[build_function_tool(definition, function_handler) for definition in filtered_custom_tools]
+    )
+
+# Expose a tool definition to the agents SDK, dispatching calls through the function handler
+def build_function_tool(definition: Dict[str, Any], function_handler: Callable) -> FunctionTool:
+    function = definition["function"]
+    function_name = function["name"]
+    
+    async def on_invoke_tool(context, arguments: str):
+        try:
+            function_args = json.loads(arguments) if arguments else {}
+        except json.JSONDecodeError as e:
+            return f"Invalid arguments for function {function_name}: {str(e)}"
+        return await function_handler(function_name, function_args)
+    
+    return FunctionTool(
+        name=function_name,
+        description=function.get("description", ""),
+        params_json_schema=function.get("parameters") or {"type": "object", "properties": {}},
+        on_invoke_tool=on_invoke_tool,
+        strict_json_schema=False
     )
 
 # Generate enhanced prompt with safety guardrails
@@ -220,11 +258,43 @@ Remember: Your primary goal is to be helpful, accurate, and safe while strictly
 
     return base_prompt
 
-# Store agents in memory (for runtime use)
-agents_store: Dict[str, Agent] = {}
+# Build an agent from its registered configuration (used by the agent cache)
+def build_agent_from_config(config: AgentConfig) -> Agent:
+    print(f"Materializing agent: {config.name}")
+    return create_agent(
+        name=config.name,
+        role=config.role,
+        personality=config.personality,
+        tools=config.tools,
+        openai_client=get_openai_client(),
+        model_name=config.model
+    )
+
+# Agents are registered by configuration and only built on first use
+agent_cache = AgentCache(
+    builder=build_agent_from_config,
+    max_size=int(os.getenv("AGENT_CACHE_SIZE", "256")),
+    ttl_seconds=float(os.getenv("AGENT_CACHE_TTL_SECONDS", "3600"))
+)
+
+# Store agents in memory (for runtime use); a read-only view over the agent cache
+agents_store: AgentStoreView = AgentStoreView(agent_cache)
+
+# Register (or re-register) an agent configuration without building it
+def register_agent(name: str, role: str, personality: str, tools: Optional[List[str]], response_cache: Optional[str] = None):
+    agent_cache.register(AgentConfig(name=name, role=role or "", personality=personality or "", tools=tools or [], response_cache=response_cache))
+    invalidate_agent_list()
+
+# Drop the cached /list_agents/ payload; call after registering, saving or deleting agents
+def invalidate_agent_list():
+    read_models.invalidate(AGENT_LIST)
+
+# Get the registered configuration of an agent
+def get_agent_config(name: str) -> Optional[AgentConfig]:
+    return agent_cache.get_config(name)
 
 # Save agent to database
-async def save_agent_to_db(session: AsyncSession, name: str, role: str, personality: str, tools: List[str]) -> db.AgentModel:
+async def save_agent_to_db(session: AsyncSession, name: str, role: str, personality: str, tools: List[str], response_cache: Optional[str] = None) -> db.AgentModel:
     # Check if agent already exists
     result = await session.execute(select(db.AgentModel).where(db.AgentModel.name == name))
     agent_model = result.scalars().first()
@@ -234,6 +304,7 @@ async def save_agent_to_db(session: AsyncSession, name: str, role: str, personal
         agent_model.role = role
         agent_model.personality = personality
         agent_model.tools = tools
+        agent_model.response_cache = response_cache
         agent_model.updated_at = db.datetime.datetime.utcnow()
     else:
         # Create new agent
@@ -241,40 +312,38 @@ async def save_agent_to_db(session: AsyncSession, name: str, role: str, personal
             name=name,
             role=role,
             personality=personality,
-            tools=tools
+            tools=tools,
+            response_cache=response_cache
         )
         session.add(agent_model)
     
     await session.commit()
     await session.refresh(agent_model)
+    invalidate_agent_list()
     return agent_model
 
-# Load all agents from database
-async def load_agents_from_db(session: AsyncSession, openai_client: AsyncOpenAI) -> Dict[str, Agent]:
-    result = await session.execute(select(db.AgentModel))
-    agent_models = result.scalars().all()
-    
-    loaded_agents = {}
-    for agent_model in agent_models:
-        agent = create_agent(
-            name=agent_model.name,
-            role=agent_model.role,
-            personality=agent_model.personality,
-            tools=agent_model.tools,
-            openai_client=openai_client
-        )
-        loaded_agents[agent_model.name] = agent
+# Load all agent configurations from database
+async def load_agents_from_db(session: AsyncSession) -> List[AgentConfig]:
+    result = await session.execute(
+        select(db.AgentModel.name, db.AgentModel.role, db.AgentModel.personality, db.AgentModel.tools, db.AgentModel.response_cache)
+    )
     
-    return loaded_agents
+    configs = []
+    for name, role, personality, tools, cache_mode in result.all():
+        if isinstance(tools, str):
+            tools = json.loads(tools)
+        configs.append(AgentConfig(name=name, role=role or "", personality=personality or "", tools=tools or [], response_cache=cache_mode))
+    
+    return configs
 
 # Get or create an agent
-async def get_or_create_agent(session: AsyncSession, name: str, role: str, personality: str, tools: List[str], openai_client: AsyncOpenAI) -> Agent:
+async def get_or_create_agent(session: AsyncSession, name: str, role: str, personality: str, tools: List[str], openai_client: AsyncOpenAI, response_cache: Optional[str] = None) -> Agent:
     if name not in agents_store:
         # Save to database first
-        await save_agent_to_db(session, name, role, personality, tools)
+        await save_agent_to_db(session, name, role, personality, tools, response_cache)
         
-        # Create in memory
-        agents_store[name] = create_agent(name, role, personality, tools, openai_client)
+        # Register in memory; the agent is built on first use
+        register_agent(name, role, personality, tools, response_cache)
     
     return agents_store[name]
 
@@ -291,19 +360,23 @@ async def delete_agent(session: AsyncSession, name: str) -> bool:
     if agent_model:
         await session.delete(agent_model)
         await session.commit()
+        invalidate_agent_list()
         return True
     
+    invalidate_agent_list()
     return False
 
 # Get all agents
-def get_all_agents() -> Dict[str, Agent]:
+def get_all_agents() -> AgentStoreView:
     return agents_store
 
 # Initialize agents from database
-async def initialize_agents(session: AsyncSession, openai_client: AsyncOpenAI):
-    loaded_agents = await load_agents_from_db(session, openai_client)
-    agents_store.update(loaded_agents)
-    print(f"Loaded {len(loaded_agents)} agents from database")
+async def initialize_agents(session: AsyncSession):
+    configs = await load_agents_from_db(session)
+    for config in configs:
+        agent_cache.register(config)
+    invalidate_agent_list()
+    print(f"Registered {len(configs)} agents from database")
 
 # Get available tool descriptions for the frontend
 def get_available_tool_descriptions() -> List[Dict[str, str]]:
@@ -319,71 +392,71 @@ def get_available_tool_descriptions() -> List[Dict[str, str]]:
         # Return only standard tools if custom_tool_manager is not available
         return standard_tools
 
-# Save message to database
-async def save_message(session: AsyncSession, agent_name: str, user_message: str, agent_response: str, conversation_id: Optional[int] = None) -> int:
-    # Get agent
-    result = await session.execute(select(db.AgentModel).where(db.AgentModel.name == agent_name))
-    agent_model = result.scalars().first()
-    
-    if not agent_model:
-        raise ValueError(f"Agent {agent_name} not found in database")
-    
-    # Get or create conversation
-    conversation = None
-    if conversation_id:
-        # Try to get the specified conversation
-        result = await session.execute(select(db.ConversationModel).where(db.ConversationModel.id == conversation_id))
-        conversation = result.scalars().first()
-    
-    # If no valid conversation_id or conversation not found, check for most recent conversation for this agent
-    if not conversation:
-        # Look for the most recent conversation with this agent
-        result = await session.execute(
-            select(db.ConversationModel)
-            .where(db.ConversationModel.agent_id == agent_model.id)
-            .order_by(db.ConversationModel.updated_at.desc())
-            .limit(1)
-        )
-        conversation = result.scalars().first()
-        
-        # If still no conversation, create a new one
-        if not conversation:
-            print(f"Creating new conversation for agent {agent_name}")
-            conversation = db.ConversationModel(
-                agent_id=agent_model.id,
-                title=f"Conversation with {agent_name}"
-            )
-            session.add(conversation)
-            await session.commit()
-            await session.refresh(conversation)
-        else:
-            print(f"Reusing most recent conversation {conversation.id} for agent {agent_name}")
-            
-    # Update conversation timestamp to mark as recently used
-    conversation.updated_at = db.datetime.datetime.utcnow()
-    await session.commit()
-    
-    conversation_id = conversation.id
-    
-    # Add user message
-    user_message_model = db.MessageModel(
-        conversation_id=conversation_id,
-        role="user",
-        content=user_message
-    )
-    session.add(user_message_model)
-    
-    # Add assistant message
-    assistant_message_model = db.MessageModel(
-        conversation_id=conversation_id,
-        role="assistant",
-        content=agent_response
-    )
-    session.add(assistant_message_model)
+# Save message to database (one transaction per turn)
+async def save_message(session: AsyncSession, agent_name: str, user_message: str, agent_response: str, conversation_id: Optional[int] = None, project_id: Optional[int] = None) -> int:
+    return await message_store.save_turn(session, agent_name, user_message, agent_response, conversation_id, project_id)
+
+# Make sure the agent has a properly configured OpenAI client
+def ensure_agent_client(agent: Agent) -> bool:
+    if (hasattr(agent, 'model') and 
+        hasattr(agent.model, 'openai_client') and 
+        (agent.model.openai_client is None or not agent.model.openai_client.api_key)):
+        client = get_openai_client()
+        if not client or not client.api_key:
+            return False
+        agent.model.openai_client = client
+    return True
+
+# Save a completed exchange and link its conversation to a project if needed
+async def persist_interaction(session: AsyncSession, agent_name: str, message: str, response: str, conversation_id: Optional[int] = None, project_id: Optional[int] = None) -> Optional[int]:
+    try:
+        # Conversation, project link and both messages are written in one transaction
+        conversation_id = await save_message(session, agent_name, message, response, conversation_id, project_id)
+        print(f"Saved conversation {conversation_id} for agent {agent_name}")
+    except Exception as db_error:
+        print(f"Database error when saving conversation: {str(db_error)}")
+        # Continue despite DB error; we still want to return the response
     
-    await session.commit()
     return conversation_id
 
+# Build the model input for a turn: the message plus budgeted history of its conversation
+async def prepare_agent_input(session: Optional[AsyncSession], agent_name: str, message: str, conversation_id: Optional[int] = None, company_id: Optional[int] = None) -> Any:
+    if not session:
+        return message
+    try:
+        history_conversation_id = await message_store.find_conversation_id(session, agent_name, conversation_id)
+        return await conversation_memory.build_context(session, history_conversation_id, message, agent_name=agent_name, company_id=company_id)
+    except Exception as e:
+        print(f"Error loading conversation memory for agent {agent_name}: {str(e)}")
+        return message
+
+# Company that owns a project; companies share LLM capacity fairly with each other.
+# Least recently used entries are dropped beyond PROJECT_COMPANY_CACHE_SIZE projects.
+PROJECT_COMPANY_CACHE_SIZE = int(os.getenv("PROJECT_COMPANY_CACHE_SIZE", "10000"))
+_project_companies: "OrderedDict[int, Optional[int]]" = OrderedDict()
+
+async def get_project_company_id(session: Optional[AsyncSession], project_id: Optional[int]) -> Optional[int]:
+    if not session or not project_id:
+        return None
+    if project_id in _project_companies:
+        _project_companies.move_to_end(project_id)
+        return _project_companies[project_id]
+    result = await session.execute(select(db.ProjectModel.company_id).where(db.ProjectModel.id == project_id))
+    company_id = result.scalar()
+    _project_companies[project_id] = company_id
+    while len(_project_companies) > PROJECT_COMPANY_CACHE_SIZE:
+        _project_companies.popitem(last=False)
+    return company_id
+
+def invalidate_project_company(project_id: int):
+    """Forget a project's company; call after committing a change to (or deletion of) the project."""
+    _project_companies.pop(project_id, None)
+
+# Run an agent once it is admitted by the LLM scheduler (raises llm_scheduler.AdmissionRejected when overloaded)
+async def run_agent(agent: Agent, agent_input: Any, company_id: Optional[int] = None, timeout: float = 60.0):
+    async with llm_scheduler.scheduler.slot(agent.name, company_id):
+        return await asyncio.wait_for(Runner.run(agent, agent_input), timeout=timeout)
+
 # Interact with an agent
 async def interact_with_agent(agent_name: str, message: str, session: Optional[AsyncSession] = None, conversation_id: Optional[int] = None, project_id: Optional[int] = None) -> Dict[str, Any]:
     if agent_name not in agents_store:
@@ -398,27 +471,36 @@ async def interact_with_agent(agent_name: str, message: str, session: Optional[A
         print(f"Running agent: {agent_name}")
         
         # Make sure the agent has a properly configured OpenAI client
-        if (hasattr(agent, 'model') and 
-            hasattr(agent.model, 'openai_client') and 
-            (agent.model.openai_client is None or not agent.model.openai_client.api_key)):
-            client = get_openai_client()
-            if not client or not client.api_key:
-                error_msg = "OpenAI API key is missing or invalid. Please check your environment variables."
-                print(error_msg)
-                return {
-                    "response": error_msg,
-                    "conversation_id": conversation_id,
-                    "error": "api_key_missing"
-                }
-            agent.model.openai_client = client
+        if not ensure_agent_client(agent):
+            error_msg = "OpenAI API key is missing or invalid. Please check your environment variables."
+            print(error_msg)
+            return {
+                "response": error_msg,
+                "conversation_id": conversation_id,
+                "error": "api_key_missing"
+            }
+        
+        # Include the conversation's history within the memory token budget
+        company_id = await get_project_company_id(session, project_id)
+        agent_input = await prepare_agent_input(session, agent_name, message, conversation_id, company_id)
+        
+        # Answer repeated questions from the response cache if the agent opted in
+        cached_response, cache_slot = await lookup_response(get_agent_config(agent_name), message, agent_input, get_openai_client())
+        if cached_response is not None:
+            print(f"Agent {agent_name} answered from the response cache")
+            if session:
+                conversation_id = await persist_interaction(session, agent_name, message, cached_response, conversation_id, project_id)
+            return {
+                "response": cached_response,
+                "conversation_id": conversation_id,
+                "cached": True
+            }
         
-        # Run with timeout to prevent hanging
+        # Run with timeout to prevent hanging; waiting for a scheduler slot is bounded separately
         try:
-            result = await asyncio.wait_for(
-                Runner.run(agent, message),
-                timeout=60.0  # 60 second timeout
-            )
+            result = await run_agent(agent, agent_input, company_id, timeout=60.0)
             response = result.final_output
+            store_response(cache_slot, response)
             print(f"Agent {agent_name} responded successfully")
         except asyncio.TimeoutError:
             error_msg = f"Response from agent {agent_name} timed out after 60 seconds"
@@ -431,43 +513,15 @@ async def interact_with_agent(agent_name: str, message: str, session: Optional[A
         
         # Save to database if session is provided
         if session:
-            try:
-                # First check if there's an existing conversation with the given ID
-                if conversation_id:
-                    # Get existing conversation
-                    result = await session.execute(
-                        select(db.ConversationModel).where(db.ConversationModel.id == conversation_id)
-                    )
-                    existing_conversation = result.scalars().first()
-                    
-                    if existing_conversation:
-                        # Link to project if provided and not already linked
-                        if project_id and not existing_conversation.project_id:
-                            existing_conversation.project_id = project_id
-                            await session.commit()
-                
-                # Save the message to the conversation
-                conversation_id = await save_message(session, agent_name, message, response, conversation_id)
-                
-                # If there's a project_id, link the conversation to the project
-                if project_id and conversation_id:
-                    result = await session.execute(
-                        select(db.ConversationModel).where(db.ConversationModel.id == conversation_id)
-                    )
-                    conversation = result.scalars().first()
-                    if conversation and not conversation.project_id:
-                        conversation.project_id = project_id
-                        await session.commit()
-                
-                print(f"Saved conversation {conversation_id} for agent {agent_name}")
-            except Exception as db_error:
-                print(f"Database error when saving conversation: {str(db_error)}")
-                # Continue despite DB error; we still want to return the response
+            conversation_id = await persist_interaction(session, agent_name, message, response, conversation_id, project_id)
         
         return {
             "response": response,
             "conversation_id": conversation_id
         }
+    except llm_scheduler.AdmissionRejected:
+        # Overload is reported to the caller (HTTP 429) rather than as an agent error
+        raise
     except Exception as e:
         error_msg = f"Error interacting with agent {agent_name}: {str(e)}"
         print(error_msg)
@@ -481,6 +535,114 @@ async def interact_with_agent(agent_name: str, message: str, session: Optional[A
             "error": "agent_error"
         }
 
+# Interact with an agent, yielding response tokens as they are generated
+async def stream_interact_with_agent(agent_name: str, message: str, session: Optional[AsyncSession] = None, conversation_id: Optional[int] = None, project_id: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Stream an agent's response.
+    
+    Yields ``{"type": "token", "delta": ...}`` events while the model generates,
+    followed by a single ``done`` or ``error`` event. The complete response is
+    persisted once the stream has finished, so a turn is only saved when the
+    caller received all of it.
+    
+    Args:
+        agent_name: Name of the agent to interact with
+        message: User message
+        session: Optional database session used to persist the finished turn
+        conversation_id: Optional conversation ID to append to
+        project_id: Optional project ID to link the conversation to
+        
+    Yields:
+        Event dictionaries with a ``type`` key
+    """
+    if agent_name not in agents_store:
+        print(f"Agent {agent_name} not found in agents_store")
+        yield {"type": "error", "error": "agent_not_found", "response": f"Agent {agent_name} not found", "conversation_id": conversation_id}
+        return
+    
+    agent = agents_store[agent_name]
+    if not ensure_agent_client(agent):
+        error_msg = "OpenAI API key is missing or invalid. Please check your environment variables."
+        print(error_msg)
+        yield {"type": "error", "error": "api_key_missing", "response": error_msg, "conversation_id": conversation_id}
+        return
+    
+    company_id = await get_project_company_id(session, project_id)
+    agent_input = await prepare_agent_input(session, agent_name, message, conversation_id, company_id)
+    
+    # A cached response is sent as a single token event
+    cached_response, cache_slot = await lookup_response(get_agent_config(agent_name), message, agent_input, get_openai_client())
+    if cached_response is not None:
+        print(f"Agent {agent_name} answered from the response cache")
+        yield {"type": "token", "delta": cached_response}
+        if session:
+            conversation_id = await persist_interaction(session, agent_name, message, cached_response, conversation_id, project_id)
+        yield {"type": "done", "response": cached_response, "conversation_id": conversation_id, "cached": True}
+        return
+    
+    # Hold a scheduler slot for the whole stream
+    try:
+        await llm_scheduler.scheduler.acquire(agent_name, company_id)
+    except llm_scheduler.AdmissionRejected as e:
+        yield {"type": "error", "error": "overloaded", "response": str(e), "retry_after": e.retry_after, "conversation_id": conversation_id}
+        return
+    started = time.monotonic()
+    result = None
+    events = None
+    chunks = []
+    finished = False
+    
+    # The slot is released in the finally below, whatever fails after it was acquired
+    try:
+        print(f"Streaming agent: {agent_name}")
+        result = Runner.run_streamed(agent, agent_input)
+        events = result.stream_events()
+        deadline = asyncio.get_running_loop().time() + 60.0  # Same 60 second budget as interact_with_agent
+        while True:
+            remaining = deadline - asyncio.get_running_loop().time()
+            try:
+                event = await asyncio.wait_for(events.__anext__(), timeout=max(remaining, 0))
+            except StopAsyncIteration:
+                finished = True
+                break
+            
+            if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+                if event.data.delta:
+                    chunks.append(event.data.delta)
+                    yield {"type": "token", "delta": event.data.delta}
+    except asyncio.TimeoutError:
+        result.cancel()
+        error_msg = f"Response from agent {agent_name} timed out after 60 seconds"
+        print(error_msg)
+        yield {"type": "error", "error": "timeout", "response": error_msg, "conversation_id": conversation_id}
+        return
+    except Exception as e:
+        if result is not None:
+            result.cancel()
+        error_msg = f"Error interacting with agent {agent_name}: {str(e)}"
+        print(error_msg)
+        yield {"type": "error", "error": "agent_error", "response": error_msg, "conversation_id": conversation_id}
+        return
+    finally:
+        # A client disconnect (GeneratorExit) skips the handlers above; stop the run,
+        # or closing the events would wait for the model to finish a response nobody reads
+        if result is not None and not finished:
+            result.cancel()
+        try:
+            if events is not None:
+                await events.aclose()
+        finally:
+            llm_scheduler.scheduler.release(agent_name, company_id, time.monotonic() - started)
+    
+    # Prefer the run's final output; fall back to the streamed text
+    response = result.final_output if isinstance(result.final_output, str) else "".join(chunks)
+    store_response(cache_slot, response)
+    print(f"Agent {agent_name} finished streaming")
+    
+    if session:
+        conversation_id = await persist_interaction(session, agent_name, message, response, conversation_id, project_id)
+    
+    yield {"type": "done", "response": response, "conversation_id": conversation_id}
+
 # Get conversation history
 async def get_conversation_history(session: AsyncSession, conversation_id: int, include_intermediate: bool = False) -> List[Dict[str, Any]]:
     """Get conversation history with filtering options.
@@ -499,43 +661,122 @@ async def get_conversation_history(session: AsyncSession, conversation_id: int,
     if not include_intermediate:
         query = query.where(db.MessageModel.role != "intermediate")
     
-    # Order by timestamp (created time)
-    query = query.order_by(db.MessageModel.timestamp)
+    # Order by created time (served by ix_messages_conversation_created)
+    query = query.order_by(db.MessageModel.created_at, db.MessageModel.id)
     
     result = await session.execute(query)
     messages = result.scalars().all()
     
-    # Convert to dictionaries and parse metadata
-    message_dicts = []
-    for message in messages:
-        message_dict = db.model_to_dict(message)
-        
-        # Parse metadata if present
-        if message.message_metadata is not None:
-            if isinstance(message.message_metadata, str):
-                try:
-                    message_dict["metadata"] = json.loads(message.message_metadata)
-                except:
-                    message_dict["metadata"] = message.message_metadata
-            else:
+    # Rehydrate archived messages of a cold conversation
+    archived = await message_archive.load_archived_messages(session, conversation_id)
+    if archived:
+        if not include_intermediate:
+            archived = [message for message in archived if message.role != "intermediate"]
+        messages = message_archive.merge_messages(archived, messages)
+    
+    return [message_to_dict(message) for message in messages]
+
+# Convert a message to a dictionary and parse its metadata
+def message_to_dict(message: db.MessageModel) -> Dict[str, Any]:
+    message_dict = db.model_to_dict(message)
+    
+    # Parse metadata if present
+    if message.message_metadata is not None:
+        if isinstance(message.message_metadata, str):
+            try:
+                message_dict["metadata"] = json.loads(message.message_metadata)
+            except:
                 message_dict["metadata"] = message.message_metadata
-                
-        message_dicts.append(message_dict)
+        else:
+            message_dict["metadata"] = message.message_metadata
     
-    return message_dicts
+    return message_dict
+
+# Get one page of a conversation's messages
+async def get_conversation_page(
+    session: AsyncSession,
+    conversation_id: int,
+    limit: Optional[int] = None,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    include_intermediate: bool = False
+) -> Dict[str, Any]:
+    """Get a page of conversation history, oldest message first.
+    
+    Without a cursor the most recent messages are returned; pass the page's
+    before_cursor to load older messages and its after_cursor to poll for newer ones.
+    
+    Args:
+        session: Database session
+        conversation_id: ID of the conversation to retrieve
+        limit: Maximum number of messages
+        before: Cursor; return messages older than it
+        after: Cursor; return messages newer than it
+        include_intermediate: Whether to include intermediate messages
+        
+    Returns:
+        Page dictionary with "items" (message dictionaries) and the paging cursors
+        
+    Raises:
+        pagination.InvalidCursor: If a cursor is malformed or both are given
+    """
+    query = select(db.MessageModel).where(db.MessageModel.conversation_id == conversation_id)
+    if not include_intermediate:
+        query = query.where(db.MessageModel.role != "intermediate")
+    
+    archived = await message_archive.load_archived_messages(session, conversation_id)
+    if archived:
+        # Cold conversation: page through the archived and stored messages in memory
+        if not include_intermediate:
+            archived = [message for message in archived if message.role != "intermediate"]
+        result = await session.execute(query)
+        messages = message_archive.merge_messages(archived, result.scalars().all())
+        page = pagination.page_list(messages, "created_at", "id", limit=limit, before=before, after=after)
+    else:
+        page = await pagination.fetch_page(
+            session, query, db.MessageModel.created_at, db.MessageModel.id,
+            limit=limit, before=before, after=after
+        )
+    page["items"] = [message_to_dict(message) for message in page["items"]]
+    return page
 
 # Get all conversations for an agent
-async def get_agent_conversations(session: AsyncSession, agent_name: str) -> List[Dict[str, Any]]:
-    result = await session.execute(
+async def get_agent_conversations(session: AsyncSession, agent_name: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    query = (
         select(db.ConversationModel)
         .join(db.AgentModel)
         .where(db.AgentModel.name == agent_name)
         .order_by(db.ConversationModel.updated_at.desc())
     )
+    if limit is not None:
+        query = query.limit(limit)
+    result = await session.execute(query)
     conversations = result.scalars().all()
     
     return [db.model_to_dict(conversation) for conversation in conversations]
 
+# Get one page of an agent's conversations, most recently created first
+async def get_agent_conversations_page(
+    session: AsyncSession,
+    agent_name: str,
+    limit: Optional[int] = None,
+    before: Optional[str] = None,
+    after: Optional[str] = None
+) -> Dict[str, Any]:
+    query = (
+        select(db.ConversationModel)
+        .join(db.AgentModel)
+        .where(db.AgentModel.name == agent_name)
+    )
+    # Keyed on creation time: updated_at moves on every saved message, which would
+    # skip or repeat conversations between pages
+    page = await pagination.fetch_page(
+        session, query, db.ConversationModel.created_at, db.ConversationModel.id,
+        limit=limit, before=before, after=after, newest_first=True
+    )
+    page["items"] = [db.model_to_dict(conversation) for conversation in page["items"]]
+    return page
+
 async def interact_with_agent_raw(agent_name: str, message: str, conversation_id: Optional[int] = None) -> str:
     """
     Interact with an agent and get only the raw response text.
@@ -557,28 +798,16 @@ async def interact_with_agent_raw(agent_name: str, message: str, conversation_id
     agent = agents_store[agent_name]
     
     # Make sure the agent has a properly configured OpenAI client
-    if (hasattr(agent, 'model') and 
-        hasattr(agent.model, 'openai_client') and 
-        (agent.model.openai_client is None or not agent.model.openai_client.api_key)):
-        client = get_openai_client()
-        if not client or not client.api_key:
-            raise ValueError("OpenAI API key is missing or invalid. Please check your environment variables.")
-        agent.model.openai_client = client
+    if not ensure_agent_client(agent):
+        raise ValueError("OpenAI API key is missing or invalid. Please check your environment variables.")
     
     try:
         # Run the agent to get a response - use a timeout to prevent hanging
-        response = await asyncio.wait_for(
-            Runner.amessage(
-                agent=agent,
-                message=message,
-                metadata={"conversation_id": conversation_id} if conversation_id else {}
-            ),
-            timeout=60.0  # 60 second timeout
-        )
+        result = await run_agent(agent, message, timeout=60.0)
         
         # Extract and return just the response text
-        if response and hasattr(response, 'response'):
-            return response.response
+        if result and isinstance(result.final_output, str):
+            return result.final_output
         else:
             raise ValueError(f"Invalid response format from agent {agent_name}")
     except asyncio.TimeoutError:
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+End-to-end load-testing benchmark for the backend API.
+
+Drives the interaction and list endpoints at increasing concurrency and reports
+latency percentiles, throughput, error counts and database time per request (from
+the X-DB-Time-Ms header). Run it against a backend pointed at mock_llm_server.py to
+measure the backend's own overhead reproducibly.
+
+Usage:
+    python mock_llm_server.py --port 4000 &
+    LITELLM_BASE_URL=http://127.0.0.1:4000/v1 uvicorn main:app --port 8000 &
+    python benchmark.py --setup --concurrency 1,4,16,64 --requests 200
+    python benchmark.py --scenarios project --project-id 3 --output results.json
+
+Scenarios:
+    interact      POST /interact/{agent}
+    multi_agent   POST /multi_agent_systems/{id}/interact
+    project       POST /projects/{id}/interact (requires --project-id)
+    list          GET /list_agents/, /multi_agent_systems/, /departments and /roadmap
+"""
+
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+LIST_ENDPOINTS = ["/list_agents/", "/multi_agent_systems/", "/departments", "/roadmap"]
+BENCH_AGENTS = ["bench_agent_a", "bench_agent_b"]
+BENCH_SYSTEM = "bench_system"
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = min(max(1, math.ceil(pct / 100.0 * len(sorted_values))), len(sorted_values))
+    return sorted_values[rank - 1]
+
+async def setup(client: httpx.AsyncClient) -> Dict[str, Any]:
+    """Create the benchmark agents and multi-agent system if they don't exist"""
+    for agent_name in BENCH_AGENTS:
+        response = await client.post("/create_agent/", json={
+            "name": agent_name,
+            "role": "Benchmark assistant",
+            "personality": "Answers briefly.",
+            "tools": []
+        })
+        response.raise_for_status()
+
+    response = await client.get("/multi_agent_systems/")
+    response.raise_for_status()
+    for system in response.json():
+        if system.get("name") == BENCH_SYSTEM:
+            return {"agent": BENCH_AGENTS[0], "system_id": system["id"]}
+
+    response = await client.post("/multi_agent_systems/", json={
+        "name": BENCH_SYSTEM,
+        "description": "Multi-agent system used by benchmark.py",
+        "agents": BENCH_AGENTS,
+        "triage_agent": BENCH_AGENTS[0]
+    })
+    response.raise_for_status()
+    return {"agent": BENCH_AGENTS[0], "system_id": response.json()["id"]}
+
+def build_request(scenario: str, index: int, targets: Dict[str, Any]) -> Dict[str, Any]:
+    message = f"Benchmark request {index}: summarize the status of ticket {index}."
+    if scenario == "interact":
+        return {"method": "POST", "url": f"/interact/{targets['agent']}", "json": {"message": message}}
+    if scenario == "multi_agent":
+        return {"method": "POST", "url": f"/multi_agent_systems/{targets['system_id']}/interact", "json": {"message": message}}
+    if scenario == "project":
+        return {"method": "POST", "url": f"/projects/{targets['project_id']}/interact", "json": {"message": message}}
+    if scenario == "list":
+        return {"method": "GET", "url": LIST_ENDPOINTS[index % len(LIST_ENDPOINTS)]}
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+async def run_level(client: httpx.AsyncClient, scenario: str, concurrency: int, total: int, targets: Dict[str, Any]) -> Dict[str, Any]:
+    """Send `total` requests with `concurrency` workers and summarize the results"""
+    latencies: List[float] = []
+    db_times: List[float] = []
+    db_queries: List[int] = []
+    status_counts: Dict[str, int] = {}
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while next_index < total:
+            index = next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                response = await client.request(**build_request(scenario, index, targets))
+                status = str(response.status_code)
+                # Some endpoints report failures in a 200 body
+                if response.status_code == 200 and response.headers.get("content-type", "").startswith("application/json"):
+                    body = response.json()
+                    if isinstance(body, dict) and body.get("error"):
+                        status = "200-error"
+                if "x-db-time-ms" in response.headers:
+                    db_times.append(float(response.headers["x-db-time-ms"]))
+                    db_queries.append(int(response.headers.get("x-db-queries", 0)))
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append((time.perf_counter() - started) * 1000.0)
+            status_counts[status] = status_counts.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    db_times.sort()
+    errors = sum(count for status, count in status_counts.items() if status != "200")
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "status_counts": status_counts,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else 0.0
+        },
+        "db_time_ms": {
+            "mean": sum(db_times) / len(db_times) if db_times else 0.0,
+            "p95": percentile(db_times, 95)
+        },
+        "db_queries_mean": sum(db_queries) / len(db_queries) if db_queries else 0.0
+    }
+
+def print_row(result: Dict[str, Any]):
+    latency = result["latency_ms"]
+    print(
+        f"{result['scenario']:<12} {result['concurrency']:>5} {result['requests']:>6} {result['errors']:>6} "
+        f"{result['throughput_rps']:>9.1f} {latency['p50']:>9.1f} {latency['p95']:>9.1f} {latency['p99']:>9.1f} "
+        f"{result['db_time_ms']['mean']:>8.2f} {result['db_time_ms']['p95']:>8.2f} {result['db_queries_mean']:>7.1f}"
+    )
+
+async def run(args) -> List[Dict[str, Any]]:
+    limits = httpx.Limits(max_connections=max(args.concurrency) * 2, max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        targets: Dict[str, Any] = {"agent": args.agent, "system_id": args.system_id, "project_id": args.project_id}
+        if args.setup:
+            created = await setup(client)
+            targets["agent"] = targets["agent"] or created["agent"]
+            targets["system_id"] = targets["system_id"] or created["system_id"]
+
+        scenarios = []
+        for scenario in args.scenarios:
+            missing = {"interact": "agent", "multi_agent": "system_id", "project": "project_id"}.get(scenario)
+            if missing and not targets.get(missing):
+                print(f"Skipping {scenario}: no {missing} (pass --{missing.replace('_', '-')} or --setup)", file=sys.stderr)
+                continue
+            scenarios.append(scenario)
+
+        print(f"{'scenario':<12} {'conc':>5} {'reqs':>6} {'errors':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'db ms':>8} {'db p95':>8} {'queries':>7}")
+        results = []
+        for scenario in scenarios:
+            if args.warmup:
+                await run_level(client, scenario, 1, args.warmup, targets)
+            for concurrency in args.concurrency:
+                result = await run_level(client, scenario, concurrency, args.requests, targets)
+                print_row(result)
+                results.append(result)
+        return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the backend API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenarios", default="interact,multi_agent,project,list",
+                        type=lambda value: [item.strip() for item in value.split(",") if item.strip()])
+    parser.add_argument("--concurrency", default="1,4,16,64",
+                        type=lambda value: [int(item) for item in value.split(",") if item.strip()])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario and concurrency level")
+    parser.add_argument("--warmup", type=int, default=5, help="Sequential warm-up requests per scenario")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--setup", action="store_true", help="Create benchmark agents and a multi-agent system")
+    parser.add_argument("--agent", help="Agent for the interact scenario")
+    parser.add_argument("--system-id", help="Multi-agent system for the multi_agent scenario")
+    parser.add_argument("--project-id", type=int, help="Project for the project scenario")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {len(results)} results to {args.output}")
+
+if __name__ == "__main__":
+    main()
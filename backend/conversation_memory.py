@@ -0,0 +1,258 @@
+"""
+Token-budgeted conversation memory.
+
+Builds the model input for a turn from the stored conversation: the most recent
+messages that fit in the token budget, preceded by a rolling summary of everything
+older. When the recent window overflows, only the messages that fall out of it are
+folded into the existing summary, so summarization cost per turn stays bounded no
+matter how long the conversation grows.
+
+A conversation with more unsummarized messages than are loaded per turn (one
+that predates summaries, or whose summary updates kept failing) has its older
+messages folded into the summary one chunk per turn, oldest first, so none are
+skipped and no turn makes more than two summary calls. Summary calls wait for a
+slot of the LLM scheduler like agent calls, and summaries are saved in their own
+session.
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import database as db
+import llm_scheduler
+import message_archive
+
+MEMORY_ENABLED = os.getenv("MEMORY_ENABLED", "true").lower() not in ("0", "false", "no", "off")
+
+# Total tokens of history (summary + recent messages) sent with each turn
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "3000"))
+
+# Share of the budget the summary may use
+MEMORY_SUMMARY_RATIO = float(os.getenv("MEMORY_SUMMARY_RATIO", "0.25"))
+
+# Upper bound on unsummarized messages loaded per turn (and folded per summary call when catching up)
+MEMORY_MAX_MESSAGES = int(os.getenv("MEMORY_MAX_MESSAGES", "200"))
+
+# Model used to update summaries
+MEMORY_SUMMARY_MODEL = os.getenv("MEMORY_SUMMARY_MODEL", "gpt-4o")
+
+_encoding = None
+_encoding_unavailable = False
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken, falling back to a 4-characters-per-token estimate."""
+    global _encoding, _encoding_unavailable
+    if not text:
+        return 0
+    if _encoding is None and not _encoding_unavailable:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # The encoding is downloaded on first use; don't retry on every call
+            print(f"Warning: tiktoken encoding unavailable, estimating token counts: {str(e)}")
+            _encoding_unavailable = True
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // 4)
+
+def _message_tokens(message: db.MessageModel) -> int:
+    # Small per-message overhead for role and separators
+    return count_tokens(message.content or "") + 4
+
+async def _summarize(
+    previous_summary: str,
+    messages: List[db.MessageModel],
+    max_tokens: int,
+    agent_name: str = "conversation_memory",
+    company_id: Optional[Any] = None
+) -> Optional[str]:
+    """Fold messages into the previous summary with one LLM call, admitted by the scheduler under the agent's flow."""
+    # Imported here to avoid a circular import with agent_utils
+    from agent_utils import get_openai_client
+
+    client = get_openai_client()
+    if not client:
+        return None
+
+    transcript = "\n".join(f"{message.role}: {message.content}" for message in messages)
+    prompt = f"""
+    Update the running summary of a conversation between a user and an AI assistant.
+    Keep facts, names, numbers, decisions and open questions the assistant will need later.
+    Write at most {max_tokens} tokens of plain prose.
+
+    Current summary:
+    {previous_summary or "(empty)"}
+
+    New messages to fold into the summary:
+    {transcript}
+
+    Updated summary:
+    """
+
+    async with llm_scheduler.scheduler.slot(agent_name, company_id):
+        response = await client.chat.completions.create(
+            model=MEMORY_SUMMARY_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=0.2
+        )
+    return (response.choices[0].message.content or "").strip()
+
+async def _older_unsummarized(
+    session: AsyncSession,
+    conversation_id: int,
+    after_id: int,
+    before_id: int,
+    archived: List[db.MessageModel]
+) -> List[db.MessageModel]:
+    """The oldest chunk of unsummarized messages that precede the loaded window, in order"""
+    result = await session.execute(
+        select(db.MessageModel)
+        .where(db.MessageModel.conversation_id == conversation_id)
+        .where(db.MessageModel.id > after_id)
+        .where(db.MessageModel.id < before_id)
+        .where(db.MessageModel.role.in_(["user", "assistant"]))
+        .order_by(db.MessageModel.created_at, db.MessageModel.id)
+        .limit(MEMORY_MAX_MESSAGES)
+    )
+    older_archived = [stored for stored in archived if after_id < stored.id < before_id]
+    return message_archive.merge_messages(older_archived, result.scalars().all())[:MEMORY_MAX_MESSAGES]
+
+async def build_context(
+    session: AsyncSession,
+    conversation_id: Optional[int],
+    message: str,
+    token_budget: int = MEMORY_TOKEN_BUDGET,
+    agent_name: str = "conversation_memory",
+    company_id: Optional[Any] = None
+) -> Any:
+    """
+    Build the model input for a new user message.
+
+    Args:
+        session: Database session
+        conversation_id: Conversation the message belongs to, if any
+        message: The new user message
+        token_budget: Token budget for the history (summary + recent messages)
+        agent_name: Agent the turn is for; summary calls are scheduled under its flow
+        company_id: Company the turn is billed to by the scheduler
+
+    Returns:
+        The plain message when there is no history, otherwise a list of input items
+        (optional summary, recent messages in order, then the new user message)
+    """
+    if not MEMORY_ENABLED or not conversation_id:
+        return message
+
+    result = await session.execute(
+        select(db.ConversationSummaryModel).where(db.ConversationSummaryModel.conversation_id == conversation_id)
+    )
+    summary_row = result.scalars().first()
+    summarized_until_id = summary_row.summarized_until_id if summary_row else 0
+
+    # Newest unsummarized messages first
+    result = await session.execute(
+        select(db.MessageModel)
+        .where(db.MessageModel.conversation_id == conversation_id)
+        .where(db.MessageModel.id > summarized_until_id)
+        .where(db.MessageModel.role.in_(["user", "assistant"]))
+        .order_by(db.MessageModel.created_at.desc(), db.MessageModel.id.desc())
+        .limit(MEMORY_MAX_MESSAGES)
+    )
+    newest_first = result.scalars().all()
+    
+    # Continuing an archived conversation: its recent history may be in the archive
+    archived = [
+        stored for stored in await message_archive.load_archived_messages(session, conversation_id)
+        if stored.id > summarized_until_id and stored.role in ("user", "assistant")
+    ]
+    if archived:
+        newest_first = message_archive.merge_messages(archived, newest_first)[::-1][:MEMORY_MAX_MESSAGES]
+
+    if not newest_first and not summary_row:
+        return message
+
+    summary_budget = int(token_budget * MEMORY_SUMMARY_RATIO)
+    previous_summary = summary_row.summary if summary_row else ""
+
+    async def save_summary(new_summary: str, summarized_until_id: int):
+        nonlocal previous_summary
+        previous_summary = new_summary
+        # Written in its own session so the caller's unit of work isn't committed early
+        try:
+            async with db.async_session_factory() as summary_session:
+                await summary_session.merge(db.ConversationSummaryModel(
+                    conversation_id=conversation_id,
+                    summary=new_summary,
+                    summarized_until_id=summarized_until_id,
+                    token_count=count_tokens(new_summary)
+                ))
+                await summary_session.commit()
+        except Exception as e:
+            print(f"Error saving summary for conversation {conversation_id}: {str(e)}")
+
+    # More unsummarized messages than were loaded: fold the oldest chunk into the
+    # summary first, or marking the overflow summarized would skip them. Only one
+    # chunk is folded per turn so a long backlog doesn't stall the request; the
+    # overflow waits until the backlog is caught up
+    caught_up = True
+    if len(newest_first) == MEMORY_MAX_MESSAGES:
+        oldest_loaded_id = newest_first[-1].id
+        chunk = await _older_unsummarized(session, conversation_id, summarized_until_id, oldest_loaded_id, archived)
+        if chunk:
+            try:
+                new_summary = await _summarize(previous_summary, chunk, summary_budget, agent_name, company_id)
+            except Exception as e:
+                print(f"Error summarizing older messages of conversation {conversation_id}: {str(e)}")
+                new_summary = None
+            if new_summary is not None:
+                summarized_until_id = chunk[-1].id
+                await save_summary(new_summary, summarized_until_id)
+            # A full chunk may have more older messages behind it
+            caught_up = new_summary is not None and len(chunk) < MEMORY_MAX_MESSAGES
+
+    recent_budget = token_budget - summary_budget - count_tokens(message)
+
+    used = 0
+    recent: List[db.MessageModel] = []
+    for stored in newest_first:
+        tokens = _message_tokens(stored)
+        if used + tokens > recent_budget:
+            break
+        used += tokens
+        recent.append(stored)
+
+    overflow = newest_first[len(recent):]
+    if overflow and caught_up:
+        # Evict down to three quarters of the window so the next few turns fit
+        # without another summarization call
+        target = int(recent_budget * 0.75)
+        while recent and used > target:
+            evicted = recent.pop()
+            used -= _message_tokens(evicted)
+            overflow.insert(0, evicted)
+
+        chronological_overflow = list(reversed(overflow))
+        try:
+            new_summary = await _summarize(previous_summary, chronological_overflow, summary_budget, agent_name, company_id)
+        except Exception as e:
+            print(f"Error updating summary for conversation {conversation_id}: {str(e)}")
+            new_summary = None
+
+        if new_summary is not None:
+            await save_summary(new_summary, chronological_overflow[-1].id)
+
+    items: List[Dict[str, str]] = []
+    if previous_summary:
+        items.append({
+            "role": "system",
+            "content": f"Summary of the earlier conversation:\n{previous_summary}"
+        })
+    for stored in reversed(recent):
+        items.append({"role": stored.role, "content": stored.content or ""})
+    items.append({"role": "user", "content": message})
+    return items
@@ -56,7 +56,8 @@ class CustomToolManager:
                 self.custom_tools[tool_name] = {
                     "definition": definition,
                     "function": function,
-                    "module": module
+                    "module": module,
+                    "file": implementation_file
                 }
                 
                 print(f"Loaded custom tool: {tool_name}")
@@ -74,6 +75,11 @@ class CustomToolManager:
             for tool_name, tool_info in self.custom_tools.items()
         }
     
+    def get_custom_tool_file(self, tool_name: str) -> Optional[str]:
+        """Get the implementation file of a custom tool"""
+        tool_info = self.custom_tools.get(tool_name)
+        return tool_info.get("file") if tool_info else None
+    
     def get_custom_tool_descriptions(self) -> List[Dict[str, str]]:
         """Get descriptions of all custom tools for display in the UI"""
         return [
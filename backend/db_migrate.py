@@ -3,11 +3,16 @@
 Database migration script for Gargash AI Builder Platform.
 This script provides a command-line interface for managing database migrations.
 
+The database is taken from DATABASE_URL (SQLite at data/gargash.db by default).
+
 Usage:
+    python db_migrate.py init                        - Create the schema of a new database
     python db_migrate.py create "Migration message"  - Create a new migration
     python db_migrate.py upgrade                     - Apply all pending migrations
     python db_migrate.py downgrade                   - Revert the last migration
     python db_migrate.py history                     - Show migration history
+    python db_migrate.py check-indexes               - Check hot queries use their indexes
+    python db_migrate.py archive [--days N]          - Archive the messages of idle conversations
 """
 
 import os
@@ -26,6 +31,20 @@ def run_alembic_command(command, *args):
         print(f"Error executing Alembic command: {e}")
         return False
 
+def init_database():
+    """Create all tables in a new database and stamp it with the latest revision.
+    The earliest revisions alter a pre-existing schema, so a new database
+    (e.g. a fresh PostgreSQL instance) starts from the models instead."""
+    import asyncio
+    import database as db
+
+    async def create_tables():
+        await db.init_db()
+        await db.engine.dispose()
+
+    asyncio.run(create_tables())
+    return run_alembic_command("stamp", "head")
+
 def create_migration(message):
     """Create a new migration with the given message."""
     return run_alembic_command("revision", "--autogenerate", "-m", message)
@@ -42,11 +61,137 @@ def show_history():
     """Show the migration history."""
     return run_alembic_command("history")
 
+def hot_queries():
+    """The hottest conversation/message queries and the index each one should use."""
+    import datetime
+    from sqlalchemy import select, or_, and_
+    import database as db
+
+    cursor_time = datetime.datetime(2024, 1, 1)
+
+    return [
+        ("conversation history (get_conversation_history)",
+         select(db.MessageModel)
+         .where(db.MessageModel.conversation_id == 1)
+         .where(db.MessageModel.role != "intermediate")
+         .order_by(db.MessageModel.created_at, db.MessageModel.id),
+         "ix_messages_conversation_created"),
+        ("page of messages before a cursor (get_conversation_page)",
+         select(db.MessageModel)
+         .where(db.MessageModel.conversation_id == 1)
+         .where(or_(
+             db.MessageModel.created_at < cursor_time,
+             and_(db.MessageModel.created_at == cursor_time, db.MessageModel.id < 1)
+         ))
+         .order_by(db.MessageModel.created_at.desc(), db.MessageModel.id.desc())
+         .limit(101),
+         "ix_messages_conversation_created"),
+        ("recent unsummarized messages (conversation_memory.build_context)",
+         select(db.MessageModel)
+         .where(db.MessageModel.conversation_id == 1)
+         .where(db.MessageModel.id > 0)
+         .where(db.MessageModel.role.in_(["user", "assistant"]))
+         .order_by(db.MessageModel.created_at.desc(), db.MessageModel.id.desc())
+         .limit(200),
+         "ix_messages_conversation_created"),
+        ("latest conversation of an agent (save_message)",
+         select(db.ConversationModel)
+         .where(db.ConversationModel.agent_id == 1)
+         .where(db.ConversationModel.is_batch == False)
+         .order_by(db.ConversationModel.updated_at.desc())
+         .limit(1),
+         "ix_conversations_agent_updated"),
+        ("conversations of an agent (get_agent_conversations)",
+         select(db.ConversationModel)
+         .join(db.AgentModel)
+         .where(db.AgentModel.name == "agent")
+         .order_by(db.ConversationModel.updated_at.desc()),
+         "ix_conversations_agent_updated"),
+        ("page of an agent's conversations (get_agent_conversations_page)",
+         select(db.ConversationModel)
+         .where(db.ConversationModel.agent_id == 1)
+         .where(or_(
+             db.ConversationModel.created_at < cursor_time,
+             and_(db.ConversationModel.created_at == cursor_time, db.ConversationModel.id < 1)
+         ))
+         .order_by(db.ConversationModel.created_at.desc(), db.ConversationModel.id.desc())
+         .limit(101),
+         "ix_conversations_agent_created"),
+        ("latest conversation of a project (interact_with_project)",
+         select(db.ConversationModel)
+         .where(db.ConversationModel.project_id == 1)
+         .order_by(db.ConversationModel.updated_at.desc())
+         .limit(1),
+         "ix_conversations_project_updated"),
+        ("agents of a project (project solutions)",
+         select(db.ProjectSolutionModel.agent_id)
+         .where(db.ProjectSolutionModel.project_id == 1),
+         "ix_project_solutions_project_agent"),
+        ("multi-agent conversation history",
+         select(db.MultiAgentMessageModel)
+         .where(db.MultiAgentMessageModel.conversation_id == 1)
+         .order_by(db.MultiAgentMessageModel.created_at, db.MultiAgentMessageModel.id),
+         "ix_multi_agent_messages_conversation_created"),
+    ]
+
+def check_indexes(db_path=None):
+    """Run EXPLAIN QUERY PLAN for the hot queries and check each uses its index without a sort."""
+    import sqlite3
+    from sqlalchemy import make_url
+    from sqlalchemy.dialects import sqlite
+    import database as db
+
+    if db_path is None:
+        if db.DATABASE_BACKEND != "sqlite":
+            print("check-indexes inspects SQLite query plans; pass --db with a SQLite file")
+            return False
+        db_path = make_url(db.DATABASE_URL).database
+
+    conn = sqlite3.connect(db_path)
+    failures = 0
+    try:
+        for description, query, index_name in hot_queries():
+            sql = str(query.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+            plan = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()]
+            uses_index = any(index_name in step for step in plan)
+            sorts = any("TEMP B-TREE" in step for step in plan)
+            ok = uses_index and not sorts
+            failures += 0 if ok else 1
+            print(f"[{'OK' if ok else 'FAIL'}] {description}")
+            for step in plan:
+                print(f"       {step}")
+    finally:
+        conn.close()
+
+    if failures:
+        print(f"{failures} queries are not using their indexes. Run 'python db_migrate.py upgrade'.")
+    return failures == 0
+
+def archive_conversations(days=None):
+    """Move the messages of conversations idle for more than `days` into the archive."""
+    import asyncio
+    import database as db
+    import message_archive
+
+    async def run():
+        try:
+            return await message_archive.archive_idle_conversations(db.async_session_factory, days)
+        finally:
+            await db.engine.dispose()
+
+    totals = asyncio.run(run())
+    print(f"Archived {totals['messages']} messages of {totals['conversations']} conversations "
+          f"({totals['raw_bytes']} -> {totals['compressed_bytes']} bytes)")
+    return True
+
 def main():
     """Main function to handle command-line arguments."""
     parser = argparse.ArgumentParser(description="Database migration tool for Gargash AI Builder Platform")
     subparsers = parser.add_subparsers(dest="command", help="Command to run")
 
+    # Initialize
+    subparsers.add_parser("init", help="Create the schema of a new database")
+
     # Create migration
     create_parser = subparsers.add_parser("create", help="Create a new migration")
     create_parser.add_argument("message", help="Migration message")
@@ -64,9 +209,20 @@ def main():
     # History
     subparsers.add_parser("history", help="Show migration history")
 
+    # Query plan check
+    check_parser = subparsers.add_parser("check-indexes", help="Check that hot queries use their indexes")
+    check_parser.add_argument("--db", help="SQLite database file (default: the DATABASE_URL database)")
+
+    # Archive idle conversations
+    archive_parser = subparsers.add_parser("archive", help="Archive the messages of idle conversations")
+    archive_parser.add_argument("--days", type=float, help="Idle days before archiving (default: ARCHIVE_AFTER_DAYS)")
+
     args = parser.parse_args()
 
-    if args.command == "create":
+    if args.command == "init":
+        if init_database():
+            print("Database initialized")
+    elif args.command == "create":
         if create_migration(args.message):
             print(f"Migration created: {args.message}")
     elif args.command == "upgrade":
@@ -77,6 +233,11 @@ def main():
             print(f"Database downgraded by: {args.revision}")
     elif args.command == "history":
         show_history()
+    elif args.command == "check-indexes":
+        if not check_indexes(args.db):
+            sys.exit(1)
+    elif args.command == "archive":
+        archive_conversations(args.days)
     else:
         parser.print_help()
 
@@ -0,0 +1,130 @@
+"""
+Process-wide registry of LLM clients.
+
+All AsyncOpenAI clients pointing at the LiteLLM gateway are created here so that
+every agent, analyzer and generator shares one keep-alive HTTP connection pool per
+base URL instead of opening its own sockets (and paying a TLS handshake) per client.
+"""
+
+import os
+import importlib.util
+from typing import Dict, Optional, Tuple
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+# Default LiteLLM gateway, overridable with LITELLM_BASE_URL
+DEFAULT_BASE_URL = "https://litellm.deriv.ai/v1"
+
+# Shared HTTP connection pools, one per base URL
+_http_clients: Dict[str, httpx.AsyncClient] = {}
+
+# Limits each shared pool was created with
+_pool_limits: Dict[str, httpx.Limits] = {}
+
+# AsyncOpenAI clients, one per (base URL, API key); they all reuse the pool of their base URL
+_llm_clients: Dict[Tuple[str, str], AsyncOpenAI] = {}
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+def get_base_url() -> str:
+    """Get the configured LLM gateway base URL."""
+    return os.getenv("LITELLM_BASE_URL", DEFAULT_BASE_URL)
+
+def http2_enabled() -> bool:
+    """Whether HTTP/2 should be negotiated with the gateway.
+
+    LLM_HTTP2 accepts true/false or "auto" (the default), which enables HTTP/2
+    only when the optional ``h2`` package is installed.
+    """
+    setting = os.getenv("LLM_HTTP2", "auto").lower()
+    if setting in ("0", "false", "no", "off"):
+        return False
+    available = importlib.util.find_spec("h2") is not None
+    if setting in ("1", "true", "yes", "on") and not available:
+        print("Warning: LLM_HTTP2 is enabled but the 'h2' package is not installed, falling back to HTTP/1.1")
+    return available
+
+def _get_http_client(base_url: str) -> httpx.AsyncClient:
+    """Get or create the shared connection pool for a base URL."""
+    http_client = _http_clients.get(base_url)
+    if http_client is None:
+        # LLM_MAX_CONNECTIONS caps concurrent connections (and therefore in-flight
+        # requests) to a single gateway host; extra requests wait for a free slot
+        # for up to LLM_POOL_TIMEOUT seconds.
+        limits = httpx.Limits(
+            max_connections=_env_int("LLM_MAX_CONNECTIONS", 100),
+            max_keepalive_connections=_env_int("LLM_MAX_KEEPALIVE_CONNECTIONS", 20),
+            keepalive_expiry=_env_float("LLM_KEEPALIVE_EXPIRY", 30.0)
+        )
+        http_client = DefaultAsyncHttpxClient(limits=limits, http2=http2_enabled())
+        _http_clients[base_url] = http_client
+        _pool_limits[base_url] = limits
+        print(f"Created shared LLM connection pool for {base_url} (max_connections={limits.max_connections})")
+    return http_client
+
+def get_llm_client(api_key: str, base_url: Optional[str] = None) -> AsyncOpenAI:
+    """
+    Get the shared AsyncOpenAI client for an API key and base URL.
+
+    Args:
+        api_key: API key for the gateway
+        base_url: Gateway base URL, defaults to LITELLM_BASE_URL
+
+    Returns:
+        An AsyncOpenAI client backed by the shared connection pool
+    """
+    base_url = base_url or get_base_url()
+    key = (base_url, api_key)
+    client = _llm_clients.get(key)
+    if client is None:
+        client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=_get_http_client(base_url),
+            # Set on the client, not the pool: the SDK passes its own timeout with
+            # every request and fails when the pool carries an httpx.Timeout too
+            timeout=httpx.Timeout(
+                _env_float("LLM_REQUEST_TIMEOUT", 600.0),
+                connect=_env_float("LLM_CONNECT_TIMEOUT", 5.0),
+                pool=_env_float("LLM_POOL_TIMEOUT", 30.0)
+            )
+        )
+        _llm_clients[key] = client
+    return client
+
+def get_pool_stats() -> Dict[str, Dict[str, Optional[int]]]:
+    """Get the configured limits and open connections of each shared connection pool."""
+    stats = {}
+    for base_url, http_client in _http_clients.items():
+        limits = _pool_limits[base_url]
+        # httpx doesn't expose its pool; the open connection count is left out
+        # (None) rather than failing /health if its internals change
+        try:
+            open_connections = len(http_client._transport._pool.connections)
+        except Exception:
+            open_connections = None
+        stats[base_url] = {
+            "max_connections": limits.max_connections,
+            "max_keepalive_connections": limits.max_keepalive_connections,
+            "open_connections": open_connections
+        }
+    return stats
+
+async def close_llm_clients():
+    """Close all shared connection pools."""
+    for http_client in _http_clients.values():
+        await http_client.aclose()
+    _http_clients.clear()
+    _pool_limits.clear()
+    _llm_clients.clear()
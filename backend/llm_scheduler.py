@@ -0,0 +1,291 @@
+"""
+Admission control for LLM calls.
+
+Every agent run takes a slot from a shared scheduler before it talks to the LiteLLM
+gateway. The scheduler enforces a global concurrency limit plus per-agent and
+per-company limits. When no slot is free, callers wait in a bounded queue ordered by
+weighted fair queueing (WFQ): each flow (a company, or the agent itself when no
+company is known) gets virtual finish tags, so a burst from one flow cannot starve
+the others. When the queue is full, or a caller has waited too long, the call is
+rejected with AdmissionRejected carrying a Retry-After estimate.
+
+The scheduler is shared across threads and event loops (Slack handlers run their
+own loops), so its state is guarded by a thread lock and waiters are woken on the
+loop they are waiting on.
+"""
+
+import os
+import math
+import time
+import asyncio
+import itertools
+import threading
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+class AdmissionRejected(Exception):
+    """Raised when an LLM call cannot be admitted; maps to HTTP 429"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class _Waiter:
+    __slots__ = ("start_tag", "finish_tag", "seq", "agent", "company", "loop", "future", "granted")
+
+    def __init__(self, start_tag, finish_tag, seq, agent, company, loop, future):
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.seq = seq
+        self.agent = agent
+        self.company = company
+        self.loop = loop
+        self.future = future
+        self.granted = False
+
+def _parse_weights(value: str) -> Dict[str, float]:
+    # "3=2,7=0.5" -> {"3": 2.0, "7": 0.5}
+    weights = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        key, _, weight = item.partition("=")
+        try:
+            weights[key.strip()] = float(weight)
+        except ValueError:
+            print(f"Warning: ignoring invalid LLM flow weight '{item}'")
+    return weights
+
+class LLMScheduler:
+    """
+    Concurrency limiter with weighted fair queueing between flows.
+
+    Args:
+        max_concurrency: Maximum concurrent LLM calls in this process
+        per_agent_limit: Maximum concurrent calls per agent (0 disables the limit)
+        per_company_limit: Maximum concurrent calls per company (0 disables the limit)
+        max_queue: Maximum number of waiting calls before new ones are rejected
+        queue_timeout: Seconds a call may wait for a slot before it is rejected
+        company_weights: Optional WFQ weight per company ID (default 1.0)
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 32,
+        per_agent_limit: int = 8,
+        per_company_limit: int = 16,
+        max_queue: int = 256,
+        queue_timeout: float = 30.0,
+        company_weights: Optional[Dict[str, float]] = None
+    ):
+        self.max_concurrency = max_concurrency
+        self.per_agent_limit = per_agent_limit
+        self.per_company_limit = per_company_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.company_weights = company_weights or {}
+
+        self._lock = threading.Lock()
+        self._active = 0
+        self._active_agents: Counter = Counter()
+        self._active_companies: Counter = Counter()
+        self._waiters: List[_Waiter] = []  # Sorted by (finish_tag, seq)
+        self._virtual_time = 0.0
+        # Finish tag and queued + active calls of each flow; idle flows are dropped
+        self._flow_finish: Dict[str, float] = {}
+        self._flow_load: Counter = Counter()
+        self._seq = itertools.count()
+
+        # Exponentially weighted average of how long a call holds its slot
+        self._avg_service_time = 5.0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def _has_capacity(self, agent: str, company: Optional[str]) -> bool:
+        if self._active >= self.max_concurrency:
+            return False
+        if self.per_agent_limit and self._active_agents[agent] >= self.per_agent_limit:
+            return False
+        if company is not None and self.per_company_limit and self._active_companies[company] >= self.per_company_limit:
+            return False
+        return True
+
+    def _take(self, agent: str, company: Optional[str]):
+        self._active += 1
+        self._active_agents[agent] += 1
+        if company is not None:
+            self._active_companies[company] += 1
+        self.admitted += 1
+
+    def _give_back(self, agent: str, company: Optional[str]):
+        self._active -= 1
+        self._active_agents[agent] -= 1
+        if not self._active_agents[agent]:
+            del self._active_agents[agent]
+        if company is not None:
+            self._active_companies[company] -= 1
+            if not self._active_companies[company]:
+                del self._active_companies[company]
+
+    @staticmethod
+    def _flow(agent: str, company: Optional[str]) -> str:
+        return f"company:{company}" if company is not None else f"agent:{agent}"
+
+    def _flow_done(self, flow: str):
+        # A flow without queued or active calls starts again at the current virtual
+        # time, so its finish tag need not be kept
+        self._flow_load[flow] -= 1
+        if self._flow_load[flow] <= 0:
+            del self._flow_load[flow]
+            self._flow_finish.pop(flow, None)
+
+    def _dispatch(self):
+        # Grant slots in finish-tag order, skipping waiters whose agent or company is
+        # at its limit so they don't block other flows
+        index = 0
+        while index < len(self._waiters) and self._active < self.max_concurrency:
+            waiter = self._waiters[index]
+            if not self._has_capacity(waiter.agent, waiter.company):
+                index += 1
+                continue
+            del self._waiters[index]
+            self._take(waiter.agent, waiter.company)
+            self._virtual_time = max(self._virtual_time, waiter.start_tag)
+            waiter.granted = True
+            waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+
+    def retry_after(self) -> int:
+        """Estimate in seconds of how long until a new call could be admitted"""
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(backlog * self._avg_service_time / max(self.max_concurrency, 1)))
+
+    def is_saturated(self) -> bool:
+        """Whether a new call would be rejected right now because the queue is full"""
+        with self._lock:
+            return len(self._waiters) >= self.max_queue
+
+    async def acquire(self, agent_name: str, company_id: Optional[Any] = None):
+        """
+        Wait for a slot for one LLM call.
+
+        Raises:
+            AdmissionRejected: If the wait queue is full or the wait times out
+        """
+        loop = asyncio.get_running_loop()
+        company = str(company_id) if company_id is not None else None
+        flow = self._flow(agent_name, company)
+        weight = self.company_weights.get(company, 1.0) if company is not None else 1.0
+
+        with self._lock:
+            start_tag = max(self._virtual_time, self._flow_finish.get(flow, 0.0))
+            finish_tag = start_tag + 1.0 / max(weight, 1e-6)
+
+            if not self._waiters and self._has_capacity(agent_name, company):
+                self._flow_finish[flow] = finish_tag
+                self._flow_load[flow] += 1
+                self._virtual_time = max(self._virtual_time, start_tag)
+                self._take(agent_name, company)
+                return
+
+            if len(self._waiters) >= self.max_queue:
+                self.rejected_queue_full += 1
+                raise AdmissionRejected(
+                    f"Too many pending requests for the language model (queue of {self.max_queue} is full)",
+                    self.retry_after()
+                )
+
+            self._flow_finish[flow] = finish_tag
+            self._flow_load[flow] += 1
+            waiter = _Waiter(start_tag, finish_tag, next(self._seq), agent_name, company, loop, loop.create_future())
+            position = len(self._waiters)
+            while position and (self._waiters[position - 1].finish_tag, self._waiters[position - 1].seq) > (finish_tag, waiter.seq):
+                position -= 1
+            self._waiters.insert(position, waiter)
+            self.queued += 1
+            # A slot may be free for this waiter even though others are blocked
+            self._dispatch()
+
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                if not waiter.granted:
+                    self._waiters.remove(waiter)
+                    self._flow_done(flow)
+                    if isinstance(e, asyncio.TimeoutError):
+                        self.rejected_timeout += 1
+                        raise AdmissionRejected(
+                            f"Timed out after {self.queue_timeout:g}s waiting for a language model slot",
+                            self.retry_after()
+                        ) from None
+                    raise
+            if isinstance(e, asyncio.CancelledError):
+                # Granted just as the caller gave up; hand the slot on
+                self.release(agent_name, company_id)
+                raise
+        finally:
+            waited = time.monotonic() - started
+            with self._lock:
+                self.total_wait_time += waited
+                self.max_wait_time = max(self.max_wait_time, waited)
+
+    def release(self, agent_name: str, company_id: Optional[Any] = None, service_time: Optional[float] = None):
+        """Return a slot and admit the next waiters"""
+        company = str(company_id) if company_id is not None else None
+        with self._lock:
+            self._give_back(agent_name, company)
+            self._flow_done(self._flow(agent_name, company))
+            if service_time is not None:
+                self._avg_service_time = 0.9 * self._avg_service_time + 0.1 * service_time
+            self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, agent_name: str, company_id: Optional[Any] = None) -> AsyncIterator[None]:
+        """Hold a slot for the duration of an LLM call"""
+        await self.acquire(agent_name, company_id)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(agent_name, company_id, time.monotonic() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get current load and admission counters"""
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "per_agent_limit": self.per_agent_limit,
+                "per_company_limit": self.per_company_limit,
+                "max_queue": self.max_queue,
+                "queue_timeout": self.queue_timeout,
+                "active": self._active,
+                "queued_now": len(self._waiters),
+                "flows": len(self._flow_finish),
+                "active_by_agent": dict(self._active_agents),
+                "active_by_company": dict(self._active_companies),
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "rejected_queue_full": self.rejected_queue_full,
+                "rejected_timeout": self.rejected_timeout,
+                "avg_wait_time": self.total_wait_time / self.queued if self.queued else 0.0,
+                "max_wait_time": self.max_wait_time,
+                "avg_service_time": self._avg_service_time
+            }
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(True)
+
+# Shared scheduler for all LLM calls made by agents
+scheduler = LLMScheduler(
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "32")),
+    per_agent_limit=int(os.getenv("LLM_PER_AGENT_CONCURRENCY", "8")),
+    per_company_limit=int(os.getenv("LLM_PER_COMPANY_CONCURRENCY", "16")),
+    max_queue=int(os.getenv("LLM_QUEUE_SIZE", "256")),
+    queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "30")),
+    company_weights=_parse_weights(os.getenv("LLM_COMPANY_WEIGHTS", ""))
+)
@@ -1,21 +1,36 @@
 import os
 import time
 import asyncio
-from fastapi import FastAPI, HTTPException, Depends, Query, UploadFile, Form
+from fastapi import FastAPI, HTTPException, Depends, Query, UploadFile, Form, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from openai import AsyncOpenAI
-from typing import List, Dict, Optional, Any, Union
+from typing import List, Dict, Optional, Any, Union, Literal
 from dotenv import load_dotenv
 import agent_utils
 import agent_tools
+import llm_clients
+import llm_scheduler
+from tool_executor import tool_executor
+from read_model_cache import read_models, SECTORS, AGENT_LIST
+import message_store
+import response_cache
 import multi_agent_service
+import agent_router
+import speculation
+import workflow_dag
+import sequential_pipeline
+import workflow_runs
 import project_management
+import query_profiler
+import pagination
+import message_search
+import message_archive
 from models import AgentConnection, MultiAgentSystem, MultiAgentSystemResponse
 import database as db_module
 from sqlalchemy.ext.asyncio import AsyncSession
 import uuid
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
 from sqlalchemy import select, func
 import datetime
 import json
@@ -36,6 +51,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Report database time per request (X-DB-Time-Ms / X-DB-Queries / X-DB-Slowest-Ms headers)
+# and aggregate it per route (GET /debug/queries)
+query_profiler.install(db_module.engine)
+
+@app.middleware("http")
+async def db_timing_middleware(request, call_next):
+    stats = query_profiler.start_request()
+    response = await call_next(request)
+    response.headers["X-DB-Time-Ms"] = f"{stats.db_time * 1000:.2f}"
+    response.headers["X-DB-Queries"] = str(stats.queries)
+    response.headers["X-DB-Slowest-Ms"] = f"{stats.slowest[0][0] * 1000:.2f}" if stats.slowest else "0.00"
+    route = request.scope.get("route")
+    query_profiler.finish_request(f"{request.method} {route.path if route else 'unmatched'}", stats)
+    return response
+
+# LLM calls rejected by the admission scheduler: ask clients to back off
+@app.exception_handler(llm_scheduler.AdmissionRejected)
+async def admission_rejected_handler(request, exc: llm_scheduler.AdmissionRejected):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 # Initialize OpenAI client
 openai_client = None
 
@@ -50,83 +89,21 @@ async def startup_event():
     os.makedirs("data/profile_pictures", exist_ok=True)
     print("Created profile pictures directory")
     
-    # Initialize database
+    # Create any missing tables (all of them, slack_bots included, are defined in database.py)
     await db_module.init_db()
     
-    # Ensure all required tables exist
-    try:
-        # Run our migration script first
-        import migration_script
-        print("Running database migrations...")
-        migration_script.ensure_tables_exist()
-        
-        # Then try the other integration scripts
-        try:
-            import slack_integration
-            if hasattr(slack_integration, 'ensure_slack_table_exists'):
-                print("Ensuring Slack tables exist...")
-                slack_integration.ensure_slack_table_exists()
-        except ImportError:
-            print("Warning: Could not import slack_integration module")
-        
-        # Then try the other migration script as fallback
-        try:
-            print("Running migrations from migration_script...")
-            migration_script.ensure_tables_exist()
-        except Exception as e:
-            print(f"Warning: Migration script error: {str(e)}")
-        
-        # Always attempt direct SQL creation as a last resort
-        try:
-            import sqlite3
-            
-            # Find database path
-            db_paths = ["./app.db", "../app.db", "./data/agents.db", "../data/agents.db"]
-            db_path = None
-            
-            for path in db_paths:
-                if os.path.exists(path):
-                    db_path = path
-                    break
-                    
-            if db_path:
-                print(f"Checking database at {db_path} for required tables...")
-                conn = sqlite3.connect(db_path)
-                cursor = conn.cursor()
-                
-                # Check if slack_bots table exists
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='slack_bots';")
-                if not cursor.fetchone():
-                    print("Creating slack_bots table directly with SQLite...")
-                    cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS slack_bots (
-                        id INTEGER PRIMARY KEY,
-                        agent_name TEXT UNIQUE,
-                        bot_token TEXT NOT NULL,
-                        app_token TEXT NOT NULL,
-                        status TEXT DEFAULT 'stopped',
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    );
-                    """)
-                    
-                    # Create an index on agent_name
-                    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_slack_bots_agent_name ON slack_bots (agent_name);")
-                    conn.commit()
-                    print("Successfully created slack_bots table.")
-                
-                conn.close()
-        except Exception as sqlite_err:
-            print(f"Warning: Direct SQLite attempt failed: {str(sqlite_err)}")
-            
-    except Exception as e:
-        print(f"Warning: Failed to ensure all tables exist: {str(e)}")
-        print("Continuing startup process despite table creation errors...")
+    # Start the message group-commit queue if enabled
+    if message_store.write_behind_enabled():
+        message_store.write_behind.start()
+    
+    # Periodically move the messages of idle conversations to the archive if enabled
+    if message_archive.archiving_enabled():
+        message_archive.archiver.start()
     
     # Get a database session
     async for session in db_module.get_db():
         # Initialize agents from database
-        await agent_utils.initialize_agents(session, openai_client)
+        await agent_utils.initialize_agents(session)
         
         # Initialize multi-agent systems from database
         await multi_agent_service.initialize_multi_agent_systems(session)
@@ -151,18 +128,33 @@ async def startup_event():
         
         break
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Flush queued messages, then release the shared LLM connection pools and database connections
+    await message_store.write_behind.stop()
+    await message_archive.archiver.stop()
+    tool_executor.shutdown()
+    await llm_clients.close_llm_clients()
+    await db_module.close_db()
+
 # Pydantic models
 class Agent(BaseModel):
     name: str
     role: str
     tools: List[str]
     personality: str
+    response_cache: Optional[Literal["exact", "semantic"]] = None  # Opt in to response caching
 
 class MessageRequest(BaseModel):
     message: str
     conversation_id: Optional[str] = None
     user_id: Optional[str] = None
 
+class BatchInteractionRequest(BaseModel):
+    messages: List[str]
+    concurrency: Optional[int] = None  # Defaults to BATCH_DEFAULT_CONCURRENCY
+    save: bool = True  # Store the exchanges in a dedicated batch conversation
+
 class MessageResponse(BaseModel):
     response: str
     conversation_id: str
@@ -178,6 +170,11 @@ class MultiAgentSystemRequest(BaseModel):
     agents: List[str]
     triage_agent: str
     connections: Optional[List[AgentConnection]] = None
+    speculative: bool = False  # Opt in to speculative execution of the likely downstream agent
+
+class MultiAgentExecutionRequest(BaseModel):
+    message: str
+    node_timeout: Optional[float] = None  # Seconds each agent may take
 
 class MultiAgentInteractionRequest(BaseModel):
     message: str
@@ -194,6 +191,11 @@ class ConversationResponse(BaseModel):
     messages: List[Dict[str, Any]]
     created_at: str
     updated_at: str
+    # Message paging cursors (see pagination.py)
+    before_cursor: Optional[str] = None
+    after_cursor: Optional[str] = None
+    has_more_before: bool = False
+    has_more_after: bool = False
 
 class MessageHistoryResponse(BaseModel):
     id: int
@@ -201,6 +203,22 @@ class MessageHistoryResponse(BaseModel):
     content: str
     timestamp: str
 
+class MessageSearchResult(BaseModel):
+    source: Literal["agent", "multi_agent"]
+    message_id: int
+    conversation_id: int
+    project_id: Optional[int] = None
+    system_id: Optional[str] = None
+    agent: Optional[str] = None
+    role: Optional[str] = None
+    created_at: Optional[str] = None
+    snippet: str  # Matched terms are wrapped in <mark></mark>
+    score: float
+
+class MessageSearchResponse(BaseModel):
+    results: List[MessageSearchResult]
+    has_more: bool
+
 # Add new models for custom tools
 class CreateCustomToolRequest(BaseModel):
     description: str
@@ -368,7 +386,8 @@ async def create_ai_solution(agent: Agent, client: AsyncOpenAI = Depends(get_ope
             role=agent.role,
             personality=agent.personality,
             tools=agent.tools,
-            openai_client=client
+            openai_client=client,
+            response_cache=agent.response_cache
         )
         return {"message": "AI Solution created successfully"}
     except Exception as e:
@@ -387,58 +406,57 @@ async def create_agent(agent: Agent, client: AsyncOpenAI = Depends(get_openai_cl
 @app.get("/list_agents/")
 async def list_agents(db: AsyncSession = Depends(get_db)):
     """List all available AI Solutions."""
-    # Get in-memory agents first
+    # Served from the read model cache; agent writes invalidate it (agent_utils.invalidate_agent_list)
+    return await read_models.get(AGENT_LIST, lambda: build_agent_list(db))
+
+async def build_agent_list(db: AsyncSession) -> Dict[str, Dict[str, Any]]:
+    """Build the agent list from the registered agents and one query for all stored agents."""
+    try:
+        result = await db.execute(select(db_module.AgentModel))
+        agent_models = {agent_model.name: agent_model for agent_model in result.scalars().all()}
+    except Exception as e:
+        print(f"Error loading agents from database: {str(e)}")
+        agent_models = None
+    
+    # Get registered agents first (listing them does not build the agents)
     agents_dict = {}
     in_memory_agents = agent_utils.get_all_agents()
     
     if in_memory_agents:
-        # Convert agents to a dictionary format that can be serialized
-        for name, agent_obj in in_memory_agents.items():
-            # Extract tools from the agent
-            tool_names = []
-            if hasattr(agent_obj, 'tools') and agent_obj.tools:
-                for tool in agent_obj.tools:
-                    if hasattr(tool, 'name'):
-                        tool_names.append(tool.name)
-            
-            # Get original personality from database
-            result = await db.execute(select(db_module.AgentModel).where(db_module.AgentModel.name == name))
-            agent_model = result.scalars().first()
-            original_personality = agent_model.personality if agent_model else ""
+        # Convert agent configurations to a dictionary format that can be serialized
+        for name in in_memory_agents:
+            config = agent_utils.get_agent_config(name)
+            agent_model = agent_models.get(name) if agent_models else None
             
             agents_dict[name] = {
                 "name": name,
-                "role": agent_obj.handoff_description.replace(" agent", ""),
-                "personality": original_personality,  # Use original personality for the list view
-                "tools": tool_names,
+                "role": config.role,
+                "personality": agent_model.personality if agent_model else "",  # Use original personality for the list view
+                "tools": config.tools,
+                "response_cache": config.response_cache,
                 "id": agent_model.id if agent_model else None
             }
     
-    # If no in-memory agents, check database directly
+    # If no in-memory agents, use the database agents directly
     if not agents_dict:
-        try:
-            # Query all agents from database
-            result = await db.execute(select(db_module.AgentModel))
-            agent_models = result.scalars().all()
-            
-            # Convert database agents to dictionary
-            for agent_model in agent_models:
-                # Parse tools JSON if available
-                tool_names = []
-                if agent_model.tools:
-                    tool_names = json.loads(agent_model.tools) if isinstance(agent_model.tools, str) else agent_model.tools
-                
-                agents_dict[agent_model.name] = {
-                    "name": agent_model.name,
-                    "role": agent_model.role,
-                    "personality": agent_model.personality,
-                    "tools": tool_names,
-                    "id": agent_model.id
-                }
-        except Exception as e:
-            print(f"Error loading agents from database: {str(e)}")
+        if agent_models is None:
             # Return empty dict if both approaches fail
             return {}
+        
+        for agent_model in agent_models.values():
+            # Parse tools JSON if available
+            tool_names = []
+            if agent_model.tools:
+                tool_names = json.loads(agent_model.tools) if isinstance(agent_model.tools, str) else agent_model.tools
+            
+            agents_dict[agent_model.name] = {
+                "name": agent_model.name,
+                "role": agent_model.role,
+                "personality": agent_model.personality,
+                "tools": tool_names,
+                "response_cache": agent_model.response_cache,
+                "id": agent_model.id
+            }
     
     return agents_dict
 
@@ -471,6 +489,7 @@ async def get_agent(agent_name: str, db: AsyncSession = Depends(get_db)):
         "personality": agent_obj.instructions,  # This is the full system prompt
         "original_personality": original_personality,  # This is the user's original input
         "tools": tool_names,
+        "response_cache": agent_model.response_cache if agent_model else None,
         "hasProfilePicture": has_profile_picture
     }
 
@@ -479,6 +498,7 @@ async def delete_agent(agent_name: str, db: AsyncSession = Depends(get_db)):
     success = await agent_utils.delete_agent(db, agent_name)
     if not success:
         raise HTTPException(status_code=404, detail="Agent not found")
+    project_management.invalidate_roadmap()
     return {"message": "Agent deleted successfully"}
 
 @app.post("/interact/{agent_name}", response_model=MessageResponse)
@@ -507,7 +527,7 @@ async def interact_with_agent(agent_name: str, request: MessageRequest, db: Asyn
         # Get the conversation ID from the database if not provided
         if not conversation_id:
             # Find the most recent conversation for this agent
-            agent_conversations = await agent_utils.get_agent_conversations(db, agent_name)
+            agent_conversations = await agent_utils.get_agent_conversations(db, agent_name, limit=1)
             if agent_conversations:
                 conversation_id = str(agent_conversations[0]["id"])
             else:
@@ -515,9 +535,151 @@ async def interact_with_agent(agent_name: str, request: MessageRequest, db: Asyn
                 conversation_id = "0"
         
         return {"response": response_text, "conversation_id": conversation_id}
+    except llm_scheduler.AdmissionRejected:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error interacting with agent: {str(e)}")
 
+@app.post("/interact/{agent_name}/stream")
+async def interact_with_agent_stream(agent_name: str, request: MessageRequest):
+    """
+    Stream an agent's response as Server-Sent Events.
+    Emits `token` events as text is generated and a final `done` (or `error`) event
+    carrying the full response and conversation ID once the turn has been saved.
+    """
+    if agent_name not in agent_utils.get_all_agents():
+        raise HTTPException(status_code=404, detail="Agent not found")
+    
+    conversation_id = None
+    if request.conversation_id:
+        try:
+            conversation_id = int(request.conversation_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid conversation ID")
+    
+    # Reject up front while the status code can still be set; a queue timeout later
+    # in the stream is reported as an error event
+    if llm_scheduler.scheduler.is_saturated():
+        raise llm_scheduler.AdmissionRejected("Too many pending requests for the language model", llm_scheduler.scheduler.retry_after())
+    
+    async def event_stream():
+        # The request-scoped session may be closed before the body is sent, so the
+        # stream owns its session for the lifetime of the response
+        async with db_module.async_session_factory() as session:
+            async for event in agent_utils.stream_interact_with_agent(
+                agent_name=agent_name,
+                message=request.message,
+                session=session,
+                conversation_id=conversation_id
+            ):
+                if event["type"] != "token" and event.get("conversation_id") is not None:
+                    event["conversation_id"] = str(event["conversation_id"])
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Limits for batch interactions
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "5000"))
+BATCH_DEFAULT_CONCURRENCY = int(os.getenv("BATCH_DEFAULT_CONCURRENCY", "8"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
+BATCH_SAVE_CHUNK_SIZE = int(os.getenv("BATCH_SAVE_CHUNK_SIZE", "100"))
+
+@app.post("/interact_batch/{agent_name}")
+async def interact_with_agent_batch(agent_name: str, request: BatchInteractionRequest):
+    """
+    Run many independent messages against one agent with bounded concurrency.
+    Streams one NDJSON line per message as it finishes (`index`, `response`, and
+    `error` on failure), then a `summary` line. Exchanges are bulk-inserted into a
+    dedicated batch conversation in chunks of BATCH_SAVE_CHUNK_SIZE.
+    """
+    if agent_name not in agent_utils.get_all_agents():
+        raise HTTPException(status_code=404, detail="Agent not found")
+    if not request.messages:
+        raise HTTPException(status_code=400, detail="No messages provided")
+    if len(request.messages) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A batch can contain at most {BATCH_MAX_ITEMS} messages")
+    
+    concurrency = max(1, min(request.concurrency or BATCH_DEFAULT_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def run_item(index: int, message: str) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                # Items are independent: no conversation history and no per-item commit
+                result = await agent_utils.interact_with_agent(agent_name=agent_name, message=message)
+            except llm_scheduler.AdmissionRejected as e:
+                return {"type": "result", "index": index, "error": "overloaded", "response": str(e), "retry_after": e.retry_after}
+            item = {"type": "result", "index": index, "response": result.get("response")}
+            if "error" in result:
+                item["error"] = result["error"]
+            if result.get("cached"):
+                item["cached"] = True
+            return item
+    
+    async def result_stream():
+        started = time.monotonic()
+        tasks = [asyncio.create_task(run_item(index, message)) for index, message in enumerate(request.messages)]
+        conversation_id = None
+        pending_exchanges = []
+        completed = failed = 0
+        
+        # The request-scoped session may be closed before the body is sent, so the
+        # stream owns its session for the lifetime of the response
+        async with db_module.async_session_factory() as session:
+            async def save_pending():
+                nonlocal conversation_id
+                try:
+                    conversation_id = await message_store.save_exchanges(
+                        session,
+                        agent_name,
+                        pending_exchanges,
+                        conversation_id,
+                        title=f"Batch with {agent_name} ({len(request.messages)} messages)"
+                    )
+                except Exception as e:
+                    print(f"Error saving batch results for agent {agent_name}: {str(e)}")
+                pending_exchanges.clear()
+            
+            try:
+                for next_result in asyncio.as_completed(tasks):
+                    item = await next_result
+                    if "error" in item:
+                        failed += 1
+                    else:
+                        completed += 1
+                        if request.save:
+                            pending_exchanges.append({
+                                "user_message": request.messages[item["index"]],
+                                "agent_response": item["response"],
+                                "metadata": {"batch_index": item["index"]}
+                            })
+                            if len(pending_exchanges) >= BATCH_SAVE_CHUNK_SIZE:
+                                await save_pending()
+                    yield json.dumps(item) + "\n"
+                
+                if pending_exchanges:
+                    await save_pending()
+            finally:
+                # Stop outstanding work if the client disconnects
+                for task in tasks:
+                    task.cancel()
+        
+        yield json.dumps({
+            "type": "summary",
+            "conversation_id": str(conversation_id) if conversation_id else None,
+            "total": len(request.messages),
+            "completed": completed,
+            "failed": failed,
+            "concurrency": concurrency,
+            "elapsed_seconds": round(time.monotonic() - started, 3)
+        }) + "\n"
+    
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
 @app.get("/available_tools", response_model=List[ToolDescription])
 async def get_available_tools():
     """Get a list of all available tools that can be assigned to agents."""
@@ -526,7 +688,68 @@ async def get_available_tools():
 # Add a health check endpoint
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "openai_client_initialized": openai_client is not None}
+    return {
+        "status": "healthy",
+        "openai_client_initialized": openai_client is not None,
+        "llm_connection_pools": llm_clients.get_pool_stats(),
+        "database_pool": db_module.engine.pool.status()
+    }
+
+@app.get("/metrics/agent_cache")
+async def get_agent_cache_metrics():
+    """Get size and hit rate statistics of the agent cache."""
+    return agent_utils.agent_cache.stats()
+
+@app.get("/metrics/message_store")
+async def get_message_store_metrics():
+    """Get queue depth and written/failed batch counts of the message write-behind queue."""
+    return message_store.write_behind.stats()
+
+@app.get("/metrics/llm_scheduler")
+async def get_llm_scheduler_metrics():
+    """Get current load, queue and admission statistics of the LLM scheduler."""
+    return llm_scheduler.scheduler.stats()
+
+@app.get("/metrics/tool_executor")
+async def get_tool_executor_metrics():
+    """Get pool sizes and per-tool call, timeout and error counts of the tool executor."""
+    return tool_executor.stats()
+
+@app.get("/metrics/read_models")
+async def get_read_model_metrics():
+    """Get hit, miss and invalidation counts of the read model cache."""
+    return read_models.stats()
+
+@app.get("/metrics/archive")
+async def get_archive_metrics():
+    """Get run counts and compression statistics of the conversation archiver."""
+    return message_archive.archiver.stats()
+
+@app.get("/debug/queries")
+async def get_query_profile():
+    """Get query counts, database time histograms and the slowest statements per route."""
+    return query_profiler.profiler.snapshot()
+
+@app.delete("/debug/queries")
+async def reset_query_profile():
+    """Reset the per-route query statistics."""
+    query_profiler.profiler.reset()
+    return {"message": "Query statistics reset"}
+
+@app.get("/metrics/response_cache")
+async def get_response_cache_metrics():
+    """Get size and hit/miss statistics of the agent response cache."""
+    return response_cache.response_cache.stats()
+
+@app.get("/metrics/router")
+async def get_router_metrics():
+    """Get how many multi-agent messages were routed by embedding similarity and how many fell back to the triage agent."""
+    return agent_router.agent_router.stats()
+
+@app.get("/metrics/speculation")
+async def get_speculation_metrics():
+    """Get the speculation hit rate and wasted tokens of multi-agent systems in speculative mode."""
+    return speculation.speculator.stats()
 
 # Multi-agent system endpoints
 @app.post("/multi_agent_systems/", response_model=MultiAgentSystemResponse)
@@ -538,7 +761,8 @@ async def create_multi_agent_system(request: MultiAgentSystemRequest, db: AsyncS
             description=request.description,
             agent_names=request.agents,
             triage_agent_name=request.triage_agent,
-            connections=request.connections
+            connections=request.connections,
+            speculative=request.speculative
         )
         return system
     except ValueError as e:
@@ -558,6 +782,7 @@ async def list_multi_agent_systems(db: AsyncSession = Depends(get_db)):
                 "agents": system.agents,
                 "triage_agent": system.triage_agent,
                 "connections": [AgentConnection(**conn) for conn in system.connections] if system.connections else [],
+                "speculative": bool(system.speculative),
                 "created_at": system.created_at.isoformat()
             }
             for system in systems
@@ -582,6 +807,7 @@ async def get_multi_agent_system(system_id: str, db: AsyncSession = Depends(get_
             "agents": system.agents,
             "triage_agent": system.triage_agent,
             "connections": [AgentConnection(**conn) for conn in system.connections] if system.connections else [],
+            "speculative": bool(system.speculative),
             "created_at": system.created_at.isoformat()
         }
     except HTTPException:
@@ -603,7 +829,8 @@ async def update_multi_agent_system(system_id: str, request: MultiAgentSystemReq
             description=request.description,
             agent_names=request.agents,
             triage_agent_name=request.triage_agent,
-            connections=request.connections
+            connections=request.connections,
+            speculative=request.speculative
         )
         if not system:
             raise HTTPException(status_code=404, detail="Multi-agent system not found")
@@ -662,35 +889,148 @@ async def interact_with_multi_agent_system_endpoint(
             return response
             
         return response
-    except HTTPException:
+    except (HTTPException, llm_scheduler.AdmissionRejected):
         raise
     except Exception as e:
         return {"error": f"An error occurred: {str(e)}"}
 
+@app.post("/multi_agent_systems/{system_id}/execute")
+async def execute_multi_agent_system(system_id: str, request: MultiAgentExecutionRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Run a multi-agent system's connections as a DAG: independent branches run
+    concurrently and each agent receives the outputs of its upstream agents.
+    """
+    try:
+        if not system_id or system_id == 'undefined':
+            raise HTTPException(status_code=400, detail="Invalid system ID")
+        if request.node_timeout is not None and request.node_timeout <= 0:
+            raise HTTPException(status_code=400, detail="node_timeout must be positive")
+        
+        system = await multi_agent_service.get_multi_agent_system_from_db(system_id, db)
+        if not system:
+            raise HTTPException(status_code=404, detail="Multi-agent system not found")
+        
+        graph = workflow_dag.WorkflowGraph(system.agents or [], system.connections or [], system.triage_agent)
+        result = await workflow_dag.execute_workflow(graph, request.message, db_session=db, node_timeout=request.node_timeout)
+        return {"system_id": system_id, **result}
+    except workflow_dag.InvalidWorkflow as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to execute multi-agent system: {str(e)}")
+
+def set_page_headers(response: Response, page: Dict[str, Any]):
+    """Expose the cursors of a paginated list response as headers"""
+    if page["before_cursor"]:
+        response.headers["X-Before-Cursor"] = page["before_cursor"]
+    if page["after_cursor"]:
+        response.headers["X-After-Cursor"] = page["after_cursor"]
+    response.headers["X-Has-More-Before"] = str(page["has_more_before"]).lower()
+    response.headers["X-Has-More-After"] = str(page["has_more_after"]).lower()
+
+def set_unpaged_headers(response: Response):
+    """Flag a list returned whole because the request had no paging parameters"""
+    response.headers["Deprecation"] = "true"
+    response.headers["X-Has-More-Before"] = "false"
+    response.headers["X-Has-More-After"] = "false"
+
 @app.get("/agent/{agent_name}/conversations", response_model=List[Dict[str, Any]])
-async def get_agent_conversations(agent_name: str, db: AsyncSession = Depends(get_db)):
+async def get_agent_conversations(
+    agent_name: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=pagination.MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get an agent's conversations.
+    Pass `limit` to page through them, most recently created first, and the
+    X-Before-Cursor header of a page as `before` to get older conversations.
+    Without paging parameters every conversation is returned, most recently
+    updated first (deprecated).
+    """
     try:
-        conversations = await agent_utils.get_agent_conversations(db, agent_name)
-        return conversations
+        if not pagination.is_paged(limit, before, after):
+            set_unpaged_headers(response)
+            return await agent_utils.get_agent_conversations(db, agent_name)
+        page = await agent_utils.get_agent_conversations_page(db, agent_name, limit, before, after)
+        set_page_headers(response, page)
+        return page["items"]
+    except pagination.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get conversations: {str(e)}")
 
 @app.get("/conversation/{conversation_id}", response_model=List[Dict[str, Any]])
 async def get_conversation_history(
     conversation_id: int, 
+    response: Response,
     include_intermediate: bool = False,
+    limit: Optional[int] = Query(None, ge=1, le=pagination.MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
+    """
+    Get the messages of a conversation, oldest first.
+    Pass `limit` to get only the most recent ones, then the X-Before-Cursor header
+    as `before` to load older messages, or the X-After-Cursor header as `after` to
+    poll for newer ones. Without paging parameters the whole history is returned (deprecated).
+    """
     try:
-        messages = await agent_utils.get_conversation_history(
+        if not pagination.is_paged(limit, before, after):
+            set_unpaged_headers(response)
+            return await agent_utils.get_conversation_history(db, conversation_id, include_intermediate=include_intermediate)
+        page = await agent_utils.get_conversation_page(
             db, 
             conversation_id, 
-            include_intermediate
+            limit=limit,
+            before=before,
+            after=after,
+            include_intermediate=include_intermediate
         )
-        return messages
+        set_page_headers(response, page)
+        return page["items"]
+    except pagination.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get conversation history: {str(e)}")
 
+@app.get("/search/messages", response_model=MessageSearchResponse)
+async def search_messages(
+    q: str,
+    agent: Optional[str] = None,
+    project_id: Optional[int] = None,
+    source: Optional[Literal["agent", "multi_agent"]] = None,
+    created_after: Optional[datetime.datetime] = None,
+    created_before: Optional[datetime.datetime] = None,
+    limit: Optional[int] = Query(None, ge=1, le=message_search.SEARCH_PAGE_SIZE_MAX),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Full-text search over agent and multi-agent conversation messages, best matches first.
+    All words and "quoted phrases" in `q` must match; word* matches a prefix.
+    """
+    try:
+        return await message_search.search_messages(
+            db,
+            q,
+            agent=agent,
+            project_id=project_id,
+            source=source,
+            created_after=created_after,
+            created_before=created_before,
+            limit=limit,
+            offset=offset
+        )
+    except message_search.InvalidSearchQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to search messages: {str(e)}")
+
 # Add back the old conversation endpoints for compatibility with frontend
 @app.post("/agents/{agent_name}/conversations", response_model=ConversationResponse)
 async def create_conversation(agent_name: str, request: ConversationRequest, db_session: AsyncSession = Depends(get_db)):
@@ -730,15 +1070,32 @@ async def create_conversation(agent_name: str, request: ConversationRequest, db_
         raise HTTPException(status_code=500, detail=f"Error creating conversation: {str(e)}")
 
 @app.get("/agents/{agent_name}/conversations", response_model=List[ConversationResponse])
-async def get_conversations(agent_name: str, db_session: AsyncSession = Depends(get_db)):
+async def get_conversations(
+    agent_name: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=pagination.MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    db_session: AsyncSession = Depends(get_db)
+):
+    """
+    Get an agent's conversations; paged most recently created first when
+    `limit`, `before` or `after` is given, otherwise all of them (deprecated).
+    """
     try:
         # Check if agent exists
         agents = agent_utils.get_all_agents()
         if agent_name not in agents:
             raise HTTPException(status_code=404, detail="Agent not found")
         
-        # Get conversations from database
-        conversations = await agent_utils.get_agent_conversations(db_session, agent_name)
+        if pagination.is_paged(limit, before, after):
+            # Get a page of conversations from database
+            page = await agent_utils.get_agent_conversations_page(db_session, agent_name, limit, before, after)
+            set_page_headers(response, page)
+            conversations = page["items"]
+        else:
+            set_unpaged_headers(response)
+            conversations = await agent_utils.get_agent_conversations(db_session, agent_name)
         
         # Format response to match the old format
         return [
@@ -752,11 +1109,29 @@ async def get_conversations(agent_name: str, db_session: AsyncSession = Depends(
             }
             for conv in conversations
         ]
+    except HTTPException:
+        raise
+    except pagination.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving conversations: {str(e)}")
 
 @app.get("/agents/{agent_name}/conversations/{conversation_id}", response_model=ConversationResponse)
-async def get_conversation(agent_name: str, conversation_id: str, db_session: AsyncSession = Depends(get_db)):
+async def get_conversation(
+    agent_name: str,
+    conversation_id: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=pagination.MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    db_session: AsyncSession = Depends(get_db)
+):
+    """
+    Get a conversation with its messages.
+    Pass `limit` to get only the most recent ones, then before_cursor as `before` to
+    load older messages, or after_cursor as `after` for newer ones. Without paging
+    parameters every message is returned (deprecated).
+    """
     try:
         # Check if agent exists
         agents = agent_utils.get_all_agents()
@@ -775,18 +1150,31 @@ async def get_conversation(agent_name: str, conversation_id: str, db_session: As
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
         
-        # Get messages
-        messages = await agent_utils.get_conversation_history(db_session, int(conversation_id))
+        if pagination.is_paged(limit, before, after):
+            # Get a page of messages
+            page = await agent_utils.get_conversation_page(db_session, conversation.id, limit=limit, before=before, after=after)
+        else:
+            set_unpaged_headers(response)
+            messages = await agent_utils.get_conversation_history(db_session, conversation.id)
+            page = {"items": messages, "before_cursor": None, "after_cursor": None, "has_more_before": False, "has_more_after": False}
         
         # Format response to match the old format
         return {
             "conversation_id": str(conversation.id),
             "agent_id": agent_name,
             "title": conversation.title,
-            "messages": messages,
+            "messages": page["items"],
             "created_at": conversation.created_at.isoformat(),
-            "updated_at": conversation.updated_at.isoformat()
+            "updated_at": conversation.updated_at.isoformat(),
+            "before_cursor": page["before_cursor"],
+            "after_cursor": page["after_cursor"],
+            "has_more_before": page["has_more_before"],
+            "has_more_after": page["has_more_after"]
         }
+    except HTTPException:
+        raise
+    except pagination.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving conversation: {str(e)}")
 
@@ -1103,13 +1491,10 @@ async def update_agent(
     try:
         # Load existing tools for the agent if not provided
         if not agent_data.tools:
-            existing_agent = agents[agent_name]
-            tool_names = []
-            if hasattr(existing_agent, 'tools') and existing_agent.tools:
-                for tool in existing_agent.tools:
-                    if hasattr(tool, 'name'):
-                        tool_names.append(tool.name)
-            agent_data.tools = tool_names
+            agent_data.tools = list(agent_utils.get_agent_config(agent_name).tools)
+        # Keep the response cache mode unless the client sent one; older clients don't know the field
+        if "response_cache" not in agent_data.model_fields_set:
+            agent_data.response_cache = agent_utils.get_agent_config(agent_name).response_cache
         
         # Store the original personality (not the system prompt)
         result = await db.execute(select(db_module.AgentModel).where(db_module.AgentModel.name == agent_name))
@@ -1120,19 +1505,18 @@ async def update_agent(
             agent_model.role = agent_data.role
             agent_model.personality = agent_data.personality  # Store original personality
             agent_model.tools = agent_data.tools
+            agent_model.response_cache = agent_data.response_cache
             agent_model.updated_at = datetime.datetime.utcnow()
             await db.commit()
+            project_management.invalidate_roadmap()
             
-            # Recreate the in-memory agent with new parameters
-            if agent_name in agent_utils.agents_store:
-                del agent_utils.agents_store[agent_name]
-            
-            agent_utils.agents_store[agent_name] = agent_utils.create_agent(
+            # Re-register the agent with new parameters; it is rebuilt on next use
+            agent_utils.register_agent(
                 name=agent_name,
                 role=agent_data.role,
                 personality=agent_data.personality,
                 tools=agent_data.tools,
-                openai_client=openai_client
+                response_cache=agent_data.response_cache
             )
             
             return {"status": "success", "message": f"Agent {agent_name} updated successfully"}
@@ -1275,6 +1659,7 @@ async def create_project(project: ProjectCreate, db: AsyncSession = Depends(get_
                     db.add(new_solution)
             
             await db.commit()
+            project_management.invalidate_roadmap()
         
         # If project description is substantial, analyze it with LLM
         if project.description and len(project.description) > 50:
@@ -1418,34 +1803,37 @@ async def get_companies(db: AsyncSession = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get companies: {str(e)}")
 
+async def build_sectors(db: AsyncSession) -> List[Dict[str, Any]]:
+    """Build the sector list with one grouped company count query."""
+    company_counts = (
+        select(db_module.CompanyModel.sector_id, func.count(db_module.CompanyModel.id).label("company_count"))
+        .group_by(db_module.CompanyModel.sector_id)
+        .subquery()
+    )
+    result = await db.execute(
+        select(db_module.SectorModel, func.coalesce(company_counts.c.company_count, 0))
+        .outerjoin(company_counts, company_counts.c.sector_id == db_module.SectorModel.id)
+        .order_by(db_module.SectorModel.id)
+    )
+    
+    return [
+        {
+            "id": sector.id,
+            "name": sector.name,
+            "description": sector.description,
+            "company_count": count,
+            "created_at": sector.created_at.isoformat(),
+            "updated_at": sector.updated_at.isoformat()
+        }
+        for sector, count in result.all()
+    ]
+
 @app.get("/sectors", response_model=List[SectorResponse])
 async def get_sectors(db: AsyncSession = Depends(get_db)):
     """Get all sectors with company counts."""
     try:
-        # Query all sectors
-        result = await db.execute(select(db_module.SectorModel))
-        sectors = result.scalars().all()
-        
-        # Get company counts for each sector
-        sector_responses = []
-        for sector in sectors:
-            # Count companies in this sector
-            company_count = await db.execute(
-                select(func.count(db_module.CompanyModel.id))
-                .where(db_module.CompanyModel.sector_id == sector.id)
-            )
-            count = company_count.scalar()
-            
-            sector_responses.append({
-                "id": sector.id,
-                "name": sector.name,
-                "description": sector.description,
-                "company_count": count,
-                "created_at": sector.created_at.isoformat(),
-                "updated_at": sector.updated_at.isoformat()
-            })
-        
-        return sector_responses
+        # Sectors and companies are not edited through the API; the TTL picks up direct changes
+        return await read_models.get(SECTORS, lambda: build_sectors(db))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get sectors: {str(e)}")
 
@@ -1825,6 +2213,7 @@ async def create_project_with_agent(
                     db.add(new_solution)
             
             await db.commit()
+            project_management.invalidate_roadmap()
             
             # Update project with agents
             if solution_ids:
@@ -1879,6 +2268,7 @@ async def create_project_with_agent(
                                 connections=connections
                             )
                             db.add(new_system)
+                            await multi_agent_service.set_system_members(db, system_id, agent_names)
                             await db.commit()
                             
                             # Add system info to response
@@ -1985,6 +2375,92 @@ async def recommend_agent_architecture(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to recommend agent architecture: {str(e)}")
 
+async def run_sequential_workflow(db: AsyncSession, run, agent_names: List[str], message: Optional[str], conversation_id: int) -> Dict[str, Any]:
+    """
+    Pass a message through a sequential workflow's agents and save the turn in one
+    transaction. `message` is None when resuming a run whose user message is already saved.
+    """
+    result = None
+    async for event in sequential_pipeline.run_pipeline(agent_names, run.message, run):
+        if event["type"] in ("done", "error"):
+            result = event
+    
+    if result["type"] == "error":
+        await sequential_pipeline.save_pipeline_turn(db, conversation_id, message, result["intermediate"], error=result["response"], run_id=run.id)
+        return {
+            "response": result["response"],
+            "conversation_id": str(conversation_id),
+            "error": result["error"],
+            "hops": result["hops"],
+            "run_id": run.id,
+            "failed_step": result["position"]
+        }
+    
+    try:
+        await sequential_pipeline.save_pipeline_turn(db, conversation_id, message, result["intermediate"], response=result["response"], run_id=run.id)
+    except Exception as e:
+        # Keep the checkpoints so resuming reuses every step instead of calling the model again
+        await db.rollback()
+        await run.finish("failed", failed_step=len(agent_names) - 1, error=f"Failed to save the workflow turn: {str(e)}")
+        raise
+    return {
+        "response": result["response"],
+        "conversation_id": str(conversation_id),
+        "hops": result["hops"],
+        "run_id": run.id
+    }
+
+async def get_project_agents(db: AsyncSession, project_id: int):
+    """Get a project and its agents, raising 404 if either is missing"""
+    project_result = await db.execute(
+        select(db_module.ProjectModel).where(db_module.ProjectModel.id == project_id)
+    )
+    project = project_result.scalars().first()
+    
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    # Get associated agents
+    agents_result = await db.execute(
+        select(db_module.AgentModel)
+        .join(db_module.ProjectSolutionModel, db_module.ProjectSolutionModel.agent_id == db_module.AgentModel.id)
+        .where(db_module.ProjectSolutionModel.project_id == project_id)
+    )
+    agents = agents_result.scalars().all()
+    
+    if not agents:
+        raise HTTPException(status_code=404, detail="No agents found for this project")
+    return project, agents
+
+async def get_project_conversation_id(db: AsyncSession, project, agents, message: str, conversation_id: Optional[int] = None) -> int:
+    """
+    Conversation for a sequential project workflow: the given one if it exists,
+    otherwise the project's most recent conversation, otherwise a new one.
+    """
+    if conversation_id:
+        conversation = await db.get(db_module.ConversationModel, conversation_id)
+    else:
+        # Check for existing project conversations before creating a new one
+        existing_conversations_result = await db.execute(
+            select(db_module.ConversationModel)
+            .where(db_module.ConversationModel.project_id == project.id)
+            .order_by(db_module.ConversationModel.updated_at.desc())
+            .limit(1)
+        )
+        conversation = existing_conversations_result.scalars().first()
+    
+    if not conversation:
+        # Create new conversation only if no existing (or valid) one
+        conversation = db_module.ConversationModel(
+            agent_id=agents[0].id,  # Use first agent as primary
+            title=f"Project {project.title} - {message[:30]}...",
+            project_id=project.id
+        )
+        db.add(conversation)
+        await db.commit()
+        await db.refresh(conversation)
+    return conversation.id
+
 @app.post("/projects/{project_id}/interact", response_model=Dict[str, Any])
 async def interact_with_project(
     project_id: int,
@@ -1998,35 +2474,10 @@ async def interact_with_project(
     For multi-agent projects, it routes through the appropriate multi-agent system.
     """
     try:
-        # Get the project
-        project_result = await db.execute(
-            select(db_module.ProjectModel).where(db_module.ProjectModel.id == project_id)
-        )
-        project = project_result.scalars().first()
-        
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        # Get associated agents
-        agents_result = await db.execute(
-            select(db_module.AgentModel)
-            .join(db_module.ProjectSolutionModel, db_module.ProjectSolutionModel.agent_id == db_module.AgentModel.id)
-            .where(db_module.ProjectSolutionModel.project_id == project_id)
-        )
-        agents = agents_result.scalars().all()
-        
-        if not agents:
-            raise HTTPException(status_code=404, detail="No agents found for this project")
+        project, agents = await get_project_agents(db, project_id)
         
         # Check if this project has a multi-agent system
-        system_result = await db.execute(
-            select(db_module.MultiAgentSystemModel)
-            .where(
-                # Check if all agents in the system match the project's agents
-                db_module.MultiAgentSystemModel.agents.contains([agent.name for agent in agents])
-            )
-        )
-        multi_agent_system = system_result.scalars().first()
+        multi_agent_system = await multi_agent_service.find_system_with_agents(db, [agent.id for agent in agents])
         
         # Parse conversation ID if it's a string
         conversation_id = None
@@ -2051,136 +2502,10 @@ async def interact_with_project(
         
         # Case 2: Sequential workflow (multiple agents, but no formal multi-agent system)
         elif len(agents) > 1:
-            # First, check if there's an existing conversation for this project
-            if not conversation_id:
-                # Check for existing project conversations before creating a new one
-                existing_conversations_result = await db.execute(
-                    select(db_module.ConversationModel)
-                    .where(db_module.ConversationModel.project_id == project_id)
-                    .order_by(db_module.ConversationModel.updated_at.desc())
-                    .limit(1)
-                )
-                existing_conversation = existing_conversations_result.scalars().first()
-                
-                if existing_conversation:
-                    # Use the most recent conversation 
-                    conversation = existing_conversation
-                    conversation_id = existing_conversation.id
-                else:
-                    # Create new conversation only if no existing ones
-                    conversation = db_module.ConversationModel(
-                        agent_id=agents[0].id,  # Use first agent as primary
-                        title=f"Project {project.title} - {request.message[:30]}...",
-                        project_id=project_id
-                    )
-                    db.add(conversation)
-                    await db.commit()
-                    await db.refresh(conversation)
-                    conversation_id = conversation.id
-            else:
-                # Use existing conversation if ID was provided
-                conversation_result = await db.execute(
-                    select(db_module.ConversationModel)
-                    .where(db_module.ConversationModel.id == conversation_id)
-                )
-                conversation = conversation_result.scalars().first()
-                
-                if not conversation:
-                    # Conversation ID was invalid, create a new one
-                    conversation = db_module.ConversationModel(
-                        agent_id=agents[0].id,  # Use first agent as primary
-                        title=f"Project {project.title} - {request.message[:30]}...",
-                        project_id=project_id
-                    )
-                    db.add(conversation)
-                    await db.commit()
-                    await db.refresh(conversation)
-                    conversation_id = conversation.id
-            
-            # Add user message to conversation
-            user_message = db_module.MessageModel(
-                conversation_id=conversation_id,
-                role="user",
-                content=request.message
-            )
-            db.add(user_message)
-            await db.commit()
-            
-            # Make sure the agent has access to the OpenAI client
-            for agent_name, agent_obj in agent_utils.agents_store.items():
-                if hasattr(agent_obj, 'model') and hasattr(agent_obj.model, 'openai_client'):
-                    agent_obj.model.openai_client = openai_client
-            
-            # Process sequentially through all agents
-            current_message = request.message
-            final_response = None
-            
-            for i, agent in enumerate(agents):
-                try:
-                    # Pass message to this agent
-                    try:
-                        agent_response = await agent_utils.interact_with_agent_raw(
-                            agent_name=agent.name,
-                            message=current_message,
-                            conversation_id=conversation_id  # Use the same conversation for all agents
-                        )
-                    except Exception as api_error:
-                        # Handle API errors specifically
-                        error_msg = str(api_error)
-                        if "invalid_api_key" in error_msg or "authentication" in error_msg.lower() or "401" in error_msg:
-                            raise HTTPException(
-                                status_code=500, 
-                                detail="API authentication error. Please check your API keys in the environment variables."
-                            )
-                        # Re-raise if it's not an authentication error
-                        raise
-                    
-                    # Update current message for next agent in sequence
-                    current_message = agent_response
-                    
-                    # Store intermediate response in database but don't return to user
-                    intermediate_message = db_module.MessageModel(
-                        conversation_id=conversation_id,
-                        role="intermediate",  # Mark all intermediate messages consistently
-                        content=agent_response,
-                        message_metadata={"agent_name": agent.name, "sequence_position": i}
-                    )
-                    db.add(intermediate_message)
-                    await db.commit()
-                    
-                    # Only keep final response to return to user
-                    if i == len(agents) - 1:
-                        final_response = agent_response
-                        
-                        # Add final response to conversation
-                        final_message = db_module.MessageModel(
-                            conversation_id=conversation_id,
-                            role="assistant",
-                            content=final_response
-                        )
-                        db.add(final_message)
-                        await db.commit()
-                except Exception as e:
-                    print(f"Error with agent {agent.name} in sequence: {str(e)}")
-                    # If an agent fails, break the chain and return error
-                    error_message = f"Error processing with agent {agent.name}: {str(e)}"
-                    error_db_message = db_module.MessageModel(
-                        conversation_id=conversation_id,
-                        role="system",
-                        content=error_message
-                    )
-                    db.add(error_db_message)
-                    await db.commit()
-                    return {
-                        "response": error_message,
-                        "conversation_id": str(conversation_id),
-                        "error": str(e)
-                    }
-            
-            return {
-                "response": final_response,
-                "conversation_id": str(conversation_id)
-            }
+            conversation_id = await get_project_conversation_id(db, project, agents, request.message, conversation_id)
+            agent_names = [agent.name for agent in agents]
+            run = await workflow_runs.create_run(db, project_id, conversation_id, request.message, agent_names)
+            return await run_sequential_workflow(db, run, agent_names, request.message, conversation_id)
         
         # Case 3: Single agent (or fallback)
         # Use the first agent
@@ -2221,26 +2546,10 @@ async def interact_with_project(
             if "error" in response_data:
                 print(f"Error in agent response: {response_data.get('error')}")
             
-            # Update the conversation to link it with the project
-            if isinstance(response_data, dict) and "conversation_id" in response_data:
-                try:
-                    conversation_id = int(response_data["conversation_id"])
-                    conversation_result = await db.execute(
-                        select(db_module.ConversationModel)
-                        .where(db_module.ConversationModel.id == conversation_id)
-                    )
-                    conversation = conversation_result.scalars().first()
-                    
-                    if conversation and not conversation.project_id:
-                        print(f"Linking conversation {conversation_id} to project {project_id}")
-                        conversation.project_id = project_id
-                        await db.commit()
-                except (ValueError, TypeError) as e:
-                    print(f"Error linking conversation to project: {str(e)}")
-                    # If conversion fails, just ignore
-                    pass
-            
+            # The conversation is linked to the project in the same transaction as the turn
             return response_data
+        except llm_scheduler.AdmissionRejected:
+            raise
         except Exception as e:
             error_msg = f"Error in project interaction with agent {primary_agent.name}: {str(e)}"
             print(error_msg)
@@ -2275,11 +2584,177 @@ async def interact_with_project(
                 "conversation_id": conversation_id,
                 "error": "agent_error"
             }
-    except HTTPException:
+    except (HTTPException, llm_scheduler.AdmissionRejected):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to interact with project: {str(e)}")
 
+
+@app.post("/projects/{project_id}/interact/stream")
+async def interact_with_project_stream(project_id: int, request: MessageRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Stream a project interaction as Server-Sent Events.
+    In a sequential workflow each intermediate agent emits a `hop` event with its
+    timing when it finishes, and the last agent's response streams as `token` events;
+    the final `done` (or `error`) event carries the response, conversation ID,
+    per-hop timing and workflow run ID once the turn has been saved; a failed run
+    can be resumed with /projects/{project_id}/workflow_runs/{run_id}/resume.
+    Single agent projects stream that agent; multi-agent systems send their
+    response as a single token event.
+    """
+    project, agents = await get_project_agents(db, project_id)
+    
+    conversation_id = None
+    if request.conversation_id:
+        try:
+            conversation_id = int(request.conversation_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid conversation ID")
+    
+    # Reject up front while the status code can still be set
+    if llm_scheduler.scheduler.is_saturated():
+        raise llm_scheduler.AdmissionRejected("Too many pending requests for the language model", llm_scheduler.scheduler.retry_after())
+    
+    multi_agent_system = None
+    if len(agents) > 1:
+        multi_agent_system = await multi_agent_service.find_system_with_agents(db, [agent.id for agent in agents])
+    agent_names = [agent.name for agent in agents]
+    run = None
+    if len(agents) > 1 and not multi_agent_system:
+        conversation_id = await get_project_conversation_id(db, project, agents, request.message, conversation_id)
+        run = await workflow_runs.create_run(db, project_id, conversation_id, request.message, agent_names)
+    
+    def sse(event: Dict[str, Any]) -> str:
+        return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    
+    def overloaded(e: llm_scheduler.AdmissionRejected) -> Dict[str, Any]:
+        return {
+            "type": "error",
+            "error": "overloaded",
+            "response": str(e),
+            "retry_after": e.retry_after,
+            "conversation_id": str(conversation_id) if conversation_id is not None else None
+        }
+    
+    async def event_stream():
+        # The request-scoped session may be closed before the body is sent, so the
+        # stream owns its session for the lifetime of the response
+        async with db_module.async_session_factory() as session:
+            if multi_agent_system:
+                try:
+                    response = await interact_with_multi_agent_system_endpoint(
+                        system_id=multi_agent_system.id,
+                        request={"message": request.message, "conversation_id": conversation_id, "user_id": request.user_id},
+                        db=session
+                    )
+                except llm_scheduler.AdmissionRejected as e:
+                    # The headers are already sent, so the rejection becomes the terminal event
+                    yield sse(overloaded(e))
+                    return
+                # Errors don't carry a conversation ID; the caller can keep using the one it sent
+                response_conversation_id = response.get("conversation_id") or conversation_id
+                response_conversation_id = str(response_conversation_id) if response_conversation_id is not None else None
+                if "error" in response:
+                    yield sse({"type": "error", "error": response["error"], "response": response["error"], "conversation_id": response_conversation_id})
+                else:
+                    yield sse({"type": "token", "delta": response.get("content", "")})
+                    yield sse({"type": "done", "response": response.get("content", ""), "metadata": response.get("metadata"), "conversation_id": response_conversation_id})
+                return
+            
+            if len(agent_names) == 1:
+                async for event in agent_utils.stream_interact_with_agent(
+                    agent_name=agent_names[0],
+                    message=request.message,
+                    session=session,
+                    conversation_id=conversation_id,
+                    project_id=project_id
+                ):
+                    if event["type"] != "token" and event.get("conversation_id") is not None:
+                        event["conversation_id"] = str(event["conversation_id"])
+                    yield sse(event)
+                return
+            
+            event = {"type": None}
+            try:
+                async for event in sequential_pipeline.run_pipeline(agent_names, request.message, run):
+                    if event["type"] in ("done", "error"):
+                        # Save the turn before telling the caller it is complete
+                        intermediate = event.pop("intermediate")
+                        if event["type"] == "done":
+                            await sequential_pipeline.save_pipeline_turn(session, conversation_id, request.message, intermediate, response=event["response"], run_id=run.id)
+                        else:
+                            await sequential_pipeline.save_pipeline_turn(session, conversation_id, request.message, intermediate, error=event["response"], run_id=run.id)
+                        event["conversation_id"] = str(conversation_id)
+                    yield sse(event)
+            except llm_scheduler.AdmissionRejected as e:
+                # The run is already marked failed and can be resumed once there is capacity
+                yield sse({**overloaded(e), "run_id": run.id})
+            except Exception as e:
+                # Saving the turn failed; mark the run failed (keeping its checkpoints) so it can be resumed right away
+                error_msg = f"Failed to save the workflow turn: {str(e)}"
+                print(error_msg)
+                await session.rollback()
+                failed_step = event.get("position", len(agent_names) - 1) if event["type"] in ("done", "error") else None
+                try:
+                    await run.finish("failed", failed_step=failed_step, error=error_msg)
+                except Exception as finish_error:
+                    # The run becomes resumable once it goes stale
+                    print(f"Error marking workflow run {run.id} failed: {str(finish_error)}")
+                yield sse({
+                    "type": "error",
+                    "error": "save_failed",
+                    "response": error_msg,
+                    "run_id": run.id,
+                    "conversation_id": str(conversation_id)
+                })
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/projects/{project_id}/workflow_runs/{run_id}", response_model=Dict[str, Any])
+async def get_workflow_run(project_id: int, run_id: int, db: AsyncSession = Depends(get_db)):
+    """Get the status, failed step and checkpointed steps of a sequential workflow run."""
+    run = await db.get(db_module.WorkflowRunModel, run_id)
+    if not run or run.project_id != project_id:
+        raise HTTPException(status_code=404, detail="Workflow run not found")
+    result = await db.execute(select(db_module.WorkflowStepModel).where(db_module.WorkflowStepModel.run_id == run_id))
+    return workflow_runs.run_to_dict(run, result.scalars().all())
+
+@app.post("/projects/{project_id}/workflow_runs/{run_id}/resume", response_model=Dict[str, Any])
+async def resume_workflow_run(project_id: int, run_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Resume a failed sequential workflow run. Steps before the failure reuse their
+    checkpointed outputs (unless their agent or input changed), so only the failed
+    step and the ones after it call the model.
+    """
+    try:
+        run = await workflow_runs.claim_run(db, run_id, project_id)
+    except workflow_runs.RunNotResumable as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not run:
+        raise HTTPException(status_code=404, detail="Workflow run not found")
+    
+    # Agents may not be registered in this process yet
+    for agent_name in run.agents:
+        if not await multi_agent_service.load_agent(agent_name, db):
+            await run.finish("failed", error=f"Agent '{agent_name}' not found")
+            raise HTTPException(status_code=409, detail=f"Agent '{agent_name}' of the workflow run no longer exists")
+    
+    conversation_id = run.conversation_id
+    if conversation_id is None:
+        # The conversation was deleted; continue in the project's conversation
+        project, agents = await get_project_agents(db, project_id)
+        conversation_id = await get_project_conversation_id(db, project, agents, run.message)
+        message = run.message
+    else:
+        # An attempt that was rejected or disconnected before saving its turn never saved the message
+        message = None if run.message_saved else run.message
+    return await run_sequential_workflow(db, run, run.agents, message, conversation_id)
+
 @app.get("/projects/{project_id}/conversations", response_model=List[Dict[str, Any]])
 async def get_project_conversations(
     project_id: int,
@@ -2308,14 +2783,7 @@ async def get_project_conversations(
             return []
         
         # Check if this project has a multi-agent system
-        system_result = await db.execute(
-            select(db_module.MultiAgentSystemModel)
-            .where(
-                # Check if all agents in the system match the project's agents
-                db_module.MultiAgentSystemModel.agents.contains([agent.name for agent in agents])
-            )
-        )
-        multi_agent_system = system_result.scalars().first()
+        multi_agent_system = await multi_agent_service.find_system_with_agents(db, [agent.id for agent in agents])
         
         # If multi-agent system exists, get those conversations
         if multi_agent_system:
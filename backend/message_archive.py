@@ -0,0 +1,288 @@
+"""
+Archive tier for cold conversations.
+
+Conversations idle for longer than ARCHIVE_AFTER_DAYS have their messages moved
+out of the messages table into a single compressed blob per conversation
+(archived_conversations), so the table and its indexes only hold the recent
+working set. Blobs are compressed with zstd when the zstandard package is
+installed and with zlib otherwise.
+
+Reads merge archived messages back in transparently (see
+agent_utils.get_conversation_history and conversation_memory.build_context).
+A conversation that is continued after being archived gets its new messages in
+the messages table as usual; once it goes idle again, the next run folds them
+into its blob.
+
+Archived messages are not in the full-text search index, so archiving is opt-in:
+set ARCHIVE_AFTER_DAYS to enable it, knowing that /search/messages stops finding
+messages once their conversation is archived.
+"""
+
+import os
+import json
+import zlib
+import asyncio
+import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, delete, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import database as db
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "0"))  # 0 disables archiving
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "100"))
+ARCHIVE_ZSTD_LEVEL = int(os.getenv("ARCHIVE_ZSTD_LEVEL", "10"))
+
+# Message IDs deleted per statement (keeps clear of SQLite's bound parameter limit)
+DELETE_CHUNK_SIZE = 500
+
+def archiving_enabled() -> bool:
+    return ARCHIVE_AFTER_DAYS > 0
+
+def compress(raw: bytes) -> Tuple[str, bytes]:
+    """Compress with zstd if available, zlib otherwise; returns (codec, data)"""
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ARCHIVE_ZSTD_LEVEL).compress(raw)
+    return "zlib", zlib.compress(raw, 9)
+
+def decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Archived conversation is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    raise ValueError(f"Unknown archive codec: {codec}")
+
+def _message_record(message: db.MessageModel) -> Dict[str, Any]:
+    return {
+        "id": message.id,
+        "role": message.role,
+        "content": message.content,
+        "message_metadata": message.message_metadata,
+        "created_at": message.created_at.isoformat() if message.created_at else None
+    }
+
+def _message_from_record(conversation_id: int, record: Dict[str, Any]) -> db.MessageModel:
+    # A transient (never added to a session) instance, so readers can treat it like a stored message
+    return db.MessageModel(
+        id=record["id"],
+        conversation_id=conversation_id,
+        role=record["role"],
+        content=record["content"],
+        message_metadata=record["message_metadata"],
+        created_at=datetime.datetime.fromisoformat(record["created_at"]) if record["created_at"] else None
+    )
+
+def _read_records(archive: db.ArchivedConversationModel) -> List[Dict[str, Any]]:
+    return json.loads(decompress(archive.codec, archive.data))
+
+def _sort_key(message: db.MessageModel):
+    return (message.created_at or datetime.datetime.min, message.id)
+
+def merge_messages(*message_lists: List[db.MessageModel]) -> List[db.MessageModel]:
+    """Merge archived and stored messages in chronological order"""
+    return sorted((message for messages in message_lists for message in messages), key=_sort_key)
+
+async def load_archived_messages(session: AsyncSession, conversation_id: int) -> List[db.MessageModel]:
+    """
+    Get the archived messages of a conversation, oldest first.
+
+    Returns:
+        Transient MessageModel instances; an empty list if nothing is archived
+    """
+    archive = await session.get(db.ArchivedConversationModel, conversation_id)
+    if archive is None:
+        return []
+    return [_message_from_record(conversation_id, record) for record in _read_records(archive)]
+
+async def archive_conversation(session: AsyncSession, conversation_id: int) -> Optional[Dict[str, int]]:
+    """
+    Move a conversation's messages into its archive blob and commit.
+
+    Messages added while this runs stay in the messages table. If another worker
+    archives the same conversation concurrently, this call backs off.
+
+    Returns:
+        Dict with the number of messages moved and the raw/compressed sizes, or
+        None if there was nothing to archive
+    """
+    result = await session.execute(
+        select(db.MessageModel)
+        .where(db.MessageModel.conversation_id == conversation_id)
+        .order_by(db.MessageModel.created_at, db.MessageModel.id)
+    )
+    messages = result.scalars().all()
+    if not messages:
+        return None
+
+    archive = await session.get(db.ArchivedConversationModel, conversation_id)
+    records = _read_records(archive) if archive is not None else []
+    records.extend(_message_record(message) for message in messages)
+
+    # Delete first: a concurrent archiver deleting the same rows makes this one back off
+    message_ids = [message.id for message in messages]
+    deleted = 0
+    for start in range(0, len(message_ids), DELETE_CHUNK_SIZE):
+        result = await session.execute(
+            delete(db.MessageModel)
+            .where(db.MessageModel.id.in_(message_ids[start:start + DELETE_CHUNK_SIZE]))
+            .execution_options(synchronize_session=False)
+        )
+        deleted += result.rowcount
+    if deleted != len(message_ids):
+        await session.rollback()
+        return None
+
+    raw = json.dumps(records).encode("utf-8")
+    codec, data = compress(raw)
+    if archive is None:
+        archive = db.ArchivedConversationModel(conversation_id=conversation_id)
+        session.add(archive)
+    archive.codec = codec
+    archive.data = data
+    archive.message_count = len(records)
+    archive.raw_size = len(raw)
+    archive.last_message_at = messages[-1].created_at
+    await session.commit()
+
+    return {"messages": len(messages), "raw_bytes": len(raw), "compressed_bytes": len(data)}
+
+async def archive_idle_conversations(
+    session_factory,
+    older_than_days: Optional[float] = None,
+    limit: Optional[int] = None
+) -> Dict[str, int]:
+    """
+    Archive the messages of conversations idle for longer than `older_than_days`.
+
+    Each conversation is archived in its own short transaction.
+
+    Args:
+        session_factory: Factory for the sessions to use
+        older_than_days: Idle time before a conversation is archived (default ARCHIVE_AFTER_DAYS;
+            nothing is archived when it is 0)
+        limit: Maximum number of conversations to archive (default: all candidates)
+
+    Returns:
+        Dict with the number of conversations and messages archived and the raw/compressed sizes
+    """
+    days = ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    totals = {"conversations": 0, "messages": 0, "raw_bytes": 0, "compressed_bytes": 0}
+    if days <= 0:
+        return totals
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+
+    last_seen = None
+    while limit is None or totals["conversations"] < limit:
+        batch_size = ARCHIVE_BATCH_SIZE if limit is None else min(ARCHIVE_BATCH_SIZE, limit - totals["conversations"])
+        async with session_factory() as session:
+            # Idle conversations that still have messages in the hot table
+            query = (
+                select(db.ConversationModel.id)
+                .where(db.ConversationModel.updated_at < cutoff)
+                .where(exists().where(db.MessageModel.conversation_id == db.ConversationModel.id))
+                .order_by(db.ConversationModel.id)
+                .limit(batch_size)
+            )
+            if last_seen is not None:
+                query = query.where(db.ConversationModel.id > last_seen)
+            conversation_ids = (await session.execute(query)).scalars().all()
+        if not conversation_ids:
+            break
+
+        for conversation_id in conversation_ids:
+            async with session_factory() as session:
+                moved = await archive_conversation(session, conversation_id)
+            if moved:
+                totals["conversations"] += 1
+                for key in ("messages", "raw_bytes", "compressed_bytes"):
+                    totals[key] += moved[key]
+        last_seen = conversation_ids[-1]
+
+    return totals
+
+class Archiver:
+    """
+    Background task that periodically archives idle conversations.
+
+    Args:
+        session_factory: Factory for the sessions used by the archiver
+        interval: Seconds between runs
+    """
+
+    def __init__(self, session_factory, interval: float = 3600.0):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.conversations_archived = 0
+        self.messages_archived = 0
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        self.last_run_at: Optional[datetime.datetime] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the background archiver on the running event loop"""
+        if self.running or not archiving_enabled():
+            return
+        self._task = asyncio.create_task(self._run())
+        print(f"Started conversation archiver (after {ARCHIVE_AFTER_DAYS:g} idle days, every {self.interval:g}s)")
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run_once(self, older_than_days: Optional[float] = None) -> Dict[str, int]:
+        totals = await archive_idle_conversations(self.session_factory, older_than_days)
+        self.runs += 1
+        self.last_run_at = datetime.datetime.utcnow()
+        self.conversations_archived += totals["conversations"]
+        self.messages_archived += totals["messages"]
+        self.raw_bytes += totals["raw_bytes"]
+        self.compressed_bytes += totals["compressed_bytes"]
+        if totals["conversations"]:
+            print(f"Archived {totals['messages']} messages of {totals['conversations']} idle conversations "
+                  f"({totals['raw_bytes']} -> {totals['compressed_bytes']} bytes)")
+        return totals
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Error archiving idle conversations: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "codec": "zstd" if zstandard is not None else "zlib",
+            "archive_after_days": ARCHIVE_AFTER_DAYS,
+            "runs": self.runs,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "conversations_archived": self.conversations_archived,
+            "messages_archived": self.messages_archived,
+            "raw_bytes": self.raw_bytes,
+            "compressed_bytes": self.compressed_bytes
+        }
+
+# Shared archiver
+archiver = Archiver(db.async_session_factory, interval=ARCHIVE_INTERVAL_SECONDS)
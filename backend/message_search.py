@@ -0,0 +1,263 @@
+"""
+Full-text search over agent and multi-agent conversation messages.
+
+On SQLite, matches come from the FTS5 tables messages_fts and
+multi_agent_messages_fts (kept in sync by triggers, see database.py), ranked by
+bm25 and highlighted with snippet(). On PostgreSQL, the GIN indexes over
+to_tsvector('english', content) are used with ts_rank and ts_headline. Either
+way a query only reads the index entries of its terms, not the messages table.
+
+Results are ranked across both message tables, so they are paged by offset
+rather than with cursors. Conversations moved to the archive (message_archive.py)
+are not searched.
+"""
+
+import os
+import re
+import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, func, literal_column, table, column, Integer
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import database as db
+
+SEARCH_PAGE_SIZE_DEFAULT = int(os.getenv("SEARCH_PAGE_SIZE_DEFAULT", "20"))
+SEARCH_PAGE_SIZE_MAX = int(os.getenv("SEARCH_PAGE_SIZE_MAX", "100"))
+SNIPPET_TOKENS = int(os.getenv("SEARCH_SNIPPET_TOKENS", "16"))
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+
+SOURCES = ("agent", "multi_agent")
+
+class InvalidSearchQuery(ValueError):
+    """Raised for queries without any searchable terms"""
+
+_TERM = re.compile(r'"([^"]*)"|(\S+)')
+
+def fts5_query(query: str) -> str:
+    """
+    Turn user input into an FTS5 query that matches messages containing every term.
+
+    Words and "quoted phrases" are quoted so FTS5 operators and punctuation in
+    the input can't cause syntax errors; a trailing * keeps prefix matching.
+    """
+    terms = []
+    for phrase, word in _TERM.findall(query):
+        text = phrase if phrase else word
+        prefix = not phrase and text.endswith("*")
+        text = text.rstrip("*") if prefix else text
+        if not re.search(r"\w", text):
+            continue
+        terms.append('"' + text.replace('"', '""') + '"' + ("*" if prefix else ""))
+    if not terms:
+        raise InvalidSearchQuery("Search query has no searchable terms")
+    return " ".join(terms)
+
+def _sqlite_agent_messages(match: str, agent, project_id, created_after, created_before, limit: int):
+    fts = table("messages_fts", column("rowid", Integer))
+    fts_ref = literal_column("messages_fts")
+    query = (
+        select(
+            db.MessageModel.id,
+            db.MessageModel.conversation_id,
+            db.MessageModel.role,
+            db.MessageModel.created_at,
+            db.ConversationModel.project_id,
+            db.AgentModel.name.label("agent"),
+            func.snippet(fts_ref, 0, HIGHLIGHT_START, HIGHLIGHT_END, "…", SNIPPET_TOKENS).label("snippet"),
+            (-func.bm25(fts_ref)).label("score")
+        )
+        .select_from(fts)
+        .join(db.MessageModel, db.MessageModel.id == fts.c.rowid)
+        .join(db.ConversationModel, db.ConversationModel.id == db.MessageModel.conversation_id)
+        .join(db.AgentModel, db.AgentModel.id == db.ConversationModel.agent_id)
+        .where(fts_ref.op("MATCH")(match))
+        .order_by(literal_column("messages_fts.rank"))
+        .limit(limit)
+    )
+    return _filter_agent_messages(query, agent, project_id, created_after, created_before)
+
+def _sqlite_multi_agent_messages(match: str, agent, created_after, created_before, limit: int):
+    fts = table("multi_agent_messages_fts", column("rowid", Integer))
+    fts_ref = literal_column("multi_agent_messages_fts")
+    query = (
+        select(
+            db.MultiAgentMessageModel.id,
+            db.MultiAgentMessageModel.conversation_id,
+            db.MultiAgentMessageModel.role,
+            db.MultiAgentMessageModel.created_at,
+            db.MultiAgentConversationModel.system_id,
+            db.MultiAgentMessageModel.agent,
+            func.snippet(fts_ref, 0, HIGHLIGHT_START, HIGHLIGHT_END, "…", SNIPPET_TOKENS).label("snippet"),
+            (-func.bm25(fts_ref)).label("score")
+        )
+        .select_from(fts)
+        .join(db.MultiAgentMessageModel, db.MultiAgentMessageModel.id == fts.c.rowid)
+        .join(db.MultiAgentConversationModel, db.MultiAgentConversationModel.id == db.MultiAgentMessageModel.conversation_id)
+        .where(fts_ref.op("MATCH")(match))
+        .order_by(literal_column("multi_agent_messages_fts.rank"))
+        .limit(limit)
+    )
+    return _filter_multi_agent_messages(query, agent, created_after, created_before)
+
+def _headline_options() -> str:
+    return f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxWords={SNIPPET_TOKENS}, MinWords={max(1, SNIPPET_TOKENS // 2)}"
+
+def _postgres_agent_messages(text: str, agent, project_id, created_after, created_before, limit: int):
+    config = literal_column("'english'::regconfig")
+    ts_query = func.websearch_to_tsquery(config, text)
+    vector = db.search_vector(db.MessageModel.content)
+    score = func.ts_rank(vector, ts_query)
+    query = (
+        select(
+            db.MessageModel.id,
+            db.MessageModel.conversation_id,
+            db.MessageModel.role,
+            db.MessageModel.created_at,
+            db.ConversationModel.project_id,
+            db.AgentModel.name.label("agent"),
+            func.ts_headline(config, db.MessageModel.content, ts_query, _headline_options()).label("snippet"),
+            score.label("score")
+        )
+        .join(db.ConversationModel, db.ConversationModel.id == db.MessageModel.conversation_id)
+        .join(db.AgentModel, db.AgentModel.id == db.ConversationModel.agent_id)
+        .where(vector.op("@@")(ts_query))
+        .where(db.MessageModel.role.is_distinct_from("intermediate"))
+        .order_by(score.desc())
+        .limit(limit)
+    )
+    return _filter_agent_messages(query, agent, project_id, created_after, created_before)
+
+def _postgres_multi_agent_messages(text: str, agent, created_after, created_before, limit: int):
+    config = literal_column("'english'::regconfig")
+    ts_query = func.websearch_to_tsquery(config, text)
+    vector = db.search_vector(db.MultiAgentMessageModel.content)
+    score = func.ts_rank(vector, ts_query)
+    query = (
+        select(
+            db.MultiAgentMessageModel.id,
+            db.MultiAgentMessageModel.conversation_id,
+            db.MultiAgentMessageModel.role,
+            db.MultiAgentMessageModel.created_at,
+            db.MultiAgentConversationModel.system_id,
+            db.MultiAgentMessageModel.agent,
+            func.ts_headline(config, db.MultiAgentMessageModel.content, ts_query, _headline_options()).label("snippet"),
+            score.label("score")
+        )
+        .join(db.MultiAgentConversationModel, db.MultiAgentConversationModel.id == db.MultiAgentMessageModel.conversation_id)
+        .where(vector.op("@@")(ts_query))
+        .order_by(score.desc())
+        .limit(limit)
+    )
+    return _filter_multi_agent_messages(query, agent, created_after, created_before)
+
+def _filter_agent_messages(query, agent, project_id, created_after, created_before):
+    if agent is not None:
+        query = query.where(db.AgentModel.name == agent)
+    if project_id is not None:
+        query = query.where(db.ConversationModel.project_id == project_id)
+    if created_after is not None:
+        query = query.where(db.MessageModel.created_at >= created_after)
+    if created_before is not None:
+        query = query.where(db.MessageModel.created_at < created_before)
+    return query
+
+def _filter_multi_agent_messages(query, agent, created_after, created_before):
+    if agent is not None:
+        query = query.where(db.MultiAgentMessageModel.agent == agent)
+    if created_after is not None:
+        query = query.where(db.MultiAgentMessageModel.created_at >= created_after)
+    if created_before is not None:
+        query = query.where(db.MultiAgentMessageModel.created_at < created_before)
+    return query
+
+async def search_messages(
+    session: AsyncSession,
+    query: str,
+    agent: Optional[str] = None,
+    project_id: Optional[int] = None,
+    source: Optional[str] = None,
+    created_after: Optional[datetime.datetime] = None,
+    created_before: Optional[datetime.datetime] = None,
+    limit: Optional[int] = None,
+    offset: int = 0
+) -> Dict[str, Any]:
+    """
+    Search message content, best matches first.
+
+    Args:
+        session: Database session
+        query: Words and "quoted phrases" that must all occur; word* matches a
+            prefix on SQLite, and PostgreSQL also accepts websearch syntax (or, -word)
+        agent: Only messages of this agent's conversations (or, for multi-agent
+            conversations, messages written by this agent)
+        project_id: Only messages of this project's conversations; multi-agent
+            conversations have no project and are left out
+        source: "agent" or "multi_agent" to search only one kind of conversation
+        created_after: Only messages created at or after this time
+        created_before: Only messages created before this time
+        limit: Number of results (default SEARCH_PAGE_SIZE_DEFAULT)
+        offset: Number of results to skip
+
+    Returns:
+        Dict with the `results` (source, IDs, role, agent, created_at, highlighted
+        snippet and score) and `has_more`
+    """
+    limit = SEARCH_PAGE_SIZE_DEFAULT if limit is None else max(1, min(limit, SEARCH_PAGE_SIZE_MAX))
+    offset = max(0, offset)
+    if source is not None and source not in SOURCES:
+        raise InvalidSearchQuery(f"Unknown source: {source}")
+    if not query.strip():
+        raise InvalidSearchQuery("Search query is empty")
+
+    # Each source returns its own best matches; the merged list is then paged
+    window = offset + limit + 1
+    postgres = session.bind.dialect.name == "postgresql"
+    match = query if postgres else fts5_query(query)
+
+    results: List[Dict[str, Any]] = []
+    if source in (None, "agent"):
+        if postgres:
+            statement = _postgres_agent_messages(match, agent, project_id, created_after, created_before, window)
+        else:
+            statement = _sqlite_agent_messages(match, agent, project_id, created_after, created_before, window)
+        for row in (await session.execute(statement)).all():
+            results.append({
+                "source": "agent",
+                "message_id": row.id,
+                "conversation_id": row.conversation_id,
+                "project_id": row.project_id,
+                "system_id": None,
+                "agent": row.agent,
+                "role": row.role,
+                "created_at": row.created_at.isoformat() if row.created_at else None,
+                "snippet": row.snippet,
+                "score": float(row.score)
+            })
+
+    if source in (None, "multi_agent") and project_id is None:
+        if postgres:
+            statement = _postgres_multi_agent_messages(match, agent, created_after, created_before, window)
+        else:
+            statement = _sqlite_multi_agent_messages(match, agent, created_after, created_before, window)
+        for row in (await session.execute(statement)).all():
+            results.append({
+                "source": "multi_agent",
+                "message_id": row.id,
+                "conversation_id": row.conversation_id,
+                "project_id": None,
+                "system_id": row.system_id,
+                "agent": row.agent,
+                "role": row.role,
+                "created_at": row.created_at.isoformat() if row.created_at else None,
+                "snippet": row.snippet,
+                "score": float(row.score)
+            })
+
+    results.sort(key=lambda result: result["score"], reverse=True)
+    return {
+        "results": results[offset:offset + limit],
+        "has_more": len(results) > offset + limit
+    }
@@ -0,0 +1,353 @@
+"""
+Message persistence for agent conversations.
+
+A conversation turn (conversation lookup or creation, project linking, timestamp
+update and the user/assistant messages) is written in a single transaction.
+Optionally, message inserts can go through a write-behind queue that group-commits
+messages from many concurrent conversations in one transaction.
+
+Write-behind mode is selected with MESSAGE_WRITE_BEHIND:
+    off    - every turn commits its own single transaction (default)
+    group  - messages are queued and the caller waits for the group commit
+    async  - messages are queued and the caller returns immediately; a crash can
+             lose turns that have not been flushed yet, and a failed group commit
+             is logged and counted (batches_failed, messages_failed) but not retried
+"""
+
+import os
+import asyncio
+import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import database as db
+
+class MessageWriteBehind:
+    """
+    Background queue that batches message inserts into group commits.
+
+    Args:
+        session_factory: Factory for the sessions used by the background writer
+        batch_size: Maximum number of messages written per transaction
+        max_delay: Seconds to wait for more messages after the first one arrives
+    """
+
+    def __init__(self, session_factory, batch_size: int = 200, max_delay: float = 0.02):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches_written = 0
+        self.messages_written = 0
+        self.batches_failed = 0
+        self.messages_failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the background writer on the running event loop"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+        print(f"Started message write-behind queue (batch_size={self.batch_size}, max_delay={self.max_delay}s)")
+
+    async def stop(self):
+        """Flush pending messages and stop the background writer"""
+        if not self.running:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def enqueue(self, conversation_id: int, messages: List[Dict[str, Any]]) -> asyncio.Future:
+        """
+        Queue messages for a conversation.
+
+        Args:
+            conversation_id: ID of an existing conversation
+            messages: Dictionaries with role, content and optional message_metadata
+
+        Returns:
+            A future resolved once the messages are committed
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((conversation_id, messages, future))
+        return future
+
+    def detach(self, future: asyncio.Future, conversation_id: int):
+        """Log the outcome of a write nobody awaits, so a failed group commit isn't silently dropped"""
+        def log_failure(done: asyncio.Future):
+            if not done.cancelled() and done.exception() is not None:
+                print(f"Lost messages of conversation {conversation_id} in a failed group commit: {str(done.exception())}")
+        future.add_done_callback(log_failure)
+
+    async def _run(self):
+        while True:
+            items = [await self._queue.get()]
+            count = len(items[0][1])
+
+            # Give concurrent conversations a moment to join this transaction
+            deadline = asyncio.get_running_loop().time() + self.max_delay
+            while count < self.batch_size:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                items.append(item)
+                count += len(item[1])
+
+            try:
+                await self._write_batch(items)
+                for _, _, future in items:
+                    if not future.done():
+                        future.set_result(True)
+            except Exception as e:
+                print(f"Error writing message batch of {count} messages: {str(e)}")
+                self.batches_failed += 1
+                self.messages_failed += count
+                for _, _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+
+    async def _write_batch(self, items):
+        now = datetime.datetime.utcnow()
+        async with self.session_factory() as session:
+            rows = []
+            for conversation_id, messages, _ in items:
+                for message in messages:
+                    rows.append(db.MessageModel(conversation_id=conversation_id, **message))
+            session.add_all(rows)
+
+            conversation_ids = {conversation_id for conversation_id, _, _ in items}
+            await session.execute(
+                update(db.ConversationModel)
+                .where(db.ConversationModel.id.in_(conversation_ids))
+                .values(updated_at=now)
+            )
+            await session.commit()
+
+        self.batches_written += 1
+        self.messages_written += len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get queue depth and throughput counters"""
+        return {
+            "running": self.running,
+            "pending": self._queue.qsize() if self._queue else 0,
+            "batches_written": self.batches_written,
+            "messages_written": self.messages_written,
+            "batches_failed": self.batches_failed,
+            "messages_failed": self.messages_failed
+        }
+
+# Write-behind mode and the shared queue (started by the application on startup)
+WRITE_BEHIND_MODE = os.getenv("MESSAGE_WRITE_BEHIND", "off").lower()
+write_behind = MessageWriteBehind(
+    db.async_session_factory,
+    batch_size=int(os.getenv("MESSAGE_WRITE_BEHIND_BATCH_SIZE", "200")),
+    max_delay=float(os.getenv("MESSAGE_WRITE_BEHIND_MAX_DELAY_MS", "20")) / 1000.0
+)
+
+def write_behind_enabled() -> bool:
+    return WRITE_BEHIND_MODE in ("group", "async")
+
+async def find_conversation_id(
+    session: AsyncSession,
+    agent_name: str,
+    conversation_id: Optional[int] = None
+) -> Optional[int]:
+    """
+    Find, without writing anything, the conversation a turn would be saved to.
+
+    Mirrors resolve_conversation: the given conversation if it exists, otherwise the
+    agent's most recently updated (non-batch) conversation, otherwise None.
+    """
+    if conversation_id:
+        result = await session.execute(select(db.ConversationModel.id).where(db.ConversationModel.id == conversation_id))
+        if result.scalar() is not None:
+            return conversation_id
+
+    result = await session.execute(
+        select(db.ConversationModel.id)
+        .join(db.AgentModel)
+        .where(db.AgentModel.name == agent_name)
+        .where(db.ConversationModel.is_batch == False)
+        .order_by(db.ConversationModel.updated_at.desc())
+        .limit(1)
+    )
+    return result.scalar()
+
+async def resolve_conversation(
+    session: AsyncSession,
+    agent_model: db.AgentModel,
+    conversation_id: Optional[int] = None
+) -> db.ConversationModel:
+    """
+    Get the conversation a turn belongs to without committing.
+
+    Uses the given conversation if it exists, otherwise the agent's most recently
+    updated conversation (batch conversations excluded), otherwise a new (flushed,
+    uncommitted) one.
+    """
+    conversation = None
+    if conversation_id:
+        # Try to get the specified conversation
+        result = await session.execute(select(db.ConversationModel).where(db.ConversationModel.id == conversation_id))
+        conversation = result.scalars().first()
+
+    # If no valid conversation_id or conversation not found, check for most recent conversation for this agent
+    if not conversation:
+        result = await session.execute(
+            select(db.ConversationModel)
+            .where(db.ConversationModel.agent_id == agent_model.id)
+            .where(db.ConversationModel.is_batch == False)
+            .order_by(db.ConversationModel.updated_at.desc())
+            .limit(1)
+        )
+        conversation = result.scalars().first()
+
+        if conversation:
+            print(f"Reusing most recent conversation {conversation.id} for agent {agent_model.name}")
+        else:
+            print(f"Creating new conversation for agent {agent_model.name}")
+            conversation = db.ConversationModel(
+                agent_id=agent_model.id,
+                title=f"Conversation with {agent_model.name}"
+            )
+            session.add(conversation)
+            await session.flush()
+
+    return conversation
+
+async def save_turn(
+    session: AsyncSession,
+    agent_name: str,
+    user_message: str,
+    agent_response: str,
+    conversation_id: Optional[int] = None,
+    project_id: Optional[int] = None
+) -> int:
+    """
+    Persist one user/assistant exchange.
+
+    Conversation resolution, project linking, the timestamp update and both messages
+    are committed together, so a turn is either fully saved or not at all. In
+    write-behind mode only a newly created conversation (or project link) is committed
+    here and the messages are handed to the group-commit queue.
+
+    Args:
+        session: Database session
+        agent_name: Name of the agent
+        user_message: Message sent by the user
+        agent_response: Response returned by the agent
+        conversation_id: Optional conversation to append to
+        project_id: Optional project to link the conversation to
+
+    Returns:
+        ID of the conversation the turn was saved to
+    """
+    messages = [
+        {"role": "user", "content": user_message},
+        {"role": "assistant", "content": agent_response}
+    ]
+
+    try:
+        result = await session.execute(select(db.AgentModel).where(db.AgentModel.name == agent_name))
+        agent_model = result.scalars().first()
+        if not agent_model:
+            raise ValueError(f"Agent {agent_name} not found in database")
+
+        conversation = await resolve_conversation(session, agent_model, conversation_id)
+        conversation_id = conversation.id
+
+        # Link to project if provided and not already linked
+        if project_id and not conversation.project_id:
+            conversation.project_id = project_id
+
+        if write_behind_enabled() and write_behind.running:
+            # Only a new conversation or project link is written inline (a read-only
+            # transaction commits without touching the disk); messages are group-committed
+            await session.commit()
+            future = write_behind.enqueue(conversation_id, messages)
+            if WRITE_BEHIND_MODE == "group":
+                await future
+            else:
+                write_behind.detach(future, conversation_id)
+            return conversation_id
+
+        # Update conversation timestamp to mark as recently used
+        conversation.updated_at = datetime.datetime.utcnow()
+        session.add_all(db.MessageModel(conversation_id=conversation_id, **message) for message in messages)
+        await session.commit()
+        return conversation_id
+    except Exception:
+        await session.rollback()
+        raise
+
+async def save_exchanges(
+    session: AsyncSession,
+    agent_name: str,
+    exchanges: List[Dict[str, Any]],
+    conversation_id: Optional[int] = None,
+    title: Optional[str] = None
+) -> int:
+    """
+    Bulk-insert many independent user/assistant exchanges in one transaction.
+
+    Used by batch jobs; unlike save_turn it never falls back to the agent's most
+    recent conversation but creates a dedicated one on the first call, marked as a
+    batch conversation so later turns don't fall back to it either.
+
+    Args:
+        session: Database session
+        agent_name: Name of the agent
+        exchanges: Dictionaries with user_message, agent_response and optional metadata
+        conversation_id: Conversation to append to (created if None)
+        title: Title for a newly created conversation
+
+    Returns:
+        ID of the conversation the exchanges were saved to
+    """
+    try:
+        if not conversation_id:
+            result = await session.execute(select(db.AgentModel.id).where(db.AgentModel.name == agent_name))
+            agent_id = result.scalar()
+            if agent_id is None:
+                raise ValueError(f"Agent {agent_name} not found in database")
+            conversation = db.ConversationModel(agent_id=agent_id, title=title or f"Batch with {agent_name}", is_batch=True)
+            session.add(conversation)
+            await session.flush()
+            conversation_id = conversation.id
+
+        rows = []
+        for exchange in exchanges:
+            metadata = exchange.get("metadata")
+            rows.append(db.MessageModel(conversation_id=conversation_id, role="user", content=exchange["user_message"], message_metadata=metadata))
+            rows.append(db.MessageModel(conversation_id=conversation_id, role="assistant", content=exchange["agent_response"], message_metadata=metadata))
+        session.add_all(rows)
+        await session.execute(
+            update(db.ConversationModel)
+            .where(db.ConversationModel.id == conversation_id)
+            .values(updated_at=datetime.datetime.utcnow())
+        )
+        await session.commit()
+        return conversation_id
+    except Exception:
+        await session.rollback()
+        raise
@@ -0,0 +1,28 @@
+"""Add agent response cache mode
+
+Revision ID: 5b7e2c91a4d3
+Revises: d99a13384ee1
+Create Date: 2026-10-16 10:04:27.730615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e2c91a4d3'
+down_revision: Union[str, None] = 'd99a13384ee1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('agents', sa.Column('response_cache', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('agents', 'response_cache')
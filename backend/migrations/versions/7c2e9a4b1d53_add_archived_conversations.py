@@ -0,0 +1,78 @@
+"""Add archived conversations
+
+Revision ID: 7c2e9a4b1d53
+Revises: f4a1c9e27b35
+Create Date: 2026-10-16 22:05:17.604385
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e9a4b1d53'
+down_revision: Union[str, None] = 'f4a1c9e27b35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'archived_conversations',
+        sa.Column('conversation_id', sa.Integer(), nullable=False),
+        sa.Column('codec', sa.String(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('message_count', sa.Integer(), nullable=False),
+        sa.Column('raw_size', sa.Integer(), nullable=False),
+        sa.Column('last_message_at', sa.DateTime(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('conversation_id'),
+        if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema.
+
+    Archived messages only exist in the archive, so they are moved back first.
+    """
+    import datetime
+    import json
+    import zlib
+
+    bind = op.get_bind()
+    messages = sa.table(
+        'messages',
+        sa.column('id', sa.Integer()),
+        sa.column('conversation_id', sa.Integer()),
+        sa.column('role', sa.String()),
+        sa.column('content', sa.Text()),
+        sa.column('message_metadata', sa.JSON()),
+        sa.column('created_at', sa.DateTime())
+    )
+    for conversation_id, codec, data in bind.execute(sa.text('SELECT conversation_id, codec, data FROM archived_conversations')).all():
+        if codec == 'zstd':
+            import zstandard
+            raw = zstandard.ZstdDecompressor().decompress(data)
+        else:
+            raw = zlib.decompress(data)
+        records = json.loads(raw)
+        ids = [record['id'] for record in records]
+        taken = {row[0] for row in bind.execute(sa.select(messages.c.id).where(messages.c.id.in_(ids)))} if ids else set()
+        for record in records:
+            row = {
+                'conversation_id': conversation_id,
+                'role': record['role'],
+                'content': record['content'],
+                'message_metadata': record['message_metadata'],
+                'created_at': datetime.datetime.fromisoformat(record['created_at']) if record['created_at'] else None
+            }
+            # Keep the original ID unless it has been reused in the meantime
+            if record['id'] not in taken:
+                row['id'] = record['id']
+            bind.execute(sa.insert(messages).values(**row))
+    op.drop_table('archived_conversations')
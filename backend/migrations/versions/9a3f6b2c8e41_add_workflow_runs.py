@@ -0,0 +1,63 @@
+"""Add workflow runs and step checkpoints
+
+Revision ID: 9a3f6b2c8e41
+Revises: b5e8d2f06a14
+Create Date: 2026-10-16 23:48:09.517264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a3f6b2c8e41'
+down_revision: Union[str, None] = 'b5e8d2f06a14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'workflow_runs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('conversation_id', sa.Integer(), nullable=True),
+        sa.Column('message', sa.Text(), nullable=False),
+        sa.Column('agents', sa.JSON(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('failed_step', sa.Integer(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('message_saved', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True
+    )
+    op.create_index(op.f('ix_workflow_runs_id'), 'workflow_runs', ['id'], unique=False, if_not_exists=True)
+    op.create_index('ix_workflow_runs_project_created', 'workflow_runs', ['project_id', 'created_at'], unique=False, if_not_exists=True)
+    op.create_table(
+        'workflow_steps',
+        sa.Column('run_id', sa.Integer(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('agent_name', sa.String(), nullable=False),
+        sa.Column('input_hash', sa.String(), nullable=False),
+        sa.Column('output', sa.Text(), nullable=False),
+        sa.Column('duration_ms', sa.Float(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['run_id'], ['workflow_runs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('run_id', 'position'),
+        if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('workflow_steps')
+    op.drop_index('ix_workflow_runs_project_created', table_name='workflow_runs')
+    op.drop_index(op.f('ix_workflow_runs_id'), table_name='workflow_runs')
+    op.drop_table('workflow_runs')
@@ -0,0 +1,43 @@
+"""Add composite indexes for conversation and message hot paths
+
+Revision ID: a41f6c0d2e87
+Revises: 5b7e2c91a4d3
+Create Date: 2026-10-16 13:47:09.214356
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41f6c0d2e87'
+down_revision: Union[str, None] = '5b7e2c91a4d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index name, table, columns); databases created with create_all may already have them
+INDEXES = [
+    ('ix_messages_conversation_created', 'messages', ['conversation_id', 'created_at', 'id']),
+    ('ix_conversations_agent_updated', 'conversations', ['agent_id', 'updated_at']),
+    ('ix_conversations_project_updated', 'conversations', ['project_id', 'updated_at']),
+    ('ix_project_solutions_project_agent', 'project_solutions', ['project_id', 'agent_id']),
+    ('ix_multi_agent_conversations_system_created', 'multi_agent_conversations', ['system_id', 'created_at']),
+    ('ix_multi_agent_messages_conversation_created', 'multi_agent_messages', ['conversation_id', 'created_at', 'id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+    # Refresh planner statistics so the new indexes are picked up
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute('ANALYZE')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,28 @@
+"""Add multi-agent system speculative mode
+
+Revision ID: b5e8d2f06a14
+Revises: 7c2e9a4b1d53
+Create Date: 2026-10-16 23:10:52.184307
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e8d2f06a14'
+down_revision: Union[str, None] = '7c2e9a4b1d53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('multi_agent_systems', sa.Column('speculative', sa.Boolean(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('multi_agent_systems', 'speculative')
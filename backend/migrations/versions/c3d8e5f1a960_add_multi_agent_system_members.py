@@ -0,0 +1,61 @@
+"""Add multi-agent system membership table
+
+Revision ID: c3d8e5f1a960
+Revises: a41f6c0d2e87
+Create Date: 2026-10-16 15:12:40.381952
+
+"""
+from typing import Sequence, Union
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d8e5f1a960'
+down_revision: Union[str, None] = 'a41f6c0d2e87'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'multi_agent_system_members',
+        sa.Column('system_id', sa.String(), nullable=False),
+        sa.Column('agent_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['system_id'], ['multi_agent_systems.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['agent_id'], ['agents.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('system_id', 'agent_id'),
+        if_not_exists=True
+    )
+    op.create_index('ix_multi_agent_system_members_agent', 'multi_agent_system_members', ['agent_id', 'system_id'], unique=False, if_not_exists=True)
+
+    # Backfill from the JSON list of agent names on each system
+    bind = op.get_bind()
+    agent_ids = {name: agent_id for agent_id, name in bind.execute(sa.text('SELECT id, name FROM agents'))}
+    existing = set(bind.execute(sa.text('SELECT system_id, agent_id FROM multi_agent_system_members')))
+    members = []
+    for system_id, agents in bind.execute(sa.text('SELECT id, agents FROM multi_agent_systems')):
+        if isinstance(agents, str):
+            try:
+                agents = json.loads(agents)
+            except ValueError:
+                agents = []
+        for agent_name in agents or []:
+            agent_id = agent_ids.get(agent_name)
+            if agent_id is not None and (system_id, agent_id) not in existing:
+                existing.add((system_id, agent_id))
+                members.append({'system_id': system_id, 'agent_id': agent_id})
+    if members:
+        bind.execute(
+            sa.text('INSERT INTO multi_agent_system_members (system_id, agent_id) VALUES (:system_id, :agent_id)'),
+            members
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_multi_agent_system_members_agent', table_name='multi_agent_system_members')
+    op.drop_table('multi_agent_system_members')
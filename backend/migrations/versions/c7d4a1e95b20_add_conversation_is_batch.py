@@ -0,0 +1,31 @@
+"""Add conversation is_batch flag
+
+Revision ID: c7d4a1e95b20
+Revises: 9a3f6b2c8e41
+Create Date: 2026-10-17 09:14:36.402715
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d4a1e95b20'
+down_revision: Union[str, None] = '9a3f6b2c8e41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing conversations are regular ones
+    op.add_column('conversations', sa.Column('is_batch', sa.Boolean(), nullable=False, server_default=sa.false()))
+    # Batch conversations saved so far are recognizable by their title
+    op.execute("UPDATE conversations SET is_batch = TRUE WHERE title LIKE 'Batch with %'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('conversations', 'is_batch')
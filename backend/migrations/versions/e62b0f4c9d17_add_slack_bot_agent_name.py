@@ -0,0 +1,39 @@
+"""Add agent name to Slack bots
+
+Revision ID: e62b0f4c9d17
+Revises: c3d8e5f1a960
+Create Date: 2026-10-16 16:38:52.604117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e62b0f4c9d17'
+down_revision: Union[str, None] = 'c3d8e5f1a960'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases created with create_all after this change already have the column
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('slack_bots')}
+    if 'agent_name' not in columns:
+        op.add_column('slack_bots', sa.Column('agent_name', sa.String(), nullable=True))
+    op.create_index('ix_slack_bots_agent_name', 'slack_bots', ['agent_name'], unique=True, if_not_exists=True)
+
+    op.execute(
+        'UPDATE slack_bots SET agent_name = (SELECT agents.name FROM agents WHERE agents.id = slack_bots.agent_id) '
+        'WHERE agent_name IS NULL AND agent_id IS NOT NULL'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_slack_bots_agent_name', table_name='slack_bots', if_exists=True)
+    with op.batch_alter_table('slack_bots') as batch_op:
+        batch_op.drop_column('agent_name')
@@ -0,0 +1,31 @@
+"""Add conversation creation index for keyset paging
+
+Revision ID: e83b5d0a7c16
+Revises: c7d4a1e95b20
+Create Date: 2026-10-18 10:22:51.630948
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e83b5d0a7c16'
+down_revision: Union[str, None] = 'c7d4a1e95b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Conversation listings page on (created_at, id), which doesn't move when a message is saved
+    op.create_index('ix_conversations_agent_created', 'conversations', ['agent_id', 'created_at', 'id'], unique=False, if_not_exists=True)
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute('ANALYZE')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_conversations_agent_created', table_name='conversations', if_exists=True)
@@ -0,0 +1,65 @@
+"""Add full-text search indexes over messages
+
+Revision ID: f4a1c9e27b35
+Revises: e62b0f4c9d17
+Create Date: 2026-10-16 21:12:40.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4a1c9e27b35'
+down_revision: Union[str, None] = 'e62b0f4c9d17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MESSAGE_TABLES = ('messages', 'multi_agent_messages')
+
+
+def fts5_ddl(table_name: str):
+    fts = f'{table_name}_fts'
+    add_new = f"INSERT INTO {fts}(rowid, content) SELECT new.id, new.content WHERE new.role IS NOT 'intermediate';"
+    remove_old = f"INSERT INTO {fts}({fts}, rowid, content) SELECT 'delete', old.id, old.content WHERE old.role IS NOT 'intermediate';"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"content, content='{table_name}', content_rowid='id', tokenize='porter unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table_name} BEGIN {add_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table_name} BEGIN {remove_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF content, role ON {table_name} BEGIN {remove_old} {add_new} END",
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    for table_name in MESSAGE_TABLES:
+        if dialect == 'sqlite':
+            for statement in fts5_ddl(table_name):
+                op.execute(statement)
+            # Index the existing messages
+            op.execute(f"INSERT INTO {table_name}_fts({table_name}_fts) VALUES('delete-all')")
+            op.execute(
+                f"INSERT INTO {table_name}_fts(rowid, content) "
+                f"SELECT id, content FROM {table_name} WHERE role IS NOT 'intermediate'"
+            )
+        elif dialect == 'postgresql':
+            op.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_{table_name}_content_search ON {table_name} "
+                f"USING gin (to_tsvector('english'::regconfig, coalesce(content, '')))"
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    for table_name in MESSAGE_TABLES:
+        if dialect == 'sqlite':
+            for suffix in ('insert', 'delete', 'update'):
+                op.execute(f'DROP TRIGGER IF EXISTS {table_name}_fts_{suffix}')
+            op.execute(f'DROP TABLE IF EXISTS {table_name}_fts')
+        elif dialect == 'postgresql':
+            op.drop_index(f'ix_{table_name}_content_search', table_name=table_name, if_exists=True)
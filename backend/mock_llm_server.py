@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+OpenAI-compatible stand-in for the LiteLLM gateway, for load testing the backend.
+
+Implements the endpoints the backend uses (chat completions, streaming and not,
+and embeddings) with configurable latency, token rate and error injection, so the
+backend's own overhead can be measured without calling a real model.
+
+Usage:
+    python mock_llm_server.py --port 4000 --latency-ms 300 --tokens-per-second 80
+    LITELLM_BASE_URL=http://127.0.0.1:4000/v1 uvicorn main:app
+
+Options can also be set with MOCK_LLM_* environment variables (see --help).
+"""
+
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import argparse
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Mock behaviour, overridable from the command line
+settings = {
+    "latency_ms": float(os.getenv("MOCK_LLM_LATENCY_MS", "200")),
+    "latency_jitter_ms": float(os.getenv("MOCK_LLM_LATENCY_JITTER_MS", "50")),
+    "tokens_per_second": float(os.getenv("MOCK_LLM_TOKENS_PER_SECOND", "100")),
+    "completion_tokens": int(os.getenv("MOCK_LLM_COMPLETION_TOKENS", "60")),
+    "error_rate": float(os.getenv("MOCK_LLM_ERROR_RATE", "0")),
+    "rate_limit_rate": float(os.getenv("MOCK_LLM_RATE_LIMIT_RATE", "0")),
+    "embedding_dimensions": int(os.getenv("MOCK_LLM_EMBEDDING_DIMENSIONS", "256"))
+}
+
+# Counters exposed at /stats
+stats = {"chat_completions": 0, "streamed_completions": 0, "embeddings": 0, "errors": 0, "rate_limited": 0}
+
+WORDS = (
+    "the agent reviewed your request and prepared a short answer based on the available "
+    "information while noting assumptions risks and next steps for the team to follow up"
+).split()
+
+app = FastAPI(title="Mock LLM gateway")
+
+def _completion_text(messages: List[Dict[str, Any]]) -> str:
+    # Triage prompts list the agents; pick the first one so routing works end to end
+    prompt = str(messages[-1].get("content", "")) if messages else ""
+    if "Selected Agent:" in prompt and "Available agents:" in prompt:
+        for line in prompt.split("Available agents:", 1)[1].splitlines():
+            line = line.strip()
+            if line.startswith("- ") and ":" in line:
+                agent_name = line[2:].split(":", 1)[0].strip()
+                return f"Reasoning: Mock triage picked the first agent.\nSelected Agent: {agent_name}"
+    return " ".join(WORDS[i % len(WORDS)] for i in range(settings["completion_tokens"]))
+
+def _usage(messages: List[Dict[str, Any]], completion: str) -> Dict[str, int]:
+    prompt_tokens = sum(len(str(message.get("content", ""))) for message in messages) // 4
+    completion_tokens = len(completion.split())
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+async def _first_token_delay():
+    delay = settings["latency_ms"] + random.uniform(-1, 1) * settings["latency_jitter_ms"]
+    await asyncio.sleep(max(delay, 0) / 1000.0)
+
+def _injected_error():
+    roll = random.random()
+    if roll < settings["rate_limit_rate"]:
+        stats["rate_limited"] += 1
+        return JSONResponse(
+            status_code=429,
+            content={"error": {"message": "Mock rate limit", "type": "rate_limit_error"}},
+            headers={"Retry-After": "1"}
+        )
+    if roll < settings["rate_limit_rate"] + settings["error_rate"]:
+        stats["errors"] += 1
+        return JSONResponse(status_code=500, content={"error": {"message": "Mock server error", "type": "server_error"}})
+    return None
+
+@app.post("/v1/chat/completions")
+@app.post("/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    messages = body.get("messages", [])
+    model = body.get("model", "mock")
+
+    error = _injected_error()
+    if error is not None:
+        return error
+
+    await _first_token_delay()
+    completion = _completion_text(messages)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+
+    if not body.get("stream"):
+        stats["chat_completions"] += 1
+        # Generation time for the whole completion at the configured token rate
+        await asyncio.sleep(len(completion.split()) / settings["tokens_per_second"])
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": completion},
+                "finish_reason": "stop"
+            }],
+            "usage": _usage(messages, completion)
+        }
+
+    stats["streamed_completions"] += 1
+    include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+    def chunk(delta: Dict[str, Any], finish_reason=None, usage=None) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if usage is None else []
+        }
+        if usage is not None:
+            payload["usage"] = usage
+        return f"data: {json.dumps(payload)}\n\n"
+
+    async def stream():
+        yield chunk({"role": "assistant", "content": ""})
+        words = completion.split(" ")
+        for index, word in enumerate(words):
+            await asyncio.sleep(1.0 / settings["tokens_per_second"])
+            yield chunk({"content": word if index == 0 else " " + word})
+        yield chunk({}, finish_reason="stop")
+        if include_usage:
+            yield chunk({}, usage=_usage(messages, completion))
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+@app.post("/v1/embeddings")
+@app.post("/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    inputs = body.get("input", [])
+    if isinstance(inputs, str):
+        inputs = [inputs]
+
+    error = _injected_error()
+    if error is not None:
+        return error
+
+    stats["embeddings"] += 1
+    await asyncio.sleep(settings["latency_ms"] / 4000.0)
+
+    data = []
+    for index, text in enumerate(inputs):
+        # Deterministic per text, so identical inputs embed identically
+        seed = int(hashlib.sha256(str(text).encode("utf-8")).hexdigest()[:16], 16)
+        rng = random.Random(seed)
+        data.append({
+            "object": "embedding",
+            "index": index,
+            "embedding": [rng.uniform(-1, 1) for _ in range(settings["embedding_dimensions"])]
+        })
+    return {
+        "object": "list",
+        "data": data,
+        "model": body.get("model", "mock-embedding"),
+        "usage": {"prompt_tokens": 0, "total_tokens": 0}
+    }
+
+@app.get("/v1/models")
+@app.get("/models")
+async def list_models():
+    return {"object": "list", "data": [{"id": "gpt-4o", "object": "model", "owned_by": "mock"}]}
+
+@app.get("/stats")
+async def get_stats():
+    return {"settings": settings, **stats}
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock LLM server for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4000)
+    parser.add_argument("--latency-ms", type=float, default=settings["latency_ms"], help="Time to first token")
+    parser.add_argument("--latency-jitter-ms", type=float, default=settings["latency_jitter_ms"])
+    parser.add_argument("--tokens-per-second", type=float, default=settings["tokens_per_second"])
+    parser.add_argument("--completion-tokens", type=int, default=settings["completion_tokens"])
+    parser.add_argument("--error-rate", type=float, default=settings["error_rate"], help="Share of requests answered with HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=settings["rate_limit_rate"], help="Share of requests answered with HTTP 429")
+    args = parser.parse_args()
+
+    settings.update({
+        "latency_ms": args.latency_ms,
+        "latency_jitter_ms": args.latency_jitter_ms,
+        "tokens_per_second": args.tokens_per_second,
+        "completion_tokens": args.completion_tokens,
+        "error_rate": args.error_rate,
+        "rate_limit_rate": args.rate_limit_rate
+    })
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
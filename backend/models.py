@@ -15,6 +15,7 @@ class MultiAgentSystem(BaseModel):
     agents: List[str]  # List of agent names in the system
     triage_agent: str  # Name of the triage agent
     connections: List[AgentConnection] = []  # Connections between agents
+    speculative: bool = False  # Run the likely downstream agent alongside triage
     created_at: Optional[str] = None
     
 class MultiAgentSystemResponse(BaseModel):
@@ -25,4 +26,5 @@ class MultiAgentSystemResponse(BaseModel):
     agents: List[str]
     triage_agent: str
     connections: List[AgentConnection]
+    speculative: bool = False
     created_at: str 
\ No newline at end of file
@@ -4,9 +4,12 @@ import json
 import os
 from typing import List, Dict, Optional, Any
 import agent_utils
+import agent_router
+import speculation
+import llm_scheduler
 from models import AgentConnection, MultiAgentSystem
 import database as db
-from sqlalchemy import select
+from sqlalchemy import select, delete, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 # In-memory storage for multi-agent systems (for runtime use)
@@ -18,7 +21,8 @@ async def create_multi_agent_system(
     description: str, 
     agent_names: List[str], 
     triage_agent_name: str, 
-    connections: List[AgentConnection] = None
+    connections: List[AgentConnection] = None,
+    speculative: bool = False
 ) -> MultiAgentSystem:
     """
     Create a new multi-agent system
@@ -49,6 +53,7 @@ async def create_multi_agent_system(
         agents=agent_names,
         triage_agent=triage_agent_name,
         connections=connections,
+        speculative=speculative,
         created_at=created_at
     )
     
@@ -63,13 +68,76 @@ async def create_multi_agent_system(
         agents=agent_names,
         triage_agent=triage_agent_name,
         connections=[conn.dict() for conn in connections],
+        speculative=speculative,
         created_at=datetime.datetime.fromisoformat(created_at)
     )
     session.add(db_system)
+    await set_system_members(session, system_id, agent_names)
     await session.commit()
     
     return system
 
+async def set_system_members(session: AsyncSession, system_id: str, agent_names: List[str]):
+    """
+    Replace the membership rows of a multi-agent system (the caller commits)
+    
+    Args:
+        session: Database session
+        system_id: ID of the multi-agent system
+        agent_names: Names of the agents in the system
+    """
+    await session.execute(
+        delete(db.MultiAgentSystemMemberModel).where(db.MultiAgentSystemMemberModel.system_id == system_id)
+    )
+    if not agent_names:
+        return
+    result = await session.execute(select(db.AgentModel.id).where(db.AgentModel.name.in_(agent_names)))
+    session.add_all([
+        db.MultiAgentSystemMemberModel(system_id=system_id, agent_id=agent_id)
+        for agent_id in set(result.scalars().all())
+    ])
+
+async def find_system_with_agents(session: AsyncSession, agent_ids: List[int]) -> Optional[db.MultiAgentSystemModel]:
+    """
+    Find the multi-agent system made up of exactly these agents
+    
+    Both lookups are served by indexes on multi_agent_system_members, so the cost
+    does not grow with the number of systems.
+    
+    Args:
+        session: Database session
+        agent_ids: IDs of the agents
+        
+    Returns:
+        The oldest matching multi-agent system model or None
+    """
+    agent_ids = set(agent_ids)
+    if not agent_ids:
+        return None
+    
+    members = db.MultiAgentSystemMemberModel
+    # Systems containing all of the agents...
+    containing = (
+        select(members.system_id)
+        .where(members.agent_id.in_(agent_ids))
+        .group_by(members.system_id)
+        .having(func.count() == len(agent_ids))
+    )
+    # ...and no others
+    exact = (
+        select(members.system_id)
+        .where(members.system_id.in_(containing))
+        .group_by(members.system_id)
+        .having(func.count() == len(agent_ids))
+    )
+    result = await session.execute(
+        select(db.MultiAgentSystemModel)
+        .where(db.MultiAgentSystemModel.id.in_(exact))
+        .order_by(db.MultiAgentSystemModel.created_at)
+        .limit(1)
+    )
+    return result.scalars().first()
+
 def get_multi_agent_system(system_id: str) -> Optional[MultiAgentSystem]:
     """
     Get a multi-agent system by ID from memory
@@ -131,7 +199,8 @@ async def update_multi_agent_system(
     description: str = None, 
     agent_names: List[str] = None, 
     triage_agent_name: str = None,
-    connections: List[AgentConnection] = None
+    connections: List[AgentConnection] = None,
+    speculative: Optional[bool] = None
 ) -> Optional[MultiAgentSystem]:
     """
     Update a multi-agent system
@@ -163,8 +232,12 @@ async def update_multi_agent_system(
         for agent_name in agent_names:
             if agent_name not in agents:
                 raise ValueError(f"Agent {agent_name} does not exist")
+        if list(agent_names) != list(db_system.agents or []):
+            # The routing history no longer describes the system
+            speculation.speculator.forget(system_id)
         system.agents = agent_names
         db_system.agents = agent_names
+        await set_system_members(session, system_id, agent_names)
     
     if triage_agent_name is not None:
         # Validate that triage agent exists and is in the agent list
@@ -180,6 +253,10 @@ async def update_multi_agent_system(
         system.connections = connections
         db_system.connections = [conn.dict() for conn in connections]
     
+    if speculative is not None:
+        system.speculative = speculative
+        db_system.speculative = speculative
+    
     # Update timestamp
     db_system.updated_at = datetime.datetime.utcnow()
     
@@ -195,10 +272,14 @@ async def delete_multi_agent_system(session: AsyncSession, system_id: str) -> bo
     # Delete from memory
     if system_id in multi_agent_systems:
         del multi_agent_systems[system_id]
+    speculation.speculator.forget(system_id)
     
     # Delete from database
     db_system = await get_multi_agent_system_from_db(system_id, session)
     if db_system:
+        await session.execute(
+            delete(db.MultiAgentSystemMemberModel).where(db.MultiAgentSystemMemberModel.system_id == system_id)
+        )
         await session.delete(db_system)
         await session.commit()
         return True
@@ -224,6 +305,16 @@ async def initialize_multi_agent_systems(db_session: AsyncSession):
     for system in systems:
         system_dict = db.model_to_dict(system)
         multi_agent_systems[system.id] = system_dict
+    
+    # Fill in membership rows for systems that predate the membership table
+    result = await db_session.execute(select(db.MultiAgentSystemMemberModel.system_id).distinct())
+    with_members = set(result.scalars().all())
+    missing = [system for system in systems if system.id not in with_members and system.agents]
+    for system in missing:
+        await set_system_members(db_session, system.id, system.agents)
+    if missing:
+        await db_session.commit()
+        print(f"Backfilled members of {len(missing)} multi-agent systems")
         
     print(f"Loaded {len(multi_agent_systems)} multi-agent systems from database")
 
@@ -307,7 +398,7 @@ async def get_multi_agent_conversation_history(
     messages = await db_session.execute(
         select(db.MultiAgentMessageModel)
         .where(db.MultiAgentMessageModel.conversation_id == conversation_id)
-        .order_by(db.MultiAgentMessageModel.timestamp)
+        .order_by(db.MultiAgentMessageModel.created_at, db.MultiAgentMessageModel.id)
     )
     messages = messages.scalars().all()
     
@@ -353,7 +444,7 @@ async def get_multi_agent_conversations(
         messages = await db_session.execute(
             select(db.MultiAgentMessageModel)
             .where(db.MultiAgentMessageModel.conversation_id == conversation.id)
-            .order_by(db.MultiAgentMessageModel.timestamp)
+            .order_by(db.MultiAgentMessageModel.created_at, db.MultiAgentMessageModel.id)
             .limit(3)
         )
         messages = messages.scalars().all()
@@ -364,6 +455,35 @@ async def get_multi_agent_conversations(
         
     return result
 
+async def load_agent(agent_name: str, db_session: AsyncSession = None):
+    """
+    Get a member agent from memory, registering it from the database if needed
+    
+    Args:
+        agent_name: Name of the agent
+        db_session: Database session
+        
+    Returns:
+        The agent or None if it does not exist
+    """
+    agent = agent_utils.agents_store.get(agent_name)
+    if not agent and db_session:
+        result = await db_session.execute(select(db.AgentModel).where(db.AgentModel.name == agent_name))
+        agent_model = result.scalars().first()
+        
+        if agent_model:
+            # Agent exists in database but not in memory
+            # Register it; the agent is built on first use
+            agent_utils.register_agent(
+                name=agent_model.name,
+                role=agent_model.role,
+                personality=agent_model.personality,
+                tools=agent_model.tools,
+                response_cache=agent_model.response_cache
+            )
+            agent = agent_utils.agents_store.get(agent_name)
+    return agent
+
 async def interact_with_multi_agent_system(
     system_id: str, 
     user_message: str, 
@@ -402,6 +522,7 @@ async def interact_with_multi_agent_system(
                         agents=system_dict["agents"],
                         triage_agent=system_dict["triage_agent"],
                         connections=[AgentConnection(**conn) for conn in system_dict.get("connections", [])],
+                        speculative=bool(system_dict.get("speculative")),
                         created_at=system_dict["created_at"].isoformat() if isinstance(system_dict["created_at"], datetime.datetime) else system_dict["created_at"]
                     )
                     multi_agent_systems[system_id] = system
@@ -416,12 +537,14 @@ async def interact_with_multi_agent_system(
             available_agents = system.get("agents", [])
             system_connections = system.get("connections", [])
             system_name = system.get("name", "Multi-Agent System")
+            speculative = bool(system.get("speculative"))
         else:
             # It's a MultiAgentSystem object
             triage_agent_name = system.triage_agent
             available_agents = system.agents
             system_connections = system.connections
             system_name = system.name
+            speculative = system.speculative
         
         if not triage_agent_name:
             return {"error": "No triage agent specified for this multi-agent system"}
@@ -430,128 +553,140 @@ async def interact_with_multi_agent_system(
             return {"error": "No agents available in this multi-agent system"}
         
         # Get the triage agent from memory or database
-        triage_agent = agent_utils.agents_store.get(triage_agent_name)
-        if not triage_agent and db_session:
-            # Try to load from database
-            result = await db_session.execute(select(db.AgentModel).where(db.AgentModel.name == triage_agent_name))
-            agent_model = result.scalars().first()
-            
-            if agent_model:
-                # Agent exists in database but not in memory
-                # We need to get the OpenAI client
-                openai_client = agent_utils.get_openai_client()
-                if openai_client:
-                    triage_agent = agent_utils.create_agent(
-                        name=agent_model.name,
-                        role=agent_model.role,
-                        personality=agent_model.personality,
-                        tools=agent_model.tools,
-                        openai_client=openai_client
-                    )
-                    agent_utils.agents_store[triage_agent_name] = triage_agent
+        triage_agent = await load_agent(triage_agent_name, db_session)
         
         if not triage_agent:
             return {"error": f"Triage agent '{triage_agent_name}' not found"}
         
-        # Create a prompt for the triage agent
+        # Describe the member agents by their registered configuration (or database
+        # record), without building them
         agent_descriptions = []
+        agent_roles = {}
         for agent_name in available_agents:
-            agent = agent_utils.agents_store.get(agent_name)
-            if not agent and db_session:
-                # Try to load from database
-                result = await db_session.execute(select(db.AgentModel).where(db.AgentModel.name == agent_name))
-                agent_model = result.scalars().first()
-                
-                if agent_model:
-                    # We'll just use the database model for description
-                    agent_descriptions.append(f"- {agent_name}: {agent_model.role} - {agent_model.personality}")
+            config = agent_utils.get_agent_config(agent_name)
+            if config is not None:
+                role, personality = config.role, config.personality
+            elif db_session:
+                result = await db_session.execute(
+                    select(db.AgentModel.role, db.AgentModel.personality).where(db.AgentModel.name == agent_name)
+                )
+                row = result.first()
+                if row is None:
                     continue
+                role, personality = row.role or "", row.personality or ""
+            else:
+                continue
+            agent_roles[agent_name] = role
+            agent_descriptions.append(f"- {agent_name}: {role} - {personality}")
             
-            if agent:
-                # Access agent properties safely
-                handoff_desc = getattr(agent, 'handoff_description', f"{agent_name} agent")
-                instructions = getattr(agent, 'instructions', "No specific instructions")
-                agent_descriptions.append(f"- {agent_name}: {handoff_desc} - {instructions}")
-            
+        routing = {"path": "llm", "score": None, "margin": None, "duration_ms": None, "speculation": None}
+        
         # Safety guardrails
         if "system" in user_message.lower() and any(term in user_message.lower() for term in ["prompt", "injection", "ignore", "previous"]):
             # This is a potential prompt injection attempt
             selected_agent_name = triage_agent_name
             reasoning = "Detected potential prompt injection attempt. Routing to triage agent for safe handling."
             response_message = "I cannot process that request as it appears to be attempting to manipulate the system. Please provide a legitimate query."
+            routing["path"] = "guardrail"
         else:
-            # Normal processing
-            triage_prompt = f"""
-            You are the triage agent for a multi-agent system. Your job is to analyze the user's message and determine which agent is best suited to respond.
+            # Fast path: route by embedding similarity, ask the triage agent only when unsure
+            decision = None
+            speculative_run = None
+            try:
+                if agent_router.ROUTER_ENABLED:
+                    decision = await agent_router.agent_router.route(
+                        agent_utils.get_openai_client(),
+                        user_message,
+                        {name: agent_router.describe_agent(name, role) for name, role in agent_roles.items()}
+                    )
+                    routing.update(score=decision["score"], margin=decision["margin"], duration_ms=decision["duration_ms"])
             
+                if decision is not None and decision["agent"]:
+                    routing["path"] = "embedding"
+                    selected_agent_name = decision["agent"]
+                    reasoning = f"Closest role description to the message (similarity {decision['score']:.2f}, margin {decision['margin']:.2f})."
+                else:
+                    triage_prompt = f"""
+            You are the triage agent for a multi-agent system. Your job is to analyze the user's message and determine which agent is best suited to respond.
+        
             Available agents:
             {chr(10).join(agent_descriptions)}
-            
+        
             User message: {user_message}
-            
+        
             First, analyze the user's message and determine which agent should respond. Provide your reasoning.
             Then, output the name of the selected agent exactly as it appears in the list above.
-            
+        
             Format your response as:
             Reasoning: <your analysis>
             Selected Agent: <agent_name>
             """
+                
+                    # Start the agent triage usually picks while triage runs
+                    if speculative:
+                        predicted_agent_name = speculation.speculator.predict(system_id, agent_roles)
+                        if predicted_agent_name in agent_utils.agents_store:
+                            speculative_run = speculation.speculator.start(
+                                system_id,
+                                predicted_agent_name,
+                                agent_utils.run_agent(agent_utils.agents_store[predicted_agent_name], user_message)
+                            )
+                
+                    # Get the triage agent's response directly
+                    try:
+                        triage_result = await agent_utils.run_agent(triage_agent, triage_prompt)
+                        triage_response = triage_result.final_output
+                    except llm_scheduler.AdmissionRejected:
+                        raise
+                    except Exception as e:
+                        print(f"Error in triage: {str(e)}")
+                        triage_response = "Reasoning: Could not determine an appropriate agent. Using triage agent as fallback.\nSelected Agent: " + triage_agent_name
+                
+                    # Parse the triage response to get the selected agent
+                    lines = triage_response.strip().split('\n')
+                    reasoning = ""
+                    selected_agent_name = ""
+                
+                    for line in lines:
+                        if line.startswith("Reasoning:"):
+                            reasoning = line[len("Reasoning:"):].strip()
+                        elif line.startswith("Selected Agent:"):
+                            selected_agent_name = line[len("Selected Agent:"):].strip()
             
-            # Get the triage agent's response directly
-            try:
-                triage_result = await agent_utils.Runner.run(triage_agent, triage_prompt)
-                triage_response = triage_result.final_output
-            except Exception as e:
-                print(f"Error in triage: {str(e)}")
-                triage_response = "Reasoning: Could not determine an appropriate agent. Using triage agent as fallback.\nSelected Agent: " + triage_agent_name
-            
-            # Parse the triage response to get the selected agent
-            lines = triage_response.strip().split('\n')
-            reasoning = ""
-            selected_agent_name = ""
-            
-            for line in lines:
-                if line.startswith("Reasoning:"):
-                    reasoning = line[len("Reasoning:"):].strip()
-                elif line.startswith("Selected Agent:"):
-                    selected_agent_name = line[len("Selected Agent:"):].strip()
+                # If no agent was selected, use the triage agent
+                if not selected_agent_name or selected_agent_name not in available_agents:
+                    selected_agent_name = triage_agent_name
+                    if not reasoning:
+                        reasoning = "Could not determine an appropriate agent. Using triage agent as fallback."
             
-            # If no agent was selected, use the triage agent
-            if not selected_agent_name or selected_agent_name not in available_agents:
-                selected_agent_name = triage_agent_name
-                if not reasoning:
-                    reasoning = "Could not determine an appropriate agent. Using triage agent as fallback."
+                if routing["path"] == "llm":
+                    speculation.speculator.record_route(system_id, selected_agent_name)
+                if speculative_run is not None and speculative_run.agent_name != selected_agent_name:
+                    speculative_run.discard()
                     
-            # Get the selected agent
-            selected_agent = agent_utils.agents_store.get(selected_agent_name)
-            if not selected_agent and db_session:
-                # Try to load from database
-                result = await db_session.execute(select(db.AgentModel).where(db.AgentModel.name == selected_agent_name))
-                agent_model = result.scalars().first()
-                
-                if agent_model:
-                    # Agent exists in database but not in memory
-                    # We need to get the OpenAI client
-                    openai_client = agent_utils.get_openai_client()
-                    if openai_client:
-                        selected_agent = agent_utils.create_agent(
-                            name=agent_model.name,
-                            role=agent_model.role,
-                            personality=agent_model.personality,
-                            tools=agent_model.tools,
-                            openai_client=openai_client
-                        )
-                        agent_utils.agents_store[selected_agent_name] = selected_agent
+                # Get the selected agent
+                selected_agent = await load_agent(selected_agent_name, db_session)
             
-            if not selected_agent:
-                return {"error": f"Selected agent '{selected_agent_name}' not found"}
+                if not selected_agent:
+                    return {"error": f"Selected agent '{selected_agent_name}' not found"}
             
-            # Get the response directly from the agent
-            try:
-                result = await agent_utils.Runner.run(selected_agent, user_message)
-                response_message = result.final_output
-            except Exception as e:
-                return {"error": f"Error getting response from agent: {str(e)}"}
+                # Get the response directly from the agent, or from the speculative run if triage agreed
+                try:
+                    if speculative_run is not None and speculative_run.agent_name == selected_agent_name:
+                        result = await speculative_run.take()
+                    else:
+                        result = await agent_utils.run_agent(selected_agent, user_message)
+                    response_message = result.final_output
+                except llm_scheduler.AdmissionRejected:
+                    raise
+                except Exception as e:
+                    return {"error": f"Error getting response from agent: {str(e)}"}
+            finally:
+                # An unused speculative run (other agent, missing agent, error or cancelled
+                # request) must not keep its model call and scheduler slot
+                if speculative_run is not None:
+                    speculative_run.discard()
+                    routing["speculation"] = speculative_run.metadata()
             
         # Get agent role safely for response metadata
         selected_agent_role = ""
@@ -572,11 +707,14 @@ async def interact_with_multi_agent_system(
                         "name": selected_agent_name,
                         "reason": reasoning
                     }
-                }
+                },
+                "routing": routing
             },
             "conversation_id": conversation_id
         }
     
+    except llm_scheduler.AdmissionRejected:
+        raise
     except Exception as e:
         import traceback
         print(f"Error in interact_with_multi_agent_system: {str(e)}")
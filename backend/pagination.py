@@ -0,0 +1,154 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are selected with a range condition on an ordered key such as
+(created_at, id) instead of OFFSET, so every page costs one index range scan
+however long the underlying list grows. Cursors are opaque strings encoding the
+key of the oldest or newest row of a page; "before" pages go back in time and
+"after" pages go forward.
+
+Endpoints that predate paging keep returning the whole list when a request has
+no paging parameters (see is_paged), so existing clients aren't silently cut
+off at DEFAULT_PAGE_SIZE; the default only applies once a client starts paging.
+"""
+
+import os
+import base64
+import bisect
+import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+DEFAULT_PAGE_SIZE = int(os.getenv("PAGE_SIZE_DEFAULT", "100"))
+MAX_PAGE_SIZE = int(os.getenv("PAGE_SIZE_MAX", "500"))
+
+class InvalidCursor(ValueError):
+    """Raised for malformed cursors or conflicting paging arguments"""
+
+def encode_cursor(timestamp: datetime.datetime, row_id: int) -> str:
+    raw = f"{timestamp.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        timestamp, row_id = raw.rsplit("|", 1)
+        return datetime.datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+
+def is_paged(limit: Optional[int], before: Optional[str], after: Optional[str]) -> bool:
+    """Whether a request asked for a page; legacy requests without paging parameters get the whole list"""
+    return limit is not None or bool(before) or bool(after)
+
+def clamp_limit(limit: Optional[int]) -> int:
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+async def fetch_page(
+    session: AsyncSession,
+    query,
+    timestamp_column,
+    id_column,
+    limit: Optional[int] = None,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    newest_first: bool = False
+) -> Dict[str, Any]:
+    """
+    Fetch one page of ORM rows ordered by (timestamp_column, id_column).
+
+    Without a cursor the newest rows are returned. The query must select a single
+    entity and must not have an ORDER BY or LIMIT of its own.
+
+    Args:
+        session: Database session
+        query: Filtered select() of the rows to page through
+        timestamp_column: Timestamp column of the key, e.g. MessageModel.created_at
+        id_column: Primary key column breaking timestamp ties
+        limit: Page size (clamped to MAX_PAGE_SIZE)
+        before: Cursor; return the rows older than it
+        after: Cursor; return the rows newer than it
+        newest_first: Order the page newest to oldest instead of oldest to newest
+
+    Returns:
+        Dict with the page "items", "before_cursor"/"after_cursor" (keys of the
+        oldest/newest item) and "has_more_before"/"has_more_after"
+    """
+    if before and after:
+        raise InvalidCursor("Pass either 'before' or 'after', not both")
+    limit = clamp_limit(limit)
+
+    if after:
+        timestamp, row_id = decode_cursor(after)
+        query = query.where(or_(
+            timestamp_column > timestamp,
+            and_(timestamp_column == timestamp, id_column > row_id)
+        ))
+        result = await session.execute(query.order_by(timestamp_column.asc(), id_column.asc()).limit(limit + 1))
+        rows = list(result.scalars().all())
+        has_more_after = len(rows) > limit
+        rows = rows[:limit]
+        has_more_before = True
+    else:
+        if before:
+            timestamp, row_id = decode_cursor(before)
+            query = query.where(or_(
+                timestamp_column < timestamp,
+                and_(timestamp_column == timestamp, id_column < row_id)
+            ))
+        result = await session.execute(query.order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1))
+        rows = list(result.scalars().all())
+        has_more_before = len(rows) > limit
+        rows = rows[:limit]
+        rows.reverse()
+        has_more_after = before is not None
+
+    return _page(rows, timestamp_column.key, id_column.key, before, after, has_more_before, has_more_after, newest_first)
+
+def page_list(
+    rows: List[Any],
+    timestamp_key: str,
+    id_key: str,
+    limit: Optional[int] = None,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    newest_first: bool = False
+) -> Dict[str, Any]:
+    """
+    Same as fetch_page, for rows already loaded and sorted oldest to newest
+    by (timestamp_key, id_key) attributes.
+    """
+    if before and after:
+        raise InvalidCursor("Pass either 'before' or 'after', not both")
+    limit = clamp_limit(limit)
+    keys = [(getattr(row, timestamp_key), getattr(row, id_key)) for row in rows]
+
+    if after:
+        start = bisect.bisect_right(keys, decode_cursor(after))
+        page = rows[start:start + limit]
+        has_more_before = True
+        has_more_after = start + limit < len(rows)
+    else:
+        end = bisect.bisect_left(keys, decode_cursor(before)) if before else len(rows)
+        page = rows[max(0, end - limit):end]
+        has_more_before = end > limit
+        has_more_after = before is not None
+
+    return _page(page, timestamp_key, id_key, before, after, has_more_before, has_more_after, newest_first)
+
+def _page(rows, timestamp_key, id_key, before, after, has_more_before, has_more_after, newest_first) -> Dict[str, Any]:
+    # rows run oldest to newest here
+    def cursor_of(row) -> str:
+        return encode_cursor(getattr(row, timestamp_key), getattr(row, id_key))
+
+    return {
+        "items": rows[::-1] if newest_first else rows,
+        "before_cursor": cursor_of(rows[0]) if rows else before,
+        "after_cursor": cursor_of(rows[-1]) if rows else after,
+        "has_more_before": has_more_before,
+        "has_more_after": has_more_after
+    }
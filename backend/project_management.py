@@ -3,9 +3,12 @@ import json
 from datetime import datetime
 from typing import List, Dict, Optional, Any, Union
 from sqlalchemy import select, func, text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from database import ProjectModel, DepartmentModel, AgentModel, ProjectSolutionModel, CompanyModel, ConversationModel, MessageModel
+from read_model_cache import read_models, ROADMAP, DEPARTMENTS
+import agent_utils
 
 # Predefined departments for the Gargash AI Builder
 DEFAULT_DEPARTMENTS = [
@@ -20,46 +23,68 @@ DEFAULT_DEPARTMENTS = [
 # Predefined goals
 GOALS = ["Productivity", "Cost Savings", "Win new Customers", "Learning and Governance"]
 
+def invalidate_roadmap():
+    """Drop the cached roadmap; call after committing project, solution or agent changes."""
+    read_models.invalidate(ROADMAP)
+
+def invalidate_departments():
+    """Drop the cached department list; call after committing department or project changes."""
+    read_models.invalidate(DEPARTMENTS)
+
 async def ensure_default_departments(db: AsyncSession):
     """Ensure that the default departments exist in the database."""
-    for dept in DEFAULT_DEPARTMENTS:
-        # Check if department already exists
-        result = await db.execute(
-            select(DepartmentModel).where(DepartmentModel.name == dept["name"])
+    # Check which departments already exist
+    result = await db.execute(
+        select(DepartmentModel.name).where(DepartmentModel.name.in_([dept["name"] for dept in DEFAULT_DEPARTMENTS]))
+    )
+    existing_names = set(result.scalars().all())
+    
+    missing = [dept for dept in DEFAULT_DEPARTMENTS if dept["name"] not in existing_names]
+    if not missing:
+        return
+    
+    for dept in missing:
+        # Create new department
+        new_dept = DepartmentModel(
+            name=dept["name"],
+            description=dept["description"]
         )
-        existing_dept = result.scalars().first()
-        
-        if not existing_dept:
-            # Create new department
-            new_dept = DepartmentModel(
-                name=dept["name"],
-                description=dept["description"]
-            )
-            db.add(new_dept)
+        db.add(new_dept)
     
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Another worker process created them at the same time
+        await db.rollback()
+    invalidate_roadmap()
+    invalidate_departments()
 
 async def get_all_departments(db: AsyncSession) -> List[Dict[str, Any]]:
-    """Get all departments with project counts."""
+    """Get all departments with project counts.
+    
+    Served from the read model cache; writes call invalidate_departments().
+    The returned list is shared and must not be modified.
+    """
+    return await read_models.get(DEPARTMENTS, lambda: build_departments(db))
+
+async def build_departments(db: AsyncSession) -> List[Dict[str, Any]]:
+    """Build the department list with one grouped count query."""
     # First ensure defaults exist
     await ensure_default_departments(db)
     
-    # Query departments
+    project_counts = (
+        select(ProjectModel.department_id, func.count(ProjectModel.id).label("project_count"))
+        .group_by(ProjectModel.department_id)
+        .subquery()
+    )
     result = await db.execute(
-        select(DepartmentModel)
+        select(DepartmentModel, func.coalesce(project_counts.c.project_count, 0))
+        .outerjoin(project_counts, project_counts.c.department_id == DepartmentModel.id)
+        .order_by(DepartmentModel.id)
     )
-    departments = result.scalars().all()
-    
-    # Get project counts for each department
-    dept_list = []
-    for dept in departments:
-        # Count projects in this department
-        project_count = await db.execute(
-            select(func.count(ProjectModel.id)).where(ProjectModel.department_id == dept.id)
-        )
-        count = project_count.scalar()
-        
-        dept_dict = {
+    
+    return [
+        {
             "id": dept.id,
             "name": dept.name,
             "description": dept.description,
@@ -67,9 +92,8 @@ async def get_all_departments(db: AsyncSession) -> List[Dict[str, Any]]:
             "created_at": dept.created_at.isoformat() if dept.created_at else None,
             "updated_at": dept.updated_at.isoformat() if dept.updated_at else None
         }
-        dept_list.append(dept_dict)
-    
-    return dept_list
+        for dept, count in result.all()
+    ]
 
 async def get_department_by_name(db: AsyncSession, name: str) -> Optional[Dict[str, Any]]:
     """Get a department by name."""
@@ -157,6 +181,8 @@ async def create_project(
     
     await db.commit()
     await db.refresh(new_project)
+    invalidate_roadmap()
+    invalidate_departments()
     
     # Get company name if company_id is provided
     company_name = None
@@ -334,6 +360,9 @@ async def update_project(
     
     await db.commit()
     await db.refresh(project)
+    invalidate_roadmap()
+    invalidate_departments()
+    agent_utils.invalidate_project_company(project_id)
     
     # Return updated project
     return await get_project_by_id(db, project_id)
@@ -377,6 +406,9 @@ async def delete_project(db: AsyncSession, project_id: int) -> bool:
         # Now delete the project itself
         await db.delete(project)
         await db.commit()
+        invalidate_roadmap()
+        invalidate_departments()
+        agent_utils.invalidate_project_company(project_id)
         
         return True
     except Exception as e:
@@ -386,27 +418,65 @@ async def delete_project(db: AsyncSession, project_id: int) -> bool:
         raise
 
 async def get_roadmap(db: AsyncSession) -> Dict[str, Any]:
-    """Get the roadmap view with all departments and their projects."""
+    """Get the roadmap view with all departments and their projects.
+    
+    Served from the read model cache; writes call invalidate_roadmap().
+    The returned dictionary is shared and must not be modified.
+    """
+    return await read_models.get(ROADMAP, lambda: build_roadmap(db))
+
+async def build_roadmap(db: AsyncSession) -> Dict[str, Any]:
+    """Build the roadmap from a single departments/projects/solutions join."""
     # Ensure default departments exist
     await ensure_default_departments(db)
     
-    # Get all departments
-    dept_result = await db.execute(select(DepartmentModel))
-    departments = dept_result.scalars().all()
+    result = await db.execute(
+        select(DepartmentModel, ProjectModel, AgentModel)
+        .outerjoin(ProjectModel, ProjectModel.department_id == DepartmentModel.id)
+        .outerjoin(ProjectSolutionModel, ProjectSolutionModel.project_id == ProjectModel.id)
+        .outerjoin(AgentModel, AgentModel.id == ProjectSolutionModel.agent_id)
+        .order_by(DepartmentModel.id, ProjectModel.id, AgentModel.id)
+    )
     
     roadmap = {}
-    for dept in departments:
-        # Get projects for this department
-        projects = await get_projects_by_department(db, dept.name)
+    projects_by_id = {}
+    for dept, project, solution in result.all():
+        if dept.name not in roadmap:
+            roadmap[dept.name] = {
+                "id": dept.id,
+                "name": dept.name,
+                "description": dept.description,
+                "project_count": 0,
+                "projects": []
+            }
         
-        # Add to roadmap
-        roadmap[dept.name] = {
-            "id": dept.id,
-            "name": dept.name,
-            "description": dept.description,
-            "project_count": len(projects),
-            "projects": projects
-        }
+        if project is None:
+            continue
+        
+        project_dict = projects_by_id.get(project.id)
+        if project_dict is None:
+            project_dict = {
+                "id": project.id,
+                "title": project.title,
+                "description": project.description,
+                "department": dept.name,
+                "goal": project.goal,
+                "expected_value": project.expected_value,
+                "status": project.status,
+                "solutions": [],
+                "created_at": project.created_at.isoformat() if project.created_at else None,
+                "updated_at": project.updated_at.isoformat() if project.updated_at else None
+            }
+            projects_by_id[project.id] = project_dict
+            roadmap[dept.name]["projects"].append(project_dict)
+            roadmap[dept.name]["project_count"] += 1
+        
+        if solution is not None:
+            project_dict["solutions"].append({
+                "id": solution.id,
+                "name": solution.name,
+                "role": solution.role
+            })
     
     return roadmap
 
@@ -0,0 +1,233 @@
+"""
+Per-request and per-route database profiling.
+
+Engine events time every statement and attribute it to the request that issued it
+through a context variable, so the API can report how much of a request was spent
+in the database (X-DB-Time-Ms, X-DB-Queries and X-DB-Slowest-Ms response headers).
+Finished requests are aggregated per route: request and statement counts, database
+time and query count histograms, and the slowest statements (GET /debug/queries).
+
+Statements slower than DB_SLOW_QUERY_MS are printed, which replaces echoing every
+statement (DB_ECHO) for finding slow queries in production.
+
+For tests, count_queries() and assert_max_queries() count the statements issued
+while a block runs, e.g. to keep an endpoint free of N+1 queries:
+
+    with query_profiler.assert_max_queries(2):
+        client.get("/sectors")
+"""
+
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "500"))  # 0 disables the slow statement log
+
+# Slowest statements kept per request and per route
+SLOWEST_STATEMENTS = 5
+
+# Histogram bucket upper bounds; the last bucket counts everything above
+DB_TIME_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+def _short_statement(statement: str, limit: int = 500) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + "…"
+
+def _keep_slowest(slowest: List[Tuple[float, str]], duration: float, statement: str):
+    """Keep the SLOWEST_STATEMENTS slowest (duration, statement) pairs, slowest first"""
+    if len(slowest) == SLOWEST_STATEMENTS and duration <= slowest[-1][0]:
+        return
+    for index, (other_duration, other_statement) in enumerate(slowest):
+        if other_statement == statement:
+            if duration <= other_duration:
+                return
+            del slowest[index]
+            break
+    slowest.append((duration, statement))
+    slowest.sort(key=lambda item: item[0], reverse=True)
+    del slowest[SLOWEST_STATEMENTS:]
+
+class RequestDBStats:
+    """Database time, statement count and slowest statements of one request"""
+
+    __slots__ = ("queries", "db_time", "slowest")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest: List[Tuple[float, str]] = []
+
+    def add(self, duration: float, statement: str):
+        self.queries += 1
+        self.db_time += duration
+        _keep_slowest(self.slowest, duration, statement)
+
+class RouteStats:
+    """Aggregated database statistics of one route"""
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.db_time = 0.0
+        self.max_db_time = 0.0
+        self.db_time_histogram = [0] * (len(DB_TIME_BUCKETS_MS) + 1)
+        self.query_count_histogram = [0] * (len(QUERY_COUNT_BUCKETS) + 1)
+        self.slowest: List[Tuple[float, str]] = []
+
+    def add(self, stats: RequestDBStats):
+        self.requests += 1
+        self.queries += stats.queries
+        self.max_queries = max(self.max_queries, stats.queries)
+        self.db_time += stats.db_time
+        self.max_db_time = max(self.max_db_time, stats.db_time)
+        self.db_time_histogram[bisect.bisect_left(DB_TIME_BUCKETS_MS, stats.db_time * 1000)] += 1
+        self.query_count_histogram[bisect.bisect_left(QUERY_COUNT_BUCKETS, stats.queries)] += 1
+        for duration, statement in stats.slowest:
+            _keep_slowest(self.slowest, duration, _short_statement(statement))
+
+    def to_dict(self) -> Dict[str, Any]:
+        def histogram(bounds, counts, unit=""):
+            labels = [f"<={bound}{unit}" for bound in bounds] + [f">{bounds[-1]}{unit}"]
+            return dict(zip(labels, counts))
+
+        return {
+            "requests": self.requests,
+            "queries": self.queries,
+            "avg_queries": round(self.queries / self.requests, 2) if self.requests else 0,
+            "max_queries": self.max_queries,
+            "db_time_ms": round(self.db_time * 1000, 2),
+            "avg_db_time_ms": round(self.db_time * 1000 / self.requests, 2) if self.requests else 0,
+            "max_db_time_ms": round(self.max_db_time * 1000, 2),
+            "db_time_histogram": histogram(DB_TIME_BUCKETS_MS, self.db_time_histogram, "ms"),
+            "query_count_histogram": histogram(QUERY_COUNT_BUCKETS, self.query_count_histogram),
+            "slowest_statements": [
+                {"duration_ms": round(duration * 1000, 2), "statement": statement}
+                for duration, statement in self.slowest
+            ]
+        }
+
+class QueryProfiler:
+    """Per-route aggregation of request database statistics"""
+
+    def __init__(self):
+        self._routes: Dict[str, RouteStats] = {}
+        self.started_at = time.time()
+
+    def record(self, route: str, stats: RequestDBStats):
+        route_stats = self._routes.get(route)
+        if route_stats is None:
+            route_stats = self._routes[route] = RouteStats()
+        route_stats.add(stats)
+
+    def reset(self):
+        self._routes.clear()
+        self.started_at = time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Route statistics, the routes with the most database time first"""
+        routes = sorted(self._routes.items(), key=lambda item: item[1].db_time, reverse=True)
+        return {
+            "since": self.started_at,
+            "slow_query_ms": DB_SLOW_QUERY_MS,
+            "routes": {route: route_stats.to_dict() for route, route_stats in routes}
+        }
+
+# Shared profiler
+profiler = QueryProfiler()
+
+_current_stats: ContextVar[Optional[RequestDBStats]] = ContextVar("request_db_stats", default=None)
+
+def start_request() -> RequestDBStats:
+    """Start collecting database statistics for the current request"""
+    stats = RequestDBStats()
+    _current_stats.set(stats)
+    return stats
+
+def current_stats() -> Optional[RequestDBStats]:
+    return _current_stats.get()
+
+def finish_request(route: str, stats: RequestDBStats):
+    """Add a finished request's statistics to its route"""
+    profiler.record(route, stats)
+
+class QueryCounter:
+    """Statements issued while a count_queries() block runs"""
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def queries(self) -> int:
+        return len(self.statements)
+
+_counters: List[QueryCounter] = []
+_counters_lock = threading.Lock()
+
+@contextmanager
+def count_queries():
+    """
+    Count the statements issued by any task or thread while the block runs.
+
+    Unlike the per-request statistics this doesn't rely on the request context,
+    so it also sees requests made through a test client running the app in
+    another thread. Run nothing else against the database meanwhile.
+    """
+    counter = QueryCounter()
+    with _counters_lock:
+        _counters.append(counter)
+    try:
+        yield counter
+    finally:
+        with _counters_lock:
+            _counters.remove(counter)
+
+@contextmanager
+def assert_max_queries(max_queries: int):
+    """Fail with the issued statements if the block issues more than max_queries of them"""
+    with count_queries() as counter:
+        yield counter
+    if counter.queries > max_queries:
+        statements = "\n".join(f"  {index + 1}. {_short_statement(statement, 200)}" for index, statement in enumerate(counter.statements))
+        raise AssertionError(f"Expected at most {max_queries} queries, got {counter.queries}:\n{statements}")
+
+# Start times live on the execution context, since a failed statement never reaches
+# after_cursor_execute; statements without a context share one overwritten slot per connection
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start_time = time.perf_counter()
+    else:
+        conn.info["query_start_time"] = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        started = getattr(context, "_query_start_time", None)
+    else:
+        started = conn.info.pop("query_start_time", None)
+    if started is None:
+        return
+    duration = time.perf_counter() - started
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.add(duration, statement)
+    if _counters:
+        with _counters_lock:
+            for counter in _counters:
+                counter.statements.append(statement)
+    if DB_SLOW_QUERY_MS and duration * 1000 >= DB_SLOW_QUERY_MS:
+        print(f"Slow query ({duration * 1000:.1f} ms): {_short_statement(statement)}")
+
+def install(engine):
+    """Attach the timing events to an (async) engine"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,99 @@
+"""
+In-process cache of read models.
+
+Dashboards such as the roadmap and the department, sector and agent lists are expensive to assemble but change only when
+someone writes to the underlying tables. A read model is built once, kept until a
+write path invalidates it (or its TTL expires as a safety net) and then rebuilt on
+the next read. Concurrent misses share a single build.
+
+Every invalidation bumps the model's generation; a build that started before an
+invalidation is returned to its callers but not stored, so a slow build cannot
+put stale data back into the cache.
+"""
+
+import os
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+ROADMAP = "roadmap"
+DEPARTMENTS = "departments"
+SECTORS = "sectors"
+AGENT_LIST = "agent_list"
+
+class ReadModelCache:
+    """
+    Named read models, cached until invalidated.
+
+    Args:
+        ttl_seconds: Maximum age of a cached model (0 disables the TTL)
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0):
+        self.ttl_seconds = ttl_seconds
+        self._models: Dict[str, Tuple[float, Any]] = {}
+        self._generations: Dict[str, int] = {}
+        self._builds: Dict[str, Tuple[int, asyncio.Future]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get(self, name: str, builder: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Get a read model, building it with `builder` if it is not cached.
+
+        The returned object is shared between callers and must not be modified.
+        """
+        cached = self._models.get(name)
+        if cached is not None:
+            built_at, model = cached
+            if not self.ttl_seconds or time.monotonic() - built_at < self.ttl_seconds:
+                self.hits += 1
+                return model
+            del self._models[name]
+
+        generation = self._generations.get(name, 0)
+        build = self._builds.get(name)
+        if build is not None and build[0] == generation and not build[1].done():
+            # Someone is already building the current generation
+            self.hits += 1
+            return await asyncio.shield(build[1])
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._builds[name] = (generation, future)
+        try:
+            model = await builder()
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e)
+                # Waiters re-raise it; don't warn about a never-retrieved exception
+                future.exception()
+            raise
+        finally:
+            if self._builds.get(name, (None, None))[1] is future:
+                del self._builds[name]
+
+        if self._generations.get(name, 0) == generation:
+            self._models[name] = (time.monotonic(), model)
+        future.set_result(model)
+        return model
+
+    def invalidate(self, *names: str):
+        """Drop read models after a write; builds in progress are not stored"""
+        for name in names:
+            self._models.pop(name, None)
+            self._generations[name] = self._generations.get(name, 0) + 1
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "models": sorted(self._models),
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations
+        }
+
+# Shared read model cache
+read_models = ReadModelCache(ttl_seconds=float(os.getenv("READ_MODEL_TTL_SECONDS", "300")))
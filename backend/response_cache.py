@@ -0,0 +1,222 @@
+"""
+Response cache for agent interactions.
+
+Responses are keyed on the agent's configuration hash, the normalized user message
+and a hash of the context window (history) the model would see, so a cached answer
+is only reused when the model input would have been the same. Agents opt in
+individually with one of two modes:
+
+    exact    - the normalized message must match exactly
+    semantic - additionally reuse the answer to a near-duplicate message, found by
+               embedding similarity, when the context window is identical
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+CACHE_MODES = ("exact", "semantic")
+
+def normalize_message(message: str) -> str:
+    """Lowercase, trim and collapse whitespace so trivially different messages share a key"""
+    return re.sub(r"\s+", " ", message or "").strip().lower()
+
+def context_hash(context: Any) -> str:
+    """Hash of the context window (history items) that precedes the message"""
+    payload = json.dumps(context or [], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    In-process TTL + LRU cache of agent responses with an optional embedding index.
+
+    Args:
+        max_size: Maximum number of cached responses
+        ttl_seconds: Time a cached response stays valid
+        similarity_threshold: Minimum cosine similarity for a near-duplicate hit
+    """
+
+    def __init__(self, max_size: int = 5000, ttl_seconds: float = 3600.0, similarity_threshold: float = 0.95):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        # key -> (response, expiry, index group of its embedding or None)
+        self._entries: "OrderedDict[str, Tuple[str, float, Optional[Tuple[str, str]]]]" = OrderedDict()
+        # (config hash, context hash) -> entry key -> normalized embedding; every vector
+        # belongs to a live entry, so the index never holds more than max_size vectors
+        self._vectors: Dict[Tuple[str, str], Dict[str, np.ndarray]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(config_hash: str, message: str, context_key: str) -> str:
+        payload = "\x00".join([config_hash, normalize_message(message), context_key])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _remove(self, key: str):
+        """Drop an entry and its embedding (caller holds the lock)"""
+        _, _, group = self._entries.pop(key)
+        if group is not None:
+            vectors = self._vectors.get(group)
+            if vectors is not None:
+                vectors.pop(key, None)
+                if not vectors:
+                    del self._vectors[group]
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached response by exact key"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            response, expires_at, _ = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return response
+
+    def get_similar(self, config_hash: str, context_key: str, embedding: List[float]) -> Optional[str]:
+        """Get the cached response of the most similar message with the same config and context"""
+        with self._lock:
+            candidates = self._vectors.get((config_hash, context_key))
+            if not candidates:
+                return None
+            now = time.monotonic()
+            for key in [key for key in candidates if self._entries[key][1] < now]:
+                self._remove(key)
+            candidates = self._vectors.get((config_hash, context_key))
+            if not candidates:
+                return None
+            keys = list(candidates)
+            query = _unit(embedding)
+            scores = np.stack([candidates[key] for key in keys]) @ query
+            best = int(np.argmax(scores))
+            best_key = keys[best]
+            if scores[best] < self.similarity_threshold:
+                return None
+        return self.get(best_key)
+
+    def put(self, key: str, response: str, config_hash: Optional[str] = None, context_key: Optional[str] = None, embedding: Optional[List[float]] = None):
+        """Cache a response, optionally indexing its message embedding"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            group = (config_hash, context_key) if embedding is not None else None
+            self._entries[key] = (response, time.monotonic() + self.ttl_seconds, group)
+            if group is not None:
+                self._vectors.setdefault(group, {})[key] = _unit(embedding)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def record(self, hit: bool, semantic: bool = False):
+        with self._lock:
+            if not hit:
+                self.misses += 1
+            elif semantic:
+                self.semantic_hits += 1
+            else:
+                self.hits += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._vectors.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get size and hit/miss statistics"""
+        lookups = self.hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "indexed_vectors": sum(len(vectors) for vectors in self._vectors.values()),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "similarity_threshold": self.similarity_threshold,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0
+        }
+
+def _unit(embedding: List[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+# Shared cache instance
+response_cache = ResponseCache(
+    max_size=int(os.getenv("RESPONSE_CACHE_SIZE", "5000")),
+    ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600")),
+    similarity_threshold=float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95"))
+)
+
+EMBEDDING_MODEL = os.getenv("RESPONSE_CACHE_EMBEDDING_MODEL", "text-embedding-3-small")
+
+async def embed(client, text: str) -> Optional[List[float]]:
+    """Embed a normalized message, returning None if the embedding call fails"""
+    try:
+        response = await client.embeddings.create(model=EMBEDDING_MODEL, input=normalize_message(text))
+        return response.data[0].embedding
+    except Exception as e:
+        print(f"Error embedding message for response cache: {str(e)}")
+        return None
+
+async def lookup_response(config, message: str, agent_input: Any, client=None) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """
+    Look up a cached response for a turn.
+
+    Args:
+        config: AgentConfig of the agent
+        message: The new user message
+        agent_input: Model input built for the turn (plain message or list of items)
+        client: OpenAI client used for embeddings in semantic mode
+
+    Returns:
+        The cached response (or None) and a lookup slot to pass to store_response on a
+        miss; the slot is None when the agent has not opted in
+    """
+    if config is None or config.response_cache not in CACHE_MODES:
+        return None, None
+
+    # Everything before the new message is the context window the model sees
+    context = agent_input[:-1] if isinstance(agent_input, list) else []
+    slot = {
+        "config_hash": config.config_hash(),
+        "context_key": context_hash(context),
+        "embedding": None
+    }
+    slot["key"] = ResponseCache.make_key(slot["config_hash"], message, slot["context_key"])
+
+    cached = response_cache.get(slot["key"])
+    if cached is not None:
+        response_cache.record(hit=True)
+        return cached, None
+
+    if config.response_cache == "semantic" and client is not None:
+        slot["embedding"] = await embed(client, message)
+        if slot["embedding"] is not None:
+            cached = response_cache.get_similar(slot["config_hash"], slot["context_key"], slot["embedding"])
+            if cached is not None:
+                response_cache.record(hit=True, semantic=True)
+                return cached, None
+
+    response_cache.record(hit=False)
+    return None, slot
+
+def store_response(slot: Optional[Dict[str, Any]], response: Any):
+    """Cache a freshly generated response for a slot returned by lookup_response"""
+    if slot is None or not isinstance(response, str) or not response:
+        return
+    response_cache.put(slot["key"], response, slot["config_hash"], slot["context_key"], slot["embedding"])
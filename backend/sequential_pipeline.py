@@ -0,0 +1,187 @@
+"""
+Sequential project workflows: a project's agents run one after the other, each
+receiving the previous agent's output, and the last agent answers the user.
+
+The pipeline hands each output to the next agent as soon as it is complete,
+without a database round trip in between: all agents are built before the first
+one runs, and the user message, intermediate outputs and final answer are saved
+in a single transaction once the pipeline has finished (save_pipeline_turn).
+The last agent's response is streamed token by token, so the caller sees the
+answer as it is generated. A model call can't take more input once started, so
+an agent starts when its upstream agent's output is complete.
+
+Given a workflow run, each step's output is checkpointed, and resuming a failed
+run reuses the checkpoints of the steps before the failure (see workflow_runs.py).
+
+run_pipeline yields events:
+
+    {"type": "hop", ...}    an intermediate agent finished (agent, position, timing)
+    {"type": "token", ...}  a chunk of the last agent's response
+    {"type": "done", ...}   the response and the timing of every hop
+    {"type": "error", ...}  an agent failed; the response describes the error
+"""
+
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import agent_utils
+import llm_scheduler
+import database as db
+import workflow_runs
+
+def _hop(agent_name: str, position: int, pipeline_started: float, hop_started: float, output: str) -> Dict[str, Any]:
+    now = time.perf_counter()
+    return {
+        "agent": agent_name,
+        "position": position,
+        "started_ms": round((hop_started - pipeline_started) * 1000, 2),
+        "duration_ms": round((now - hop_started) * 1000, 2),
+        "output_chars": len(output)
+    }
+
+async def run_pipeline(agent_names: List[str], message: str, run: Optional[workflow_runs.WorkflowRun] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run agents in sequence, streaming the last agent's response.
+
+    Args:
+        agent_names: The agents, in order
+        message: The user message given to the first agent
+        run: Workflow run to checkpoint each step's output to; steps it already
+            has a checkpoint for (with the same input) reuse the output
+
+    Yields:
+        hop, token, done and error events (see module docstring); done and error
+        events carry the `hops` timing and the `intermediate` outputs to save,
+        which leave out checkpointed outputs an earlier attempt already saved
+    """
+    pipeline_started = time.perf_counter()
+    hops: List[Dict[str, Any]] = []
+    intermediate: List[Dict[str, Any]] = []
+
+    async def failed(position: int, agent_name: str, error: str, response: str) -> Dict[str, Any]:
+        if run is not None:
+            await run.finish("failed", failed_step=position, error=response)
+        return {
+            "type": "error",
+            "agent": agent_name,
+            "position": position,
+            "error": error,
+            "response": response,
+            "hops": hops,
+            "intermediate": intermediate,
+            "run_id": run.id if run is not None else None
+        }
+
+    # Build every agent before the first call so no hop waits for construction
+    for agent_name in agent_names:
+        agent_utils.agents_store.get(agent_name)
+
+    current_message = message
+    for position, agent_name in enumerate(agent_names):
+        last = position == len(agent_names) - 1
+        hop_started = time.perf_counter()
+        input_hash = workflow_runs.step_input_hash(agent_name, current_message) if run is not None else None
+        output = run.cached_output(position, input_hash) if run is not None else None
+        cached = output is not None
+
+        if cached:
+            if last:
+                yield {"type": "token", "delta": output}
+        elif not last:
+            try:
+                output = await agent_utils.interact_with_agent_raw(agent_name=agent_name, message=current_message)
+            except llm_scheduler.AdmissionRejected as e:
+                await failed(position, agent_name, "overloaded", str(e))
+                raise
+            except Exception as e:
+                print(f"Error with agent {agent_name} in sequence: {str(e)}")
+                yield await failed(position, agent_name, str(e), f"Error processing with agent {agent_name}: {str(e)}")
+                return
+        else:
+            # The last agent streams its answer
+            first_token_ms = None
+            async for event in agent_utils.stream_interact_with_agent(agent_name=agent_name, message=current_message):
+                if event["type"] == "token":
+                    if first_token_ms is None:
+                        first_token_ms = round((time.perf_counter() - hop_started) * 1000, 2)
+                    yield event
+                elif event["type"] == "error":
+                    yield await failed(position, agent_name, event.get("error"), f"Error processing with agent {agent_name}: {event.get('response')}")
+                    return
+                else:
+                    output = event["response"]
+
+        hop = _hop(agent_name, position, pipeline_started, hop_started, output)
+        if cached:
+            hop["cached"] = True
+        elif run is not None:
+            run.checkpoint(position, agent_name, input_hash, output, hop["duration_ms"])
+        # A checkpointed output is already in the conversation if an earlier attempt saved its turn
+        if not cached or not run.message_saved:
+            intermediate.append({"agent": agent_name, "position": position, "content": output})
+        if last and not cached:
+            hop["first_token_ms"] = first_token_ms
+        hops.append(hop)
+        if not last:
+            yield {"type": "hop", **hop}
+        current_message = output
+
+    if run is not None:
+        # The run is marked completed when the turn is saved, so a failed save leaves it resumable
+        await run.flush()
+    yield {
+        "type": "done",
+        "response": current_message,
+        "hops": hops,
+        "intermediate": intermediate,
+        "run_id": run.id if run is not None else None,
+        "duration_ms": round((time.perf_counter() - pipeline_started) * 1000, 2)
+    }
+
+async def save_pipeline_turn(
+    session: AsyncSession,
+    conversation_id: int,
+    message: Optional[str],
+    intermediate: List[Dict[str, Any]],
+    response: Optional[str] = None,
+    error: Optional[str] = None,
+    run_id: Optional[int] = None
+):
+    """
+    Save a pipeline turn in one transaction: the user message, every agent's output
+    as an intermediate message, and the final response (or the error as a system message).
+    A resumed run passes no message if an earlier attempt already saved it; the
+    workflow run (run_id) records in the same transaction that the message is saved
+    and, when there is a response, that it completed, dropping its checkpoints.
+    """
+    messages = []
+    if message is not None:
+        messages.append(db.MessageModel(conversation_id=conversation_id, role="user", content=message))
+    for output in intermediate:
+        messages.append(db.MessageModel(
+            conversation_id=conversation_id,
+            role="intermediate",  # Mark all intermediate messages consistently
+            content=output["content"],
+            message_metadata={"agent_name": output["agent"], "sequence_position": output["position"]}
+        ))
+    if error is not None:
+        messages.append(db.MessageModel(conversation_id=conversation_id, role="system", content=error))
+    elif response is not None:
+        messages.append(db.MessageModel(conversation_id=conversation_id, role="assistant", content=response))
+    session.add_all(messages)
+    if run_id is not None:
+        values = {"conversation_id": conversation_id, "message_saved": True}
+        completed = error is None and response is not None
+        if completed:
+            values.update(status="completed", failed_step=None, error=None)
+        await session.execute(
+            update(db.WorkflowRunModel)
+            .where(db.WorkflowRunModel.id == run_id)
+            .values(**values)
+        )
+        if completed:
+            await session.execute(delete(db.WorkflowStepModel).where(db.WorkflowStepModel.run_id == run_id))
+    await session.commit()
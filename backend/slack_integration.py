@@ -14,9 +14,6 @@ import time
 import json
 import re
 from datetime import datetime
-import subprocess
-import sys
-import sqlite3
 
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
@@ -25,7 +22,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import update, delete
 
-import db_models
+import database as db
 # Change direct import to module import to avoid circular imports
 import agent_utils
 from agents import Agent
@@ -396,81 +393,6 @@ class SlackBot:
             logger.error(f"Error sending typing indicator: {e}")
 
 
-def ensure_slack_table_exists():
-    """
-    Ensure the slack_bots table exists in the database.
-    
-    Returns:
-        bool: True if table exists or was created, False otherwise
-    """
-    try:
-        # First try using our dedicated script
-        script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ensure_slack_table.py")
-        
-        if os.path.exists(script_path):
-            logger.info(f"Running ensure_slack_table.py script at {script_path}")
-            subprocess.run([sys.executable, script_path], check=False)
-            return True
-        
-        # Fall back to direct SQLite approach if script not found
-        db_paths = ["./app.db", "../app.db", "./data/agents.db", "../data/agents.db"]
-        
-        for db_path in db_paths:
-            if os.path.exists(db_path):
-                conn = sqlite3.connect(db_path)
-                cursor = conn.cursor()
-                
-                # Check if table exists
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='slack_bots';")
-                if not cursor.fetchone():
-                    # Create table
-                    logger.info(f"Creating slack_bots table in {db_path}")
-                    cursor.execute("""
-                    CREATE TABLE slack_bots (
-                        id INTEGER PRIMARY KEY,
-                        agent_name TEXT UNIQUE,
-                        bot_token TEXT NOT NULL,
-                        app_token TEXT NOT NULL,
-                        status TEXT DEFAULT 'stopped',
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    );
-                    """)
-                    
-                    # Create an index on agent_name
-                    cursor.execute("CREATE UNIQUE INDEX ix_slack_bots_agent_name ON slack_bots (agent_name);")
-                    conn.commit()
-                
-                conn.close()
-                return True
-        
-        # Create a new database if none found
-        logger.info("No existing database found, creating app.db")
-        conn = sqlite3.connect("app.db")
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-        CREATE TABLE slack_bots (
-            id INTEGER PRIMARY KEY,
-            agent_name TEXT UNIQUE,
-            bot_token TEXT NOT NULL,
-            app_token TEXT NOT NULL,
-            status TEXT DEFAULT 'stopped',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        """)
-        
-        cursor.execute("CREATE UNIQUE INDEX ix_slack_bots_agent_name ON slack_bots (agent_name);")
-        conn.commit()
-        conn.close()
-        return True
-    
-    except Exception as e:
-        logger.error(f"Error ensuring slack_bots table exists: {e}")
-        return False
-
-
 async def deploy_agent_to_slack(agent_name: str, bot_token: str, app_token: str, db_session: AsyncSession) -> Dict[str, Any]:
     """
     Deploy an agent as a Slack bot.
@@ -485,12 +407,10 @@ async def deploy_agent_to_slack(agent_name: str, bot_token: str, app_token: str,
         Dict with success status and message
     """
     try:
-        # CRITICAL: Ensure the slack_bots table exists before any operations
-        ensure_slack_table_exists()
-        
         # Check if agent exists in the database
+        agent_record = None
         try:
-            agent_query = select(db_models.Agent).where(db_models.Agent.name == agent_name)
+            agent_query = select(db.AgentModel).where(db.AgentModel.name == agent_name)
             agent_result = await db_session.execute(agent_query)
             agent_record = agent_result.scalars().first()
             
@@ -500,11 +420,10 @@ async def deploy_agent_to_slack(agent_name: str, bot_token: str, app_token: str,
             logger.error(f"Error checking agent existence: {e}")
             # Continue anyway, as the agent might exist in memory but not in the database
         
-        # Try with direct SQL if SQLAlchemy fails
         try:
             # Check if the agent is already deployed
             query = (
-                select(db_models.SlackBot).where(db_models.SlackBot.agent_name == agent_name)
+                select(db.SlackBotModel).where(db.SlackBotModel.agent_name == agent_name)
             )
             result = await db_session.execute(query)
             existing_bot = result.scalars().first()
@@ -517,7 +436,8 @@ async def deploy_agent_to_slack(agent_name: str, bot_token: str, app_token: str,
                 existing_bot.updated_at = datetime.utcnow()
             else:
                 # Create new SlackBot record
-                new_bot = db_models.SlackBot(
+                new_bot = db.SlackBotModel(
+                    agent_id=agent_record.id if agent_record else None,
                     agent_name=agent_name,
                     bot_token=bot_token,
                     app_token=app_token,
@@ -557,74 +477,9 @@ async def deploy_agent_to_slack(agent_name: str, bot_token: str, app_token: str,
                 }
             
         except Exception as e:
-            logger.error(f"SQLAlchemy error while deploying to Slack: {e}")
-            
-            # Fall back to direct SQL
-            try:
-                # Find the database path
-                db_file = None
-                for path in ["app.db", "../app.db", "./data/agents.db", "../data/agents.db"]:
-                    if os.path.exists(path):
-                        db_file = path
-                        break
-                
-                if not db_file:
-                    return {"success": False, "message": "Could not find database file"}
-                
-                # Use SQLite directly
-                conn = sqlite3.connect(db_file)
-                cursor = conn.cursor()
-                
-                # Check if bot exists
-                cursor.execute("SELECT id FROM slack_bots WHERE agent_name = ?", (agent_name,))
-                existing = cursor.fetchone()
-                
-                if existing:
-                    # Update existing bot
-                    cursor.execute(
-                        "UPDATE slack_bots SET bot_token = ?, app_token = ?, status = 'running', updated_at = CURRENT_TIMESTAMP WHERE agent_name = ?",
-                        (bot_token, app_token, agent_name)
-                    )
-                else:
-                    # Insert new bot
-                    cursor.execute(
-                        "INSERT INTO slack_bots (agent_name, bot_token, app_token, status) VALUES (?, ?, ?, 'running')",
-                        (agent_name, bot_token, app_token)
-                    )
-                
-                conn.commit()
-                conn.close()
-                
-                # CRITICAL: Actually create and start the bot
-                # Check if bot already exists in memory
-                if agent_name in active_slack_bots:
-                    # Bot exists, stop it first
-                    active_slack_bots[agent_name].stop()
-                
-                # Create a new bot instance with the updated tokens
-                bot = SlackBot(agent_name, bot_token, app_token)
-                
-                # Start the bot
-                if bot.start():
-                    # Store in active bots dictionary
-                    active_slack_bots[agent_name] = bot
-                    logger.info(f"Successfully started Slack bot for agent '{agent_name}' (using direct SQL)")
-                    
-                    return {
-                        "success": True,
-                        "message": f"Agent '{agent_name}' has been deployed to Slack (using direct SQL) and is now running",
-                        "status": "running"
-                    }
-                else:
-                    return {
-                        "success": False,
-                        "message": f"Agent '{agent_name}' was deployed but failed to start. Check logs for details.",
-                        "status": "error"
-                    }
-                
-            except Exception as sql_err:
-                logger.error(f"Direct SQL error: {sql_err}")
-                return {"success": False, "message": f"Database error: {str(sql_err)}"}
+            logger.error(f"Database error while deploying to Slack: {e}")
+            await db_session.rollback()
+            return {"success": False, "message": f"Database error: {str(e)}"}
             
     except Exception as e:
         logger.error(f"Error deploying agent to Slack: {e}")
@@ -644,9 +499,6 @@ async def toggle_slack_bot(agent_name: str, action: str, db_session: AsyncSessio
         Dict with success status and message
     """
     try:
-        # Ensure the slack_bots table exists first
-        ensure_slack_table_exists()
-        
         # Check if action is valid
         if action not in ["start", "stop"]:
             return {"success": False, "message": f"Invalid action: {action}. Use 'start' or 'stop'."}
@@ -654,7 +506,7 @@ async def toggle_slack_bot(agent_name: str, action: str, db_session: AsyncSessio
         try:
             # Check if bot exists in database
             query = (
-                select(db_models.SlackBot).where(db_models.SlackBot.agent_name == agent_name)
+                select(db.SlackBotModel).where(db.SlackBotModel.agent_name == agent_name)
             )
             result = await db_session.execute(query)
             bot_record = result.scalars().first()
@@ -679,8 +531,8 @@ async def toggle_slack_bot(agent_name: str, action: str, db_session: AsyncSessio
             new_status = "running" if action == "start" else "stopped"
             
             await db_session.execute(
-                update(db_models.SlackBot)
-                .where(db_models.SlackBot.agent_name == agent_name)
+                update(db.SlackBotModel)
+                .where(db.SlackBotModel.agent_name == agent_name)
                 .values(status=new_status, updated_at=datetime.utcnow())
             )
             await db_session.commit()
@@ -726,94 +578,8 @@ async def toggle_slack_bot(agent_name: str, action: str, db_session: AsyncSessio
             }
         except Exception as db_error:
             logger.error(f"Database error in toggle_slack_bot: {db_error}")
-            
-            # Try direct SQL as fallback
-            try:
-                # Find the database path
-                db_file = None
-                for path in ["app.db", "../app.db", "./data/agents.db", "../data/agents.db"]:
-                    if os.path.exists(path):
-                        db_file = path
-                        break
-                
-                if not db_file:
-                    return {"success": False, "message": "Could not find database file"}
-                
-                # Use SQLite directly
-                conn = sqlite3.connect(db_file)
-                cursor = conn.cursor()
-                
-                # Check if bot exists
-                cursor.execute("SELECT bot_token, app_token FROM slack_bots WHERE agent_name = ?", (agent_name,))
-                existing = cursor.fetchone()
-                
-                if not existing:
-                    conn.close()
-                    if action == "start":
-                        return {
-                            "success": False, 
-                            "message": f"Agent '{agent_name}' is not deployed to Slack. Deploy it first."
-                        }
-                    else:
-                        return {
-                            "success": True, 
-                            "message": f"Agent '{agent_name}' is not deployed to Slack.",
-                            "status": "not_deployed"
-                        }
-                
-                # Update status
-                new_status = "running" if action == "start" else "stopped"
-                cursor.execute(
-                    "UPDATE slack_bots SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE agent_name = ?",
-                    (new_status, agent_name)
-                )
-                
-                conn.commit()
-                
-                # CRITICAL: Actually start or stop the bot
-                if action == "start":
-                    # Start the bot if it's not already running
-                    if agent_name in active_slack_bots:
-                        # Bot exists in memory but might be stopped
-                        if not active_slack_bots[agent_name].running:
-                            active_slack_bots[agent_name].start()
-                    else:
-                        # Bot doesn't exist in memory, create and start it
-                        # Get tokens from the database query
-                        bot_token, app_token = existing
-                        
-                        # Create a new bot instance
-                        bot = SlackBot(agent_name, bot_token, app_token)
-                        
-                        # Start the bot
-                        if bot.start():
-                            # Store in active bots dictionary
-                            active_slack_bots[agent_name] = bot
-                            logger.info(f"Successfully started Slack bot for agent '{agent_name}' (direct SQL)")
-                        else:
-                            conn.close()
-                            return {
-                                "success": False,
-                                "message": f"Failed to start Slack bot for agent '{agent_name}'. Check logs.",
-                                "status": "error"
-                            }
-                else:  # action == "stop"
-                    # Stop the bot if it's running
-                    if agent_name in active_slack_bots:
-                        # Stop the bot
-                        active_slack_bots[agent_name].stop()
-                        logger.info(f"Successfully stopped Slack bot for agent '{agent_name}' (direct SQL)")
-                
-                conn.close()
-                
-                return {
-                    "success": True,
-                    "message": f"Bot for agent '{agent_name}' has been {action}ed (using direct SQL)",
-                    "status": new_status
-                }
-            except Exception as sql_err:
-                logger.error(f"Direct SQL error: {sql_err}")
-                return {"success": False, "message": f"Database error: {str(sql_err)}"}
+            await db_session.rollback()
+            return {"success": False, "message": f"Database error: {str(db_error)}"}
             
     except Exception as e:
         logger.error(f"Error toggling Slack bot: {e}")
@@ -832,9 +598,6 @@ async def get_slack_bot_status(agent_name: str, db_session: AsyncSession) -> Dic
         Dict: Status information
     """
     try:
-        # Ensure the slack_bots table exists
-        ensure_slack_table_exists()
-        
         # First check if the bot exists in memory
         is_in_memory = agent_name in active_slack_bots
         actually_running = is_in_memory and active_slack_bots[agent_name].running
@@ -846,7 +609,7 @@ async def get_slack_bot_status(agent_name: str, db_session: AsyncSession) -> Dic
         try:
             # Check if the bot is deployed
             bot_query = (
-                select(db_models.SlackBot).where(db_models.SlackBot.agent_name == agent_name)
+                select(db.SlackBotModel).where(db.SlackBotModel.agent_name == agent_name)
             )
             bot_result = await db_session.execute(bot_query)
             bot_record = bot_result.scalars().first()
@@ -880,70 +643,14 @@ async def get_slack_bot_status(agent_name: str, db_session: AsyncSession) -> Dic
             }
         
         except Exception as e:
-            logger.error(f"SQLAlchemy error getting Slack bot status: {e}")
-            
-            # Try direct SQL as fallback
-            try:
-                # Find the database path
-                db_file = None
-                for path in ["app.db", "../app.db", "./data/agents.db", "../data/agents.db"]:
-                    if os.path.exists(path):
-                        db_file = path
-                        break
-                
-                if not db_file:
-                    return {"deployed": False, "status": "error", "message": "Could not find database file", "in_memory": is_in_memory}
-                
-                # Use SQLite directly
-                conn = sqlite3.connect(db_file)
-                cursor = conn.cursor()
-                
-                # Check if bot exists
-                cursor.execute("SELECT status, bot_token, app_token FROM slack_bots WHERE agent_name = ?", (agent_name,))
-                result = cursor.fetchone()
-                
-                if not result:
-                    conn.close()
-                    return {"deployed": False, "status": "not_deployed", "in_memory": is_in_memory}
-                
-                status, bot_token, app_token = result
-                
-                # If the bot is running but DB says it's stopped, update DB
-                if actually_running and status != "running":
-                    cursor.execute(
-                        "UPDATE slack_bots SET status = 'running', updated_at = CURRENT_TIMESTAMP WHERE agent_name = ?",
-                        (agent_name,)
-                    )
-                    conn.commit()
-                    status = "running"
-                # If the bot is not running but DB says it's running, update DB
-                elif not actually_running and status == "running":
-                    cursor.execute(
-                        "UPDATE slack_bots SET status = 'stopped', updated_at = CURRENT_TIMESTAMP WHERE agent_name = ?",
-                        (agent_name,)
-                    )
-                    conn.commit()
-                    status = "stopped"
-                
-                conn.close()
-                
-                # Return comprehensive status
-                return {
-                    "deployed": True, 
-                    "status": "running" if actually_running else status,
-                    "in_memory": is_in_memory,
-                    "bot_token_exists": bool(bot_token),
-                    "app_token_exists": bool(app_token)
-                }
-                
-            except Exception as sql_err:
-                logger.error(f"Direct SQL error: {sql_err}")
-                return {
-                    "deployed": False, 
-                    "status": "error", 
-                    "message": str(sql_err),
-                    "in_memory": is_in_memory
-                }
+            logger.error(f"Database error getting Slack bot status: {e}")
+            await db_session.rollback()
+            return {
+                "deployed": False, 
+                "status": "error", 
+                "message": str(e),
+                "in_memory": is_in_memory
+            }
     
     except Exception as e:
         logger.error(f"Error getting Slack bot status: {e}")
@@ -961,12 +668,9 @@ async def get_all_slack_bots(db_session: AsyncSession) -> List[Dict[str, Any]]:
         List[Dict]: List of bot information
     """
     try:
-        # Ensure the slack_bots table exists
-        ensure_slack_table_exists()
-        
         try:
             # Get all deployed bots
-            bots_query = select(db_models.SlackBot)
+            bots_query = select(db.SlackBotModel)
             bots_result = await db_session.execute(bots_query)
             bots = bots_result.scalars().all()
             
@@ -996,65 +700,9 @@ async def get_all_slack_bots(db_session: AsyncSession) -> List[Dict[str, Any]]:
             return result
         
         except Exception as e:
-            logger.error(f"SQLAlchemy error getting all Slack bots: {e}")
-            
-            # Try direct SQL as fallback
-            try:
-                # Find the database path
-                db_file = None
-                for path in ["app.db", "../app.db", "./data/agents.db", "../data/agents.db"]:
-                    if os.path.exists(path):
-                        db_file = path
-                        break
-                
-                if not db_file:
-                    return []
-                
-                # Use SQLite directly
-                conn = sqlite3.connect(db_file)
-                conn.row_factory = sqlite3.Row  # This allows accessing columns by name
-                cursor = conn.cursor()
-                
-                # Get all bots
-                cursor.execute("SELECT agent_name, status, created_at, updated_at FROM slack_bots")
-                rows = cursor.fetchall()
-                
-                result = []
-                for row in rows:
-                    agent_name = row["agent_name"]
-                    status = row["status"]
-                    
-                    # Check if running
-                    is_running = agent_name in active_slack_bots and active_slack_bots[agent_name].running
-                    
-                    # Update status if needed
-                    if is_running and status != "running":
-                        cursor.execute(
-                            "UPDATE slack_bots SET status = 'running', updated_at = CURRENT_TIMESTAMP WHERE agent_name = ?",
-                            (agent_name,)
-                        )
-                        status = "running"
-                    elif not is_running and status != "stopped":
-                        cursor.execute(
-                            "UPDATE slack_bots SET status = 'stopped', updated_at = CURRENT_TIMESTAMP WHERE agent_name = ?",
-                            (agent_name,)
-                        )
-                        status = "stopped"
-                    
-                    result.append({
-                        "agent_name": agent_name,
-                        "status": status,
-                        "created_at": row["created_at"],
-                        "updated_at": row["updated_at"]
-                    })
-                
-                conn.commit()
-                conn.close()
-                return result
-                
-            except Exception as sql_err:
-                logger.error(f"Direct SQL error: {sql_err}")
-                return []
+            logger.error(f"Database error getting all Slack bots: {e}")
+            await db_session.rollback()
+            return []
     
     except Exception as e:
         logger.error(f"Error getting all Slack bots: {e}")
@@ -1073,13 +721,10 @@ async def undeploy_slack_bot(agent_name: str, db_session: AsyncSession) -> Dict[
         Dict with success status and message
     """
     try:
-        # Ensure the slack_bots table exists
-        ensure_slack_table_exists()
-        
         try:
             # Check if the bot exists
             query = (
-                select(db_models.SlackBot).where(db_models.SlackBot.agent_name == agent_name)
+                select(db.SlackBotModel).where(db.SlackBotModel.agent_name == agent_name)
             )
             result = await db_session.execute(query)
             bot_record = result.scalars().first()
@@ -1089,7 +734,7 @@ async def undeploy_slack_bot(agent_name: str, db_session: AsyncSession) -> Dict[
             
             # Remove from database
             await db_session.execute(
-                delete(db_models.SlackBot).where(db_models.SlackBot.agent_name == agent_name)
+                delete(db.SlackBotModel).where(db.SlackBotModel.agent_name == agent_name)
             )
             await db_session.commit()
             
@@ -1099,43 +744,9 @@ async def undeploy_slack_bot(agent_name: str, db_session: AsyncSession) -> Dict[
             }
         
         except Exception as e:
-            logger.error(f"SQLAlchemy error undeploying Slack bot: {e}")
-            
-            # Try direct SQL as fallback
-            try:
-                # Find the database path
-                db_file = None
-                for path in ["app.db", "../app.db", "./data/agents.db", "../data/agents.db"]:
-                    if os.path.exists(path):
-                        db_file = path
-                        break
-                
-                if not db_file:
-                    return {"success": False, "message": "Could not find database file"}
-                
-                # Use SQLite directly
-                conn = sqlite3.connect(db_file)
-                cursor = conn.cursor()
-                
-                # Check if bot exists
-                cursor.execute("SELECT id FROM slack_bots WHERE agent_name = ?", (agent_name,))
-                if not cursor.fetchone():
-                    conn.close()
-                    return {"success": False, "message": f"Agent '{agent_name}' is not deployed to Slack"}
-                
-                # Delete bot
-                cursor.execute("DELETE FROM slack_bots WHERE agent_name = ?", (agent_name,))
-                conn.commit()
-                conn.close()
-                
-                return {
-                    "success": True,
-                    "message": f"Agent '{agent_name}' has been undeployed from Slack (using direct SQL)"
-                }
-                
-            except Exception as sql_err:
-                logger.error(f"Direct SQL error: {sql_err}")
-                return {"success": False, "message": f"Database error: {str(sql_err)}"}
+            logger.error(f"Database error undeploying Slack bot: {e}")
+            await db_session.rollback()
+            return {"success": False, "message": f"Database error: {str(e)}"}
     
     except Exception as e:
         logger.error(f"Error undeploying Slack bot: {e}")
@@ -1153,12 +764,9 @@ async def initialize_slack_bots(db_session: AsyncSession) -> None:
     try:
         logger.info("Initializing Slack bots...")
         
-        # Ensure the slack_bots table exists
-        ensure_slack_table_exists()
-        
         try:
             # Get all bots with status 'running'
-            query = select(db_models.SlackBot).where(db_models.SlackBot.status == "running")
+            query = select(db.SlackBotModel).where(db.SlackBotModel.status == "running")
             result = await db_session.execute(query)
             bots = result.scalars().all()
             
@@ -1198,67 +806,7 @@ async def initialize_slack_bots(db_session: AsyncSession) -> None:
             
         except Exception as db_error:
             logger.error(f"Database error in initialize_slack_bots: {str(db_error)}")
-            
-            # Try with direct SQL as fallback
-            try:
-                # Find the database path
-                db_file = None
-                for path in ["app.db", "../app.db", "./data/agents.db", "../data/agents.db"]:
-                    if os.path.exists(path):
-                        db_file = path
-                        break
-                
-                if not db_file:
-                    logger.error("Could not find database file")
-                    return
-                
-                # Use SQLite directly
-                conn = sqlite3.connect(db_file)
-                conn.row_factory = sqlite3.Row  # Use Row to access columns by name
-                cursor = conn.cursor()
-                
-                # Get all bots with status 'running'
-                cursor.execute("SELECT agent_name, bot_token, app_token FROM slack_bots WHERE status = 'running'")
-                bots = cursor.fetchall()
-                
-                if not bots:
-                    logger.info("No active Slack bots found in database (using direct SQL)")
-                    conn.close()
-                    return
-                
-                # Start each bot
-                for bot_record in bots:
-                    try:
-                        agent_name = bot_record["agent_name"]
-                        bot_token = bot_record["bot_token"]
-                        app_token = bot_record["app_token"]
-                        
-                        logger.info(f"Starting Slack bot for agent '{agent_name}' (using direct SQL)")
-                        
-                        # Check if we already have this bot in memory
-                        if agent_name in active_slack_bots:
-                            # Stop the existing bot if it's already running
-                            active_slack_bots[agent_name].stop()
-                        
-                        # Create a new bot instance
-                        bot = SlackBot(agent_name, bot_token, app_token)
-                        
-                        # Start the bot
-                        if bot.start():
-                            # Store in active bots dictionary
-                            active_slack_bots[agent_name] = bot
-                            logger.info(f"Successfully started Slack bot for agent '{agent_name}' (using direct SQL)")
-                        else:
-                            logger.error(f"Failed to start Slack bot for agent '{agent_name}' (using direct SQL)")
-                            
-                    except Exception as bot_error:
-                        logger.error(f"Error initializing bot for agent '{bot_record['agent_name']}': {str(bot_error)}")
-                
-                conn.close()
-                logger.info(f"Initialized {len(bots)} Slack bots (using direct SQL)")
-                
-            except Exception as sql_error:
-                logger.error(f"Direct SQL error in initialize_slack_bots: {str(sql_error)}")
+            await db_session.rollback()
     
     except Exception as e:
         logger.error(f"Error initializing Slack bots: {str(e)}")
@@ -1278,7 +826,7 @@ async def get_agent_config(agent_name: str, db_session: AsyncSession = None) ->
     """
     if db_session:
         # Query the agent from the database
-        query = select(db_models.Agent).where(db_models.Agent.name == agent_name)
+        query = select(db.AgentModel).where(db.AgentModel.name == agent_name)
         result = await db_session.execute(query)
         agent = result.scalars().first()
         
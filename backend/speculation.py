@@ -0,0 +1,150 @@
+"""
+Speculative execution for multi-agent triage.
+
+For systems that opt in (MultiAgentSystem.speculative), the agent the triage agent
+picked most often for recent messages starts answering concurrently with the
+triage call. If triage picks the same agent the speculative answer is used, so
+the turn takes one model round trip instead of two; otherwise the speculative run
+is cancelled (or its answer discarded) and the chosen agent runs as usual.
+
+A system only speculates once its routing history is long enough and one agent
+dominates it:
+
+    SPECULATION_HISTORY      - recent routing decisions kept per system
+    SPECULATION_MIN_SAMPLES  - decisions needed before speculating
+    SPECULATION_MIN_SHARE    - share of recent decisions the predicted agent must have
+
+Hit rate and wasted tokens are reported per system (/metrics/speculation). Tokens
+of runs cancelled mid-flight are not reported by the model, so those runs are
+counted separately instead.
+"""
+
+import os
+import asyncio
+from collections import Counter, deque
+from typing import Any, Deque, Dict, Iterable, Optional
+
+SPECULATION_HISTORY = int(os.getenv("SPECULATION_HISTORY", "50"))
+SPECULATION_MIN_SAMPLES = int(os.getenv("SPECULATION_MIN_SAMPLES", "5"))
+SPECULATION_MIN_SHARE = float(os.getenv("SPECULATION_MIN_SHARE", "0.6"))
+
+def _total_tokens(result: Any) -> int:
+    usage = getattr(getattr(result, "context_wrapper", None), "usage", None)
+    return getattr(usage, "total_tokens", 0) or 0
+
+class SystemSpeculationStats:
+    """Routing history and speculation outcomes of one multi-agent system"""
+
+    def __init__(self, history_size: int):
+        self.history: Deque[str] = deque(maxlen=history_size)
+        self.attempts = 0
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+        self.wasted_tokens = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        decided = self.hits + self.misses
+        return {
+            "history": dict(Counter(self.history)),
+            "attempts": self.attempts,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / decided if decided else 0.0,
+            "cancelled": self.cancelled,
+            "wasted_tokens": self.wasted_tokens
+        }
+
+class Speculator:
+    """
+    Predicts the downstream agent of a multi-agent system from its routing history.
+
+    Args:
+        history_size: Recent routing decisions kept per system
+        min_samples: Decisions needed before speculating
+        min_share: Share of recent decisions the predicted agent must have
+    """
+
+    def __init__(self, history_size: int = 50, min_samples: int = 5, min_share: float = 0.6):
+        self.history_size = history_size
+        self.min_samples = min_samples
+        self.min_share = min_share
+        self._systems: Dict[str, SystemSpeculationStats] = {}
+
+    def _stats(self, system_id: str) -> SystemSpeculationStats:
+        stats = self._systems.get(system_id)
+        if stats is None:
+            stats = self._systems[system_id] = SystemSpeculationStats(self.history_size)
+        return stats
+
+    def record_route(self, system_id: str, agent_name: str):
+        """Add a routing decision to the system's history"""
+        self._stats(system_id).history.append(agent_name)
+
+    def predict(self, system_id: str, candidates: Iterable[str]) -> Optional[str]:
+        """The agent to speculate on, or None if no agent dominates the recent history"""
+        stats = self._systems.get(system_id)
+        if stats is None or len(stats.history) < self.min_samples:
+            return None
+        agent_name, count = Counter(stats.history).most_common(1)[0]
+        if count / len(stats.history) < self.min_share or agent_name not in candidates:
+            return None
+        return agent_name
+
+    def start(self, system_id: str, agent_name: str, run) -> "Speculation":
+        """Start `run` (a coroutine running agent_name) as a speculative task"""
+        self._stats(system_id).attempts += 1
+        return Speculation(self._stats(system_id), agent_name, asyncio.create_task(run))
+
+    def forget(self, system_id: str):
+        """Drop the history and statistics of a deleted or reconfigured system"""
+        self._systems.pop(system_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        systems = {system_id: stats.to_dict() for system_id, stats in self._systems.items()}
+        hits = sum(stats.hits for stats in self._systems.values())
+        decided = hits + sum(stats.misses for stats in self._systems.values())
+        return {
+            "min_samples": self.min_samples,
+            "min_share": self.min_share,
+            "hit_rate": hits / decided if decided else 0.0,
+            "wasted_tokens": sum(stats.wasted_tokens for stats in self._systems.values()),
+            "systems": systems
+        }
+
+class Speculation:
+    """A speculative run of the predicted agent; resolve it with take() or discard()"""
+
+    def __init__(self, stats: SystemSpeculationStats, agent_name: str, task: asyncio.Task):
+        self._stats = stats
+        self.agent_name = agent_name
+        self._task = task
+        self.outcome: Optional[str] = None
+
+    async def take(self):
+        """Use the speculative run's result (raises what the run raised)"""
+        self.outcome = "hit"
+        self._stats.hits += 1
+        return await self._task
+
+    def discard(self):
+        """Drop the speculative run: cancel it if still running, count its tokens if it finished"""
+        if self.outcome is not None:
+            return
+        self.outcome = "miss"
+        self._stats.misses += 1
+        if not self._task.done():
+            self._task.cancel()
+            self._stats.cancelled += 1
+        elif not self._task.cancelled() and self._task.exception() is None:
+            self._stats.wasted_tokens += _total_tokens(self._task.result())
+
+    def metadata(self) -> Dict[str, Any]:
+        return {"agent": self.agent_name, "hit": self.outcome == "hit"}
+
+# Shared speculator
+speculator = Speculator(
+    history_size=SPECULATION_HISTORY,
+    min_samples=SPECULATION_MIN_SAMPLES,
+    min_share=SPECULATION_MIN_SHARE
+)
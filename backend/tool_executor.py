@@ -0,0 +1,177 @@
+"""
+Execution layer for agent tool functions.
+
+Tool implementations are plain functions written (or generated) without regard for
+the event loop; many of them block on HTTP requests, pandas I/O or model training.
+The executor keeps the FastAPI loop responsive by running them elsewhere:
+
+    async tools         - awaited directly on the loop
+    sync tools          - run on a dedicated, sized thread pool
+    CPU-bound tools     - run on a process pool (listed in TOOL_PROCESS_TOOLS)
+
+Every call is bounded by a per-tool timeout. A timed-out call is reported to the
+model as an error; the worker thread or process finishes in the background since
+Python cannot interrupt it.
+"""
+
+import os
+import asyncio
+import inspect
+import functools
+import importlib.util
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Set
+
+def _parse_timeouts(value: str) -> Dict[str, float]:
+    # "csv_query=60,run_interactive_pipeline=300" -> {"csv_query": 60.0, ...}
+    timeouts = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, seconds = item.partition("=")
+        try:
+            timeouts[name.strip()] = float(seconds)
+        except ValueError:
+            print(f"Warning: ignoring invalid tool timeout '{item}'")
+    return timeouts
+
+# Modules loaded inside process-pool workers, keyed by implementation file
+_worker_modules: Dict[str, Any] = {}
+
+def _call_tool_file(path: str, tool_name: str, kwargs: Dict[str, Any]) -> Any:
+    """Load a tool module from its file (once per worker process) and call it"""
+    module = _worker_modules.get(path)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(tool_name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _worker_modules[path] = module
+    return getattr(module, tool_name)(**kwargs)
+
+class ToolExecutor:
+    """
+    Runs tool functions off the event loop with per-tool timeouts.
+
+    Args:
+        max_threads: Size of the thread pool for blocking tools
+        max_processes: Size of the process pool for CPU-bound tools (0 runs them on threads)
+        default_timeout: Timeout in seconds for tools without their own timeout
+        tool_timeouts: Timeout per tool name
+        process_tools: Names of CPU-bound tools to run in the process pool
+    """
+
+    def __init__(
+        self,
+        max_threads: int = 16,
+        max_processes: int = 2,
+        default_timeout: float = 30.0,
+        tool_timeouts: Optional[Dict[str, float]] = None,
+        process_tools: Optional[Set[str]] = None
+    ):
+        self.max_threads = max_threads
+        self.max_processes = max_processes
+        self.default_timeout = default_timeout
+        self.tool_timeouts = tool_timeouts or {}
+        self.process_tools = process_tools or set()
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self.calls: Dict[str, int] = {}
+        self.timeouts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+
+    def _threads(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix="tool")
+        return self._thread_pool
+
+    def _processes(self) -> ProcessPoolExecutor:
+        if self._process_pool is None:
+            # Forking a process that runs threads and an event loop is unsafe
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.max_processes,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._process_pool
+
+    def timeout_for(self, tool_name: str) -> float:
+        return self.tool_timeouts.get(tool_name, self.default_timeout)
+
+    async def run(self, tool_name: str, func: Callable, kwargs: Dict[str, Any], source_file: Optional[str] = None) -> Any:
+        """
+        Run a tool function and return its result.
+
+        Args:
+            tool_name: Name of the tool (selects timeout and pool)
+            func: The tool implementation
+            kwargs: Keyword arguments for the tool
+            source_file: Implementation file of the tool, required for the process pool
+
+        Raises:
+            asyncio.TimeoutError: If the tool does not finish within its timeout
+        """
+        self.calls[tool_name] = self.calls.get(tool_name, 0) + 1
+        timeout = self.timeout_for(tool_name)
+        loop = asyncio.get_running_loop()
+
+        process_pool = None
+        if inspect.iscoroutinefunction(func):
+            call = func(**kwargs)
+        elif tool_name in self.process_tools and self.max_processes and source_file:
+            process_pool = self._processes()
+            call = loop.run_in_executor(process_pool, _call_tool_file, source_file, tool_name, kwargs)
+        else:
+            call = loop.run_in_executor(self._threads(), functools.partial(func, **kwargs))
+
+        try:
+            result = await asyncio.wait_for(call, timeout=timeout)
+        except asyncio.TimeoutError:
+            self.timeouts[tool_name] = self.timeouts.get(tool_name, 0) + 1
+            raise
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); shut the broken pool down (its manager
+            # thread and surviving workers) and start a fresh one for the next call
+            self.errors[tool_name] = self.errors.get(tool_name, 0) + 1
+            if process_pool is not None:
+                if self._process_pool is process_pool:
+                    self._process_pool = None
+                process_pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        except Exception:
+            self.errors[tool_name] = self.errors.get(tool_name, 0) + 1
+            raise
+
+        # Tools written as sync functions may still hand back a coroutine
+        if inspect.isawaitable(result):
+            result = await asyncio.wait_for(result, timeout=timeout)
+        return result
+
+    def shutdown(self):
+        """Shut down the worker pools without waiting for running tools"""
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._thread_pool = None
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Get pool sizes and per-tool call counters"""
+        return {
+            "max_threads": self.max_threads,
+            "max_processes": self.max_processes,
+            "default_timeout": self.default_timeout,
+            "tool_timeouts": self.tool_timeouts,
+            "process_tools": sorted(self.process_tools),
+            "calls": dict(self.calls),
+            "timeouts": dict(self.timeouts),
+            "errors": dict(self.errors)
+        }
+
+# Shared executor for all agent tools
+tool_executor = ToolExecutor(
+    max_threads=int(os.getenv("TOOL_THREAD_POOL_SIZE", "16")),
+    max_processes=int(os.getenv("TOOL_PROCESS_POOL_SIZE", "2")),
+    default_timeout=float(os.getenv("TOOL_TIMEOUT_SECONDS", "30")),
+    tool_timeouts=_parse_timeouts(os.getenv("TOOL_TIMEOUTS", "")),
+    process_tools={name.strip() for name in os.getenv("TOOL_PROCESS_TOOLS", "").split(",") if name.strip()}
+)
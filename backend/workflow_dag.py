@@ -0,0 +1,218 @@
+"""
+DAG execution of multi-agent systems.
+
+A system's connections (source agent -> target agent) are run as a directed
+acyclic graph: agents without incoming connections get the user's message, and
+every other agent starts as soon as all of its upstream agents have finished,
+receiving the message together with their outputs (so an agent with several
+incoming connections aggregates its branches). Independent branches run
+concurrently, each agent under its own timeout.
+
+Member agents without connections run as independent branches that get the
+user's message and whose output is part of the result; the triage agent only
+routes messages, so it runs only when a connection references it.
+
+An agent that fails or times out doesn't stop the other branches; the agents
+downstream of it are skipped. The result holds the outputs of the final agents
+(those without outgoing connections) and a trace with the timing of every agent.
+"""
+
+import os
+import time
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import agent_utils
+import llm_scheduler
+import multi_agent_service
+
+DAG_NODE_TIMEOUT_SECONDS = float(os.getenv("DAG_NODE_TIMEOUT_SECONDS", "60"))
+DAG_MAX_NODE_TIMEOUT_SECONDS = float(os.getenv("DAG_MAX_NODE_TIMEOUT_SECONDS", "300"))
+
+class InvalidWorkflow(ValueError):
+    """Raised when a system's connections don't form a runnable DAG"""
+
+def _edge(connection) -> Dict[str, Optional[str]]:
+    # AgentConnection objects or stored dicts; systems generated for projects use source/target
+    if not isinstance(connection, dict):
+        connection = connection.dict()
+    return {
+        "source": connection.get("source_agent") or connection.get("source"),
+        "target": connection.get("target_agent") or connection.get("target"),
+        "description": connection.get("description")
+    }
+
+class WorkflowGraph:
+    """
+    Agents and connections of a multi-agent system, validated as a DAG.
+
+    Args:
+        agents: Agents of the system
+        connections: AgentConnection objects or dicts (source_agent/target_agent or source/target)
+        triage_agent: The system's triage agent, left out unless a connection references it
+    """
+
+    def __init__(self, agents: List[str], connections: List[Any], triage_agent: Optional[str] = None):
+        self.upstream: Dict[str, List[Dict[str, Optional[str]]]] = {}
+        self.downstream: Dict[str, List[str]] = {}
+        for connection in connections or []:
+            edge = _edge(connection)
+            source, target = edge["source"], edge["target"]
+            if not source or not target:
+                raise InvalidWorkflow(f"Connection without a source or target agent: {connection}")
+            for agent_name in (source, target):
+                if agent_name not in agents:
+                    raise InvalidWorkflow(f"Connection references agent '{agent_name}' outside the system")
+                self.upstream.setdefault(agent_name, [])
+                self.downstream.setdefault(agent_name, [])
+            if source == target:
+                raise InvalidWorkflow(f"Agent '{source}' is connected to itself")
+            if target in self.downstream[source]:
+                continue
+            self.upstream[target].append(edge)
+            self.downstream[source].append(target)
+        if not self.upstream:
+            raise InvalidWorkflow("The system has no connections to execute")
+        # Unconnected members are independent nodes (both source and sink)
+        self.unconnected = [
+            agent_name for agent_name in dict.fromkeys(agents)
+            if agent_name not in self.upstream and agent_name != triage_agent
+        ]
+        for agent_name in self.unconnected:
+            self.upstream[agent_name] = []
+            self.downstream[agent_name] = []
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        remaining = {agent_name: len(edges) for agent_name, edges in self.upstream.items()}
+        ready = [agent_name for agent_name, count in remaining.items() if count == 0]
+        order = []
+        while ready:
+            agent_name = ready.pop(0)
+            order.append(agent_name)
+            for target in self.downstream[agent_name]:
+                remaining[target] -= 1
+                if remaining[target] == 0:
+                    ready.append(target)
+        if len(order) != len(self.upstream):
+            cycle = sorted(agent_name for agent_name, count in remaining.items() if count > 0)
+            raise InvalidWorkflow(f"Connections form a cycle through: {', '.join(cycle)}")
+        return order
+
+    @property
+    def sinks(self) -> List[str]:
+        return [agent_name for agent_name in self.order if not self.downstream[agent_name]]
+
+def node_input(message: str, upstream_outputs: List[Dict[str, Any]]) -> str:
+    """Input of an agent: the user's message, followed by the outputs of its upstream agents"""
+    if not upstream_outputs:
+        return message
+    sections = [f"User request:\n{message}", "Outputs from upstream agents:"]
+    for upstream in upstream_outputs:
+        header = f"## {upstream['agent']}"
+        if upstream.get("description"):
+            header += f" ({upstream['description']})"
+        sections.append(f"{header}\n{upstream['output']}")
+    return "\n\n".join(sections)
+
+async def execute_workflow(
+    graph: WorkflowGraph,
+    message: str,
+    db_session=None,
+    node_timeout: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Run a workflow graph for a message.
+
+    Args:
+        graph: The validated workflow graph
+        message: The user's message
+        db_session: Database session used to load agents that aren't registered yet
+        node_timeout: Seconds each agent may take (default DAG_NODE_TIMEOUT_SECONDS)
+
+    Returns:
+        Dict with the `outputs` of the final agents, the `response` (the single final
+        agent's output, or all final outputs under their agent names), the overall
+        `status` and a `trace` of every agent's status, start offset and duration
+    """
+    timeout = DAG_NODE_TIMEOUT_SECONDS if node_timeout is None else min(node_timeout, DAG_MAX_NODE_TIMEOUT_SECONDS)
+
+    # Load every agent up front so a missing agent fails before any model call
+    agents = {}
+    for agent_name in graph.order:
+        agent = await multi_agent_service.load_agent(agent_name, db_session)
+        if agent is None:
+            raise InvalidWorkflow(f"Agent '{agent_name}' not found")
+        agents[agent_name] = agent
+
+    started = time.perf_counter()
+    trace: Dict[str, Dict[str, Any]] = {
+        agent_name: {"agent": agent_name, "status": "pending", "upstream": [edge["source"] for edge in graph.upstream[agent_name]]}
+        for agent_name in graph.order
+    }
+    outputs: Dict[str, str] = {}
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run_node(agent_name: str):
+        node = trace[agent_name]
+        edges = graph.upstream[agent_name]
+        if edges:
+            await asyncio.gather(*(tasks[edge["source"]] for edge in edges))
+            failed = [edge["source"] for edge in edges if edge["source"] not in outputs]
+            if failed:
+                node["status"] = "skipped"
+                node["error"] = f"Upstream agent failed: {', '.join(failed)}"
+                return
+
+        node["started_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        node_started = time.perf_counter()
+        upstream_outputs = [
+            {"agent": edge["source"], "description": edge["description"], "output": outputs[edge["source"]]}
+            for edge in edges
+        ]
+        try:
+            result = await agent_utils.run_agent(agents[agent_name], node_input(message, upstream_outputs), timeout=timeout)
+            outputs[agent_name] = str(result.final_output)
+            node["status"] = "completed"
+        except asyncio.TimeoutError:
+            node["status"] = "timeout"
+            node["error"] = f"Timed out after {timeout:g} seconds"
+        except llm_scheduler.AdmissionRejected as e:
+            node["status"] = "rejected"
+            node["error"] = str(e)
+        except Exception as e:
+            print(f"Error running workflow agent {agent_name}: {str(e)}")
+            node["status"] = "failed"
+            node["error"] = str(e)
+        node["duration_ms"] = round((time.perf_counter() - node_started) * 1000, 2)
+
+    # Nodes are created in topological order, so every upstream task exists when awaited
+    for agent_name in graph.order:
+        tasks[agent_name] = asyncio.create_task(run_node(agent_name))
+    try:
+        await asyncio.gather(*tasks.values())
+    finally:
+        for task in tasks.values():
+            task.cancel()
+
+    final_outputs = {agent_name: outputs[agent_name] for agent_name in graph.sinks if agent_name in outputs}
+    completed = sum(1 for node in trace.values() if node["status"] == "completed")
+    if completed == len(trace):
+        status = "completed"
+    elif final_outputs:
+        status = "partial"
+    else:
+        status = "failed"
+
+    if len(graph.sinks) == 1:
+        response = final_outputs.get(graph.sinks[0])
+    else:
+        response = "\n\n".join(f"## {agent_name}\n{output}" for agent_name, output in final_outputs.items()) or None
+
+    return {
+        "status": status,
+        "response": response,
+        "outputs": final_outputs,
+        "trace": [trace[agent_name] for agent_name in graph.order],
+        "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
@@ -0,0 +1,202 @@
+"""
+Checkpointed runs of sequential project workflows.
+
+Every pass of a message through a project's agents is a workflow run
+(workflow_runs). As each agent finishes, its output is checkpointed
+(workflow_steps) under the hash of its input and the agent's configuration.
+The write happens in the background while the next agent is already running.
+When an agent fails, the run records the failed step. Resuming the run passes
+the message through the agents again, but a step whose input hash matches its
+checkpoint reuses the output instead of calling the model. A long chain that
+failed at step k therefore costs one model call to recover, not k.
+
+A run is marked completed, and its checkpoints dropped, in the transaction that
+saves its turn (sequential_pipeline.save_pipeline_turn); from then on its outputs
+are kept as the conversation's intermediate messages. A run whose turn failed to
+save stays running, so it can be resumed once it goes stale.
+"""
+
+import os
+import json
+import asyncio
+import hashlib
+import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, delete, update, or_, and_
+
+import agent_utils
+import database as db
+
+RUN_STATUSES = ("running", "failed", "completed")
+
+# A run still marked running after this long is assumed to have died with its process and may be resumed
+WORKFLOW_RUN_STALE_SECONDS = float(os.getenv("WORKFLOW_RUN_STALE_SECONDS", "600"))
+
+class RunNotResumable(Exception):
+    """Raised when a run is completed or still running elsewhere"""
+
+def step_input_hash(agent_name: str, agent_input: str) -> str:
+    """Hash of a step's input and the agent's configuration, so editing the agent invalidates its checkpoint"""
+    config = agent_utils.get_agent_config(agent_name)
+    payload = json.dumps({
+        "agent": agent_name,
+        "config": config.config_hash() if config is not None else None,
+        "input": agent_input
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class WorkflowRun:
+    """
+    A workflow run and its checkpoints; writes use their own sessions so they can
+    run alongside the pipeline.
+
+    Args:
+        model: The run's database record
+        checkpoints: Position -> (input hash, output) of the steps checkpointed so far
+        session_factory: Factory for the sessions used to write checkpoints
+    """
+
+    def __init__(self, model: db.WorkflowRunModel, checkpoints: Dict[int, Tuple[str, str]], session_factory=None):
+        self.id = model.id
+        self.project_id = model.project_id
+        self.conversation_id = model.conversation_id
+        self.message = model.message
+        self.agents: List[str] = list(model.agents)
+        self.status = model.status
+        self.message_saved = bool(model.message_saved)
+        self.checkpoints = checkpoints
+        self.session_factory = session_factory or db.async_session_factory
+        self._writes: List[asyncio.Task] = []
+
+    def cached_output(self, position: int, input_hash: str) -> Optional[str]:
+        """The checkpointed output of a step, if it was produced from the same input"""
+        checkpoint = self.checkpoints.get(position)
+        if checkpoint is not None and checkpoint[0] == input_hash:
+            return checkpoint[1]
+        return None
+
+    def checkpoint(self, position: int, agent_name: str, input_hash: str, output: str, duration_ms: Optional[float] = None):
+        """Checkpoint a step's output in the background"""
+        self.checkpoints[position] = (input_hash, output)
+        self._writes.append(asyncio.create_task(self._write_step(position, agent_name, input_hash, output, duration_ms)))
+
+    async def _write_step(self, position: int, agent_name: str, input_hash: str, output: str, duration_ms: Optional[float]):
+        try:
+            async with self.session_factory() as session:
+                await session.merge(db.WorkflowStepModel(
+                    run_id=self.id,
+                    position=position,
+                    agent_name=agent_name,
+                    input_hash=input_hash,
+                    output=output,
+                    duration_ms=duration_ms
+                ))
+                # Progress keeps the run from looking stale (WORKFLOW_RUN_STALE_SECONDS)
+                await session.execute(
+                    update(db.WorkflowRunModel)
+                    .where(db.WorkflowRunModel.id == self.id)
+                    .values(updated_at=datetime.datetime.utcnow())
+                )
+                await session.commit()
+        except Exception as e:
+            # A lost checkpoint only means the step runs again on resume
+            print(f"Error checkpointing step {position} of workflow run {self.id}: {str(e)}")
+
+    async def flush(self):
+        """Wait for pending checkpoint writes"""
+        if self._writes:
+            await asyncio.gather(*self._writes)
+            self._writes = []
+
+    async def finish(self, status: str, failed_step: Optional[int] = None, error: Optional[str] = None):
+        """Wait for pending checkpoints and record the run's outcome"""
+        await self.flush()
+        async with self.session_factory() as session:
+            run = await session.get(db.WorkflowRunModel, self.id)
+            run.status = status
+            run.failed_step = failed_step
+            run.error = error
+            if status == "completed":
+                await session.execute(delete(db.WorkflowStepModel).where(db.WorkflowStepModel.run_id == self.id))
+            await session.commit()
+        self.status = status
+
+async def create_run(session, project_id: int, conversation_id: Optional[int], message: str, agent_names: List[str]) -> WorkflowRun:
+    """Record a new run before its first step starts"""
+    run = db.WorkflowRunModel(
+        project_id=project_id,
+        conversation_id=conversation_id,
+        message=message,
+        agents=agent_names,
+        status="running",
+        message_saved=False
+    )
+    session.add(run)
+    await session.commit()
+    await session.refresh(run)
+    return WorkflowRun(run, {})
+
+async def load_run(session, run_id: int, project_id: Optional[int] = None) -> Optional[WorkflowRun]:
+    """Load a run with its checkpoints, or None if it doesn't exist (in the project)"""
+    run = await session.get(db.WorkflowRunModel, run_id)
+    if run is None or (project_id is not None and run.project_id != project_id):
+        return None
+    result = await session.execute(
+        select(db.WorkflowStepModel.position, db.WorkflowStepModel.input_hash, db.WorkflowStepModel.output)
+        .where(db.WorkflowStepModel.run_id == run_id)
+    )
+    checkpoints = {row.position: (row.input_hash, row.output) for row in result.all()}
+    return WorkflowRun(run, checkpoints)
+
+async def claim_run(session, run_id: int, project_id: int) -> Optional[WorkflowRun]:
+    """
+    Mark a failed (or stale running) run as running again and load it for resuming.
+
+    The status is switched in a single conditional update, so concurrent resume
+    calls can't both run the same run.
+
+    Returns:
+        The run, or None if it doesn't exist in the project
+
+    Raises:
+        RunNotResumable: If the run is completed or still running
+    """
+    stale_before = datetime.datetime.utcnow() - datetime.timedelta(seconds=WORKFLOW_RUN_STALE_SECONDS)
+    result = await session.execute(
+        update(db.WorkflowRunModel)
+        .where(db.WorkflowRunModel.id == run_id)
+        .where(db.WorkflowRunModel.project_id == project_id)
+        .where(or_(
+            db.WorkflowRunModel.status == "failed",
+            and_(db.WorkflowRunModel.status == "running", db.WorkflowRunModel.updated_at < stale_before)
+        ))
+        .values(status="running", failed_step=None, error=None, updated_at=datetime.datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    if result.rowcount == 0:
+        run = await session.get(db.WorkflowRunModel, run_id)
+        if run is None or run.project_id != project_id:
+            return None
+        raise RunNotResumable(f"Workflow run {run_id} is {run.status}")
+    session.expire_all()
+    return await load_run(session, run_id, project_id)
+
+def run_to_dict(run: db.WorkflowRunModel, steps: List[db.WorkflowStepModel]) -> Dict[str, Any]:
+    return {
+        "id": run.id,
+        "project_id": run.project_id,
+        "conversation_id": run.conversation_id,
+        "agents": run.agents,
+        "status": run.status,
+        "failed_step": run.failed_step,
+        "error": run.error,
+        "message_saved": bool(run.message_saved),
+        "created_at": run.created_at.isoformat() if run.created_at else None,
+        "updated_at": run.updated_at.isoformat() if run.updated_at else None,
+        "checkpoints": [
+            {"position": step.position, "agent": step.agent_name, "duration_ms": step.duration_ms}
+            for step in sorted(steps, key=lambda step: step.position)
+        ]
+    }